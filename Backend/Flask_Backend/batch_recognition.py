@@ -0,0 +1,130 @@
+import io
+import zipfile
+import numpy as np
+from concurrent.futures import ThreadPoolExecutor
+
+from Backend import config
+from Backend.face_recognition.detection import AdaptiveDetector
+
+IMAGE_EXTENSIONS = ('.jpg', '.jpeg', '.png', '.bmp', '.webp', '.tif', '.tiff')
+
+_executor = None
+_detector = None
+
+
+class UploadRejected(ValueError):
+    """A batch upload that cannot be processed; `status` is the HTTP status to answer with."""
+
+    def __init__(self, message, status=400):
+        super().__init__(message)
+        self.status = status
+
+
+def _get_executor():
+    global _executor
+    if _executor is None:
+        _executor = ThreadPoolExecutor(max_workers=config.BATCH_DECODE_WORKERS, thread_name_prefix="BatchDecode")
+    return _executor
+
+
+def read_uploads(files, max_images=None, max_bytes=None):
+    """
+    Flattens the uploaded files of a request into (filename, bytes) pairs.
+
+    Zip archives are expanded into the images they contain, in archive order.
+    The image count and total size are checked against the limits from each
+    member's header before it is extracted, so an archive that would expand past
+    them is rejected without decompressing it.
+
+    Args:
+        files: Iterable of werkzeug FileStorage objects.
+        max_images (int): Defaults to config.BATCH_MAX_IMAGES.
+        max_bytes (int): Limit on the total (uncompressed) image bytes, defaults to config.BATCH_MAX_BYTES.
+
+    Raises:
+        UploadRejected: For a malformed archive (400) or a batch over the limits (413).
+    """
+    max_images = config.BATCH_MAX_IMAGES if max_images is None else max_images
+    max_bytes = config.BATCH_MAX_BYTES if max_bytes is None else max_bytes
+    items, total_bytes = [], 0
+
+    def check_limits(count, size):
+        if count > max_images:
+            raise UploadRejected(f"Too many images (more than {max_images})", 413)
+        if size > max_bytes:
+            raise UploadRejected(f"Images too large (more than {max_bytes} bytes)", 413)
+
+    for file in files:
+        if not file or file.filename == '':
+            continue
+        data = file.read()
+        if file.filename.lower().endswith('.zip') or file.mimetype in ('application/zip', 'application/x-zip-compressed'):
+            try:
+                with zipfile.ZipFile(io.BytesIO(data)) as archive:
+                    for info in archive.infolist():
+                        if info.is_dir() or not info.filename.lower().endswith(IMAGE_EXTENSIONS):
+                            continue
+                        # file_size is the declared size; reading past it fails the CRC check below
+                        total_bytes += info.file_size
+                        check_limits(len(items) + 1, total_bytes)
+                        items.append((f"{file.filename}/{info.filename}", archive.read(info)))
+            except (zipfile.BadZipFile, zipfile.LargeZipFile, NotImplementedError, EOFError) as e:
+                raise UploadRejected(f"Could not read archive {file.filename}: {e}")
+        else:
+            total_bytes += len(data)
+            check_limits(len(items) + 1, total_bytes)
+            items.append((file.filename, data))
+    return items
+
+
+def detect_faces(data):
+    """
+    Decodes one image and returns its face locations and encodings, using the
+    coarse-to-fine AdaptiveDetector with the limits in Backend/config.py.
+
+    Returns:
+        tuple: (face_locations, face_encodings); raises ValueError if the bytes are not an image.
+    """
+    global _detector
+    if _detector is None:
+        _detector = AdaptiveDetector()
+    return _detector.detect_bytes(data)
+
+
+def recognize_batch(items, recognizer, detect=detect_faces):
+    """
+    Recognizes every face in a batch of images.
+
+    Images are decoded and encoded in parallel on a shared thread pool; all the
+    resulting encodings are then matched against the gallery in a single
+    `recognize_many` call.
+
+    Args:
+        items (list): (filename, bytes) pairs, e.g. from `read_uploads`.
+        recognizer (FaceRecognizer): Gallery to match against.
+        detect (callable): bytes -> (face_locations, face_encodings).
+
+    Returns:
+        list[dict]: One result per image, in input order, with "filename" and either
+        "faces" (name, distance and [top, right, bottom, left] bbox each) or "error".
+    """
+    futures = [_get_executor().submit(detect, data) for _, data in items]
+    results, all_encodings, owners = [], [], []
+    for (filename, _), future in zip(items, futures):
+        try:
+            face_locations, face_encodings = future.result()
+        except Exception as e:
+            results.append({"filename": filename, "error": str(e)})
+            continue
+        result = {"filename": filename,
+                  "faces": [{"bbox": [int(v) for v in location]} for location in face_locations]}
+        results.append(result)
+        for face, encoding in zip(result["faces"], face_encodings):
+            all_encodings.append(encoding)
+            owners.append(face)
+
+    for face, (name, distance) in zip(owners, recognizer.recognize_many(all_encodings)):
+        face["name"] = name
+        # An empty gallery yields an infinite distance, which JSON cannot represent
+        face["distance"] = round(distance, 4) if np.isfinite(distance) else None
+    return results
@@ -1,27 +1,54 @@
-
 import os
 import sys
-from flask import Flask, request, jsonify
-import face_recognition
-import numpy as np
-import cv2
+import time
+import threading
+from flask import Flask, Response, g, request, jsonify, url_for
 
 # Add project root to the Python path
 sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..', '..')))
 
-from Backend.face_recognition.recognizer import FaceRecognizer
-from Backend.Flask_Backend.video_search import search_for_face_in_videos
+from Backend.face_recognition.gallery_snapshot import get_gallery
+from Backend.face_recognition.detection import AdaptiveDetector
+from Backend.Flask_Backend.video_search import find_appearances, recordings_version, search_for_faces_in_videos
+from Backend.Flask_Backend.video_index import VideoFaceIndex
+from Backend.Flask_Backend.search_jobs import SearchJobManager
+from Backend.Flask_Backend.batch_recognition import UploadRejected, read_uploads, recognize_batch
+from Backend.Flask_Backend.result_cache import ResultCache, content_key, embedding_key
+from Backend.database.event_log import get_event_log
+from Backend.metrics import metrics
+from Backend import config
 
 app = Flask(__name__)
-recognizer = FaceRecognizer()
+# Immutable gallery snapshot, hot-reloaded in the background when new enrollments are committed
+gallery = get_gallery()
+detector = AdaptiveDetector()
 
 # Define the path to the recordings directory
 BASE_DIR = os.path.abspath(os.path.join(os.path.dirname(__file__), '..', '..'))
 VIDEOS_DIR = os.path.join(BASE_DIR, 'Data', 'recordings')
+VIDEO_INDEX_DIR = os.path.join(BASE_DIR, 'Data', 'video_index')
+video_index = VideoFaceIndex(VIDEO_INDEX_DIR, VIDEOS_DIR)
+indexing_lock = threading.Lock()
+search_jobs = SearchJobManager(VIDEOS_DIR, gallery.current)
+# Faces, encodings and names per upload (by content hash), and whole search responses
+upload_cache = ResultCache(config.UPLOAD_CACHE_SIZE, config.UPLOAD_CACHE_TTL)
+search_cache = ResultCache(config.SEARCH_CACHE_SIZE, config.SEARCH_CACHE_TTL)
 
 @app.route('/')
 def hello_world():
-    return 'Flask server is running. Use /recognize or /search_by_photo.'
+    return ('Flask server is running. Use /recognize, /recognize_batch, /search_by_photo, /index_recordings, /logs '
+            'or /metrics.')
+
+@app.before_request
+def _start_timer():
+    g.request_start = time.perf_counter()
+
+@app.after_request
+def _record_latency(response):
+    # Streams are timed until their headers are sent, not until they finish
+    if request.endpoint and 'request_start' in g:
+        metrics.observe(request.endpoint, time.perf_counter() - g.request_start, family="request")
+    return response
 
 @app.route('/recognize', methods=['POST'])
 def recognize():
@@ -32,49 +59,259 @@ def recognize():
         return jsonify({"error": "No selected file"}), 400
 
     if file:
-        filestr = file.read()
-        npimg = np.frombuffer(filestr, np.uint8)
-        image = cv2.imdecode(npimg, cv2.IMREAD_COLOR)
-        rgb_image = image[:, :, ::-1]
+        data = file.read()
+        recognizer, generation = gallery.snapshot()
+        # Names depend on the gallery too, so they are cached per snapshot generation
+        names_key = ("names", content_key(data), generation)
+        recognized_names = upload_cache.get(names_key)
+        hit = recognized_names is not None
+        if not hit:
+            try:
+                _, face_encodings = _detect_upload(data)
+            except ValueError:
+                return jsonify({"error": "Could not decode the uploaded image"}), 400
+            recognized_names = [name for name, _ in recognizer.recognize_many(face_encodings)]
+            upload_cache.put(names_key, recognized_names)
+
+        # Uploads from a registered camera (camera_id form field) are recorded in the event log
+        camera_id = request.form.get('camera_id', type=int)
+        if camera_id is not None and config.EVENT_LOG:
+            for name in recognized_names:
+                get_event_log().log_event(name, camera_id)
+
+        return _cached_response({"recognized_names": recognized_names}, hit)
+
+@app.route('/recognize_batch', methods=['POST'])
+def recognize_batch_route():
+    """
+    Recognizes the faces in many images at once: any number of multipart files
+    and/or zip archives of images. Returns one result per image, in upload order.
+    """
+    # One snapshot for the whole request, so a reload mid-batch cannot mix galleries
+    recognizer, _ = gallery.snapshot()
+    try:
+        items = read_uploads([f for key in request.files for f in request.files.getlist(key)])
+    except UploadRejected as e:
+        return jsonify({"error": str(e)}), e.status
+    if not items:
+        return jsonify({"error": "No files uploaded"}), 400
+
+    return jsonify({"results": recognize_batch(items, recognizer)})
+
+def _detect_upload(data):
+    """detector.detect_bytes, cached by the content hash of the upload."""
+    return upload_cache.get_or_compute(("faces", content_key(data)), lambda: detector.detect_bytes(data))
 
-        face_locations = face_recognition.face_locations(rgb_image)
-        face_encodings = face_recognition.face_encodings(rgb_image, face_locations)
+def _cached_response(payload, hit):
+    response = jsonify(payload)
+    response.headers["X-Cache"] = "HIT" if hit else "MISS"
+    return response
 
-        recognized_names = []
-        for face_encoding in face_encodings:
-            name = recognizer.recognize_face(face_encoding)
-            recognized_names.append(name)
+def _read_targets(recognizer):
+    """
+    Collects the search targets of a /search_by_photo or /search_jobs request.
 
-        return jsonify({"recognized_names": recognized_names})
+    Targets come from the uploaded `file` (its first face, or every face with
+    ?faces=all) and/or from `names` (form or query field, repeated or comma-separated)
+    of enrolled people, whose enrolled samples together form one target each.
+
+    Args:
+        recognizer (FaceRecognizer): The request's gallery snapshot the names are looked up in.
+
+    Returns:
+        tuple: (targets, descriptions, error response or None).
+    """
+    names = [name.strip() for value in request.form.getlist('names') + request.args.getlist('names')
+             for name in value.split(',') if name.strip()]
+    file = request.files.get('file')
+    if (file is None or file.filename == '') and not names:
+        return None, None, (jsonify({"error": "No file part"}), 400)
+
+    targets, descriptions = [], []
+    if file is not None and file.filename != '':
+        # Find face embeddings in the uploaded photo
+        try:
+            face_locations, face_encodings = _detect_upload(file.read())
+        except ValueError:
+            return None, None, (jsonify({"error": "Could not decode the uploaded image"}), 400)
+        if not face_encodings:
+            return None, None, (jsonify({"error": "No face found in the uploaded image"}), 400)
+        # By default the first face found in the image is the target
+        count = len(face_encodings) if request.args.get('faces') == 'all' else 1
+        for location, encoding in zip(face_locations[:count], face_encodings[:count]):
+            descriptions.append({"target": len(targets), "source": "photo", "bbox": [int(v) for v in location]})
+            targets.append(encoding)
+
+    unknown = [name for name in names if name not in recognizer.known_faces]
+    if unknown:
+        return None, None, (jsonify({"error": "Unknown names", "unknown_names": unknown}), 400)
+    for name in names:
+        samples = recognizer.known_faces[name]
+        descriptions.append({"target": len(targets), "source": "enrolled", "name": name, "samples": len(samples)})
+        targets.append(samples)
+    return targets, descriptions, None
+
+def _per_target(descriptions, key, results):
+    return [{**description, key: result} for description, result in zip(descriptions, results)]
 
 @app.route('/search_by_photo', methods=['POST'])
 def search_by_photo():
-    if 'file' not in request.files:
-        return jsonify({"error": "No file part"}), 400
-    file = request.files['file']
-    if file.filename == '':
-        return jsonify({"error": "No selected file"}), 400
+    """
+    Searches the recordings for the face in the uploaded photo. With ?faces=all or
+    `names`, several people are searched in the same pass and the response has one
+    entry per target under "targets".
+    """
+    # One snapshot for the whole request: the targets, the matches and the cache key must agree
+    recognizer, generation = gallery.snapshot()
+    targets, descriptions, error = _read_targets(recognizer)
+    if error is not None:
+        return error
+    # A plain upload keeps the single-target response format
+    single = len(targets) == 1 and descriptions[0]["source"] == "photo" and request.args.get('faces') != 'all'
 
-    if file:
-        filestr = file.read()
-        npimg = np.frombuffer(filestr, np.uint8)
-        image = cv2.imdecode(npimg, cv2.IMREAD_COLOR)
-        rgb_image = image[:, :, ::-1]
+    # ?async=1 runs a full scan as a background job and returns its id immediately
+    if request.args.get('async') == '1':
+        return _start_search_job(targets, descriptions, recognizer)
 
-        # Find face embeddings in the uploaded photo
-        face_locations = face_recognition.face_locations(rgb_image)
-        face_encodings = face_recognition.face_encodings(rgb_image, face_locations)
+    # ?frames=1 returns one match per sampled frame instead of merged appearances
+    aggregate = request.args.get('frames') != '1'
+    key = "appearances" if aggregate else "matches"
+    # ?scan=1 forces a full decode of every recording instead of using the index
+    scan = request.args.get('scan') == '1'
 
-        if not face_encodings:
-            return jsonify({"error": "No face found in the uploaded image"}), 400
+    # Any new or changed recording, index commit or gallery reload changes the key
+    cache_key = (embedding_key(targets, config.SEARCH_CACHE_QUANTUM), single, aggregate, scan,
+                 recordings_version(VIDEOS_DIR), None if scan else video_index.version(), generation)
+    results = search_cache.get(cache_key)
+    hit = results is not None
+    if not hit:
+        if scan:
+            results = search_for_faces_in_videos(targets, VIDEOS_DIR, recognizer, aggregate=aggregate), None
+        else:
+            results = video_index.query_many(targets, recognizer=recognizer)
+            if aggregate:
+                results = [find_appearances(matches, VIDEOS_DIR, target) for matches, target in zip(results, targets)]
+            results = results, video_index.stale_videos()[0]
+        search_cache.put(cache_key, results)
+
+    results, unindexed = results
+    payload = {key: results[0]} if single else {"targets": _per_target(descriptions, key, results)}
+    if not scan:
+        payload["unindexed_videos"] = unindexed
+    return _cached_response(payload, hit)
+
+def _start_search_job(targets, descriptions, recognizer):
+    # Checked here so a missing directory is a clear error instead of a failed job
+    if not os.path.isdir(VIDEOS_DIR):
+        return jsonify({"error": "Recordings directory not found"}), 404
+    job = search_jobs.submit(targets, recognizer)
+    return jsonify({
+        "job_id": job.id,
+        "targets": descriptions,
+        "status_url": url_for('search_job_status', job_id=job.id),
+        "stream_url": url_for('search_job_stream', job_id=job.id),
+    }), 202
+
+@app.route('/search_jobs', methods=['POST'])
+def create_search_job():
+    """Same upload (and targets) as /search_by_photo, but the scan runs in the background."""
+    recognizer = gallery.current()
+    targets, descriptions, error = _read_targets(recognizer)
+    if error is not None:
+        return error
+    return _start_search_job(targets, descriptions, recognizer)
+
+@app.route('/search_jobs/<job_id>', methods=['GET'])
+def search_job_status(job_id):
+    """
+    Progress plus the matches found so far, in video/timestamp order (each tagged
+    with its "target" index), and the merged appearances per target once the job is done.
+    """
+    job = search_jobs.get(job_id)
+    if job is None:
+        return jsonify({"error": "Unknown job"}), 404
+    matches = sorted(job.matches, key=lambda m: (m["video_file"], m["timestamp_seconds"]))
+    return jsonify({**job.progress(), "matches": matches, "appearances": job.appearances})
+
+@app.route('/search_jobs/<job_id>/stream', methods=['GET'])
+def search_job_stream(job_id):
+    """Streams matches as they are found: NDJSON by default, ?format=sse for Server-Sent Events."""
+    job = search_jobs.get(job_id)
+    if job is None:
+        return jsonify({"error": "Unknown job"}), 404
+    fmt = request.args.get('format', 'ndjson')
+    mimetype = 'text/event-stream' if fmt == 'sse' else 'application/x-ndjson'
+    return Response(job.stream(fmt), mimetype=mimetype, headers={"Cache-Control": "no-cache",
+                                                                 "X-Accel-Buffering": "no"})
+
+@app.route('/search_jobs/<job_id>', methods=['DELETE'])
+def cancel_search_job(job_id):
+    job = search_jobs.cancel(job_id)
+    if job is None:
+        return jsonify({"error": "Unknown job"}), 404
+    return jsonify({**job.progress(), "cancel_requested": True})
+
+def _refresh_video_index():
+    try:
+        video_index.refresh()
+    finally:
+        indexing_lock.release()
+
+@app.route('/index_recordings', methods=['POST'])
+def index_recordings():
+    """Starts an incremental index refresh of Data/recordings in the background."""
+    if not indexing_lock.acquire(blocking=False):
+        return jsonify({"status": "already running"}), 409
+    pending, removed = video_index.stale_videos()
+    threading.Thread(target=_refresh_video_index, daemon=True).start()
+    return jsonify({"status": "started", "pending_videos": pending, "removed_videos": removed}), 202
+
+@app.route('/logs', methods=['GET'])
+def logs():
+    """
+    Logged sightings, newest first. Filters: person, camera_id, status (Known/Unknown),
+    since/until (Unix seconds), limit, offset.
+    """
+    events = get_event_log().fetch_logs(
+        person_id=request.args.get('person'),
+        camera_id=request.args.get('camera_id', type=int),
+        status=request.args.get('status'),
+        start=request.args.get('since', type=float),
+        end=request.args.get('until', type=float),
+        limit=min(request.args.get('limit', 100, type=int), 1000),
+        offset=request.args.get('offset', 0, type=int),
+    )
+    return jsonify({"logs": events})
 
-        # Using the first face found in the image as the target
-        target_embedding = face_encodings[0]
+@app.route('/cameras', methods=['POST'])
+def register_camera():
+    """Registers a camera by its location and returns its CameraID."""
+    location = request.form.get('location') or (request.get_json(silent=True) or {}).get('location')
+    if not location:
+        return jsonify({"error": "Missing location"}), 400
+    return jsonify(get_event_log().get_camera(get_event_log().add_camera(location))), 201
 
-        # Call the search function
-        matches = search_for_face_in_videos(target_embedding, VIDEOS_DIR)
+@app.route('/cameras/<int:camera_id>', methods=['GET'])
+def camera(camera_id):
+    info = get_event_log().get_camera(camera_id)
+    if info is None:
+        return jsonify({"error": "Unknown camera"}), 404
+    return jsonify(info)
 
-        return jsonify({"matches": matches})
+@app.route('/metrics', methods=['GET'])
+def metrics_route():
+    """Per-stage and per-endpoint latency histograms, counters and cache hit rates in Prometheus text format."""
+    lines = metrics.prometheus().splitlines()
+    cache_stats = {"upload": upload_cache.stats(), "search": search_cache.stats()}
+    # Each metric's samples must be grouped under its TYPE line
+    for metric, key, kind in (("face_cache_hits_total", "hits", "counter"),
+                              ("face_cache_misses_total", "misses", "counter"),
+                              ("face_cache_entries", "entries", "gauge")):
+        lines.append(f"# TYPE {metric} {kind}")
+        lines.extend(f'{metric}{{cache="{name}"}} {stats[key]}' for name, stats in cache_stats.items())
+    lines.append("# TYPE face_gallery_generation gauge")
+    lines.append(f"face_gallery_generation {gallery.snapshot()[1]}")
+    return Response("\n".join(lines) + "\n", mimetype='text/plain; version=0.0.4')
 
 if __name__ == '__main__':
     app.run(host='0.0.0.0', port=5000, debug=True)
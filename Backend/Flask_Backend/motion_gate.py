@@ -0,0 +1,98 @@
+import cv2
+import numpy as np
+
+from Backend import config
+
+
+class MotionGate:
+    """
+    Decides whether a sampled video frame is worth running the face detector on.
+
+    Each frame is shrunk to a tiny grayscale thumbnail and compared with a
+    background model that adapts at a fixed rate per second of video, however
+    densely the frames are sampled. A pixel only counts as moving if it also
+    differs from the previous sample, so the trail someone who left still has in
+    the background does not keep the gate open. Frames where almost nothing
+    moves are static and can be skipped. A frame where most of the picture
+    changed is a scene change (cut, camera moved, lights switched) and resets the
+    background. Someone standing still is absorbed into the background after a
+    while, so the detector is still forced to run at least every `max_skip` samples.
+    """
+
+    def __init__(self, width=None, pixel_delta=None, min_changed=None, max_skip=None,
+                 learning_rate=0.5, scene_change=0.6):
+        """
+        Args:
+            width (int): Thumbnail width, defaults to config.VIDEO_GATE_WIDTH.
+            pixel_delta (int): Gray-level difference that counts a pixel as changed,
+                defaults to config.VIDEO_GATE_PIXEL_DELTA.
+            min_changed (float): Fraction of changed pixels that counts as motion,
+                defaults to config.VIDEO_GATE_MIN_CHANGED.
+            max_skip (int): Consecutive static samples after which a frame is checked
+                anyway, defaults to config.VIDEO_GATE_MAX_SKIP.
+            learning_rate (float): Fraction of the background model replaced by the
+                current picture per second of video.
+            scene_change (float): Fraction of changed pixels that resets the background.
+        """
+        self.width = width or config.VIDEO_GATE_WIDTH
+        self.pixel_delta = config.VIDEO_GATE_PIXEL_DELTA if pixel_delta is None else pixel_delta
+        self.min_changed = config.VIDEO_GATE_MIN_CHANGED if min_changed is None else min_changed
+        self.max_skip = config.VIDEO_GATE_MAX_SKIP if max_skip is None else max_skip
+        self.learning_rate = learning_rate
+        self.scene_change = scene_change
+        self.background = None
+        self.previous = None
+        self.last_timestamp = None
+        self.skipped_in_row = 0
+        self.was_moving = False
+        # Whether the last checked frame changed: the first frame, a scene change or motion
+        self.changed = False
+
+    def _thumbnail(self, frame):
+        height, width = frame.shape[:2]
+        size = (self.width, max(1, int(round(height * self.width / float(width)))))
+        gray = cv2.cvtColor(cv2.resize(frame, size, interpolation=cv2.INTER_AREA), cv2.COLOR_BGR2GRAY)
+        return cv2.GaussianBlur(gray, (3, 3), 0).astype(np.float32)
+
+    def check(self, frame, timestamp=None):
+        """
+        Args:
+            frame (np.ndarray): BGR frame.
+            timestamp (float): Video time of the frame in seconds; without it every
+                frame counts as one second after the previous one.
+
+        Returns:
+            tuple: (run_detector, motion_started). `motion_started` is True on the
+            first moving frame after a static stretch (or a scene change). The
+            first frame is always checked and seeds the background.
+        """
+        thumbnail = self._thumbnail(frame)
+        if timestamp is None or self.last_timestamp is None:
+            elapsed = 1.0
+        else:
+            elapsed = max(timestamp - self.last_timestamp, 0.0)
+        self.last_timestamp = timestamp
+        previous, self.previous = self.previous, thumbnail
+        if self.background is None or self.background.shape != thumbnail.shape:
+            self.background = thumbnail.copy()
+            self.skipped_in_row = 0
+            self.was_moving = False
+            self.changed = True
+            return True, False
+
+        differs = np.abs(thumbnail - self.background) > self.pixel_delta
+        changed = float(np.mean(differs & (np.abs(thumbnail - previous) > self.pixel_delta)))
+        if np.mean(differs) >= self.scene_change:
+            self.background = thumbnail.copy()
+        else:
+            cv2.accumulateWeighted(thumbnail, self.background, 1.0 - (1.0 - self.learning_rate) ** elapsed)
+
+        moving = changed >= self.min_changed
+        self.changed = moving
+        motion_started = moving and not self.was_moving
+        self.was_moving = moving
+        if moving or self.skipped_in_row >= self.max_skip:
+            self.skipped_in_row = 0
+            return True, motion_started
+        self.skipped_in_row += 1
+        return False, False
@@ -0,0 +1,85 @@
+import time
+import hashlib
+import threading
+from collections import OrderedDict
+import numpy as np
+
+
+def content_key(data):
+    """Hash of an upload's bytes, so re-submitted photos hit the cache whatever their filename."""
+    return hashlib.blake2b(data, digest_size=16).hexdigest()
+
+
+def embedding_key(targets, quantum=0.01):
+    """
+    Hash of search targets rounded to a grid of `quantum`, so the same person
+    cropped or re-encoded slightly differently maps to the same key.
+
+    Args:
+        targets (list): 128-d embeddings or (k, 128) arrays, as accepted by video_search.stack_targets.
+    """
+    digest = hashlib.blake2b(digest_size=16)
+    for target in targets:
+        rows = np.atleast_2d(np.asarray(target, dtype=np.float64))
+        digest.update(np.int32(len(rows)).tobytes())
+        digest.update(np.round(rows / quantum).astype(np.int32).tobytes())
+    return digest.hexdigest()
+
+
+class ResultCache:
+    """Thread-safe LRU cache whose entries also expire `ttl` seconds after they were stored."""
+
+    def __init__(self, max_entries, ttl):
+        """
+        Args:
+            max_entries (int): Entries kept before the least recently used is evicted; 0 disables the cache.
+            ttl (float): Seconds an entry stays valid.
+        """
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self.hits = 0
+        self.misses = 0
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        """Returns the cached value, or None on a miss or an expired entry."""
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and time.monotonic() - entry[0] <= self.ttl:
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return entry[1]
+            if entry is not None:
+                del self._entries[key]
+            self.misses += 1
+            return None
+
+    def put(self, key, value):
+        if self.max_entries <= 0:
+            return
+        with self._lock:
+            self._entries[key] = (time.monotonic(), value)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def get_or_compute(self, key, compute):
+        """
+        Returns the cached value for `key`, calling `compute()` and caching its
+        result on a miss. Exceptions are not cached. Concurrent misses for the same
+        key may both compute; the last result wins.
+        """
+        value = self.get(key)
+        if value is None:
+            value = compute()
+            self.put(key, value)
+        return value
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def stats(self):
+        with self._lock:
+            return {"entries": len(self._entries), "hits": self.hits, "misses": self.misses}
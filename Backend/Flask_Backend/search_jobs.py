@@ -0,0 +1,219 @@
+import json
+import time
+import uuid
+import threading
+from concurrent.futures import ThreadPoolExecutor, FIRST_COMPLETED, wait
+
+from Backend import config
+from Backend.metrics import metrics
+from Backend.Flask_Backend.video_search import (find_appearances, format_matches, get_pool, plan_chunks,
+                                                resolve_workers, scan_chunk, scan_chunk_in_worker, split_by_target)
+
+FINISHED_STATES = ("done", "cancelled", "failed")
+
+
+class SearchJob:
+    """
+    State of one background search: progress counters, the matches found so far and
+    a condition that streaming clients wait on for new results.
+    """
+
+    def __init__(self, targets, recognizer=None):
+        self.id = uuid.uuid4().hex
+        self.targets = targets
+        self.recognizer = recognizer
+        self.status = "queued"
+        self.error = None
+        self.created_at = time.time()
+        self.finished_at = None
+        self.matches = []
+        self.appearances = None
+        self.videos_total = 0
+        self.videos_done = 0
+        self.chunks_total = 0
+        self.chunks_done = 0
+        self.frames_done = 0
+        self.frames_skipped = 0
+        self.cancel_event = threading.Event()
+        self._changed = threading.Condition()
+
+    @property
+    def finished(self):
+        return self.status in FINISHED_STATES
+
+    def progress(self):
+        return {
+            "job_id": self.id,
+            "status": self.status,
+            "error": self.error,
+            "videos_done": self.videos_done,
+            "videos_total": self.videos_total,
+            "chunks_done": self.chunks_done,
+            "chunks_total": self.chunks_total,
+            "frames_done": self.frames_done,
+            "frames_skipped": self.frames_skipped,
+            "matches_found": len(self.matches),
+        }
+
+    def update(self, **fields):
+        """Applies field changes and wakes up any streaming client."""
+        with self._changed:
+            for name, value in fields.items():
+                setattr(self, name, value)
+            if self.finished and self.finished_at is None:
+                self.finished_at = time.time()
+            self._changed.notify_all()
+
+    def add_results(self, matches, stats, video_finished):
+        with self._changed:
+            self.matches.extend(matches)
+            self.chunks_done += 1
+            self.frames_done += stats["sampled_frames"]
+            self.frames_skipped += stats["skipped_frames"]
+            self.videos_done += int(video_finished)
+            self._changed.notify_all()
+
+    def wait_for_update(self, seen_matches, seen_chunks, timeout):
+        """Blocks until there are new matches, new progress or the job has finished."""
+        with self._changed:
+            self._changed.wait_for(lambda: len(self.matches) > seen_matches or self.chunks_done > seen_chunks
+                                   or self.finished, timeout)
+
+    def stream(self, fmt="ndjson", heartbeat=15.0):
+        """
+        Yields matches as they are found, progress updates, and a final status event.
+
+        Args:
+            fmt (str): "ndjson" (one JSON object per line) or "sse" (text/event-stream).
+            heartbeat (float): Seconds between progress events while nothing changes.
+        """
+        def encode(event, payload):
+            if fmt == "sse":
+                return f"event: {event}\ndata: {json.dumps(payload)}\n\n"
+            return json.dumps({"event": event, **payload}) + "\n"
+
+        seen_matches = seen_chunks = 0
+        while True:
+            self.wait_for_update(seen_matches, seen_chunks, heartbeat)
+            finished = self.finished
+            new_matches = self.matches[seen_matches:]
+            seen_matches += len(new_matches)
+            for match in new_matches:
+                yield encode("match", match)
+            seen_chunks = self.chunks_done
+            if finished:
+                yield encode("done", {**self.progress(), "appearances": self.appearances})
+                return
+            yield encode("progress", self.progress())
+
+
+class SearchJobManager:
+    """
+    Runs `/search_by_photo` scans as background jobs.
+
+    Each job plans the frame-range chunks of every recording and fans them out over
+    the shared video-search process pool; results are appended to the job as each
+    chunk completes so clients can poll or stream them. When the scan completes the
+    matches are merged into appearance intervals, one list per target. Cancelling a
+    job, or one of its chunks failing, drops its queued chunks; chunks already
+    running finish but their results are discarded.
+    """
+
+    def __init__(self, videos_directory, recognizer_getter, max_concurrent_jobs=None, job_ttl=None):
+        """
+        Args:
+            videos_directory (str): Directory with the recordings.
+            recognizer_getter (callable): Returns the recognizer used to name matches.
+            max_concurrent_jobs (int): Jobs running at once, defaults to config.SEARCH_JOB_CONCURRENCY.
+            job_ttl (float): Seconds finished jobs are kept, defaults to config.SEARCH_JOB_TTL.
+        """
+        self.videos_directory = videos_directory
+        self.recognizer_getter = recognizer_getter
+        self.job_ttl = config.SEARCH_JOB_TTL if job_ttl is None else job_ttl
+        self._executor = ThreadPoolExecutor(max_workers=max_concurrent_jobs or config.SEARCH_JOB_CONCURRENCY,
+                                            thread_name_prefix="SearchJob")
+        self._jobs = {}
+        self._lock = threading.Lock()
+
+    def submit(self, targets, recognizer=None):
+        """
+        Queues a search and returns its SearchJob immediately.
+
+        Args:
+            targets (list): Targets as accepted by video_search.stack_targets; matches
+                carry the index of the target they matched.
+            recognizer (FaceRecognizer): Gallery snapshot the targets were read from, used
+                to name matches; defaults to the one `recognizer_getter` returns when the job starts.
+        """
+        job = SearchJob(targets, recognizer)
+        with self._lock:
+            self._prune()
+            self._jobs[job.id] = job
+        self._executor.submit(self._run, job)
+        return job
+
+    def get(self, job_id):
+        with self._lock:
+            return self._jobs.get(job_id)
+
+    def cancel(self, job_id):
+        job = self.get(job_id)
+        if job is not None and not job.finished:
+            job.cancel_event.set()
+        return job
+
+    def _prune(self):
+        now = time.time()
+        expired = [job_id for job_id, job in self._jobs.items()
+                   if job.finished and now - job.finished_at > self.job_ttl]
+        for job_id in expired:
+            del self._jobs[job_id]
+
+    def _run(self, job):
+        if job.cancel_event.is_set():
+            job.update(status="cancelled")
+            return
+        try:
+            chunks = plan_chunks(self.videos_directory, config.VIDEO_CHUNK_SECONDS)
+            remaining = {}
+            for video_filename, _, _ in chunks:
+                remaining[video_filename] = remaining.get(video_filename, 0) + 1
+            job.update(status="running", chunks_total=len(chunks), videos_total=len(remaining))
+            recognizer = job.recognizer or self.recognizer_getter()
+
+            workers = resolve_workers()
+            if workers <= 1:
+                for video_filename, start, end in chunks:
+                    if job.cancel_event.is_set():
+                        break
+                    found, stats = scan_chunk(self.videos_directory, video_filename, start, end, job.targets)
+                    remaining[video_filename] -= 1
+                    job.add_results(format_matches(found, recognizer), stats, remaining[video_filename] == 0)
+            else:
+                pool = get_pool(workers)
+                pending = {pool.submit(scan_chunk_in_worker, self.videos_directory, video_filename, start, end,
+                                       job.targets): video_filename
+                           for video_filename, start, end in chunks}
+                try:
+                    while pending and not job.cancel_event.is_set():
+                        done, _ = wait(pending, timeout=0.5, return_when=FIRST_COMPLETED)
+                        for future in done:
+                            video_filename = pending.pop(future)
+                            found, stats, worker_metrics = future.result()
+                            metrics.merge(worker_metrics)
+                            remaining[video_filename] -= 1
+                            job.add_results(format_matches(found, recognizer), stats, remaining[video_filename] == 0)
+                finally:
+                    # On cancel or a failed chunk, free the shared pool for other jobs
+                    for future in pending:
+                        future.cancel()
+
+            if job.cancel_event.is_set():
+                job.update(status="cancelled")
+            else:
+                per_target = split_by_target(list(job.matches), len(job.targets))
+                job.update(status="done", appearances=[find_appearances(matches, self.videos_directory, target)
+                                                       for matches, target in zip(per_target, job.targets)])
+        except Exception as e:
+            print(f"[!] Search job {job.id} failed: {e}")
+            job.update(status="failed", error=str(e))
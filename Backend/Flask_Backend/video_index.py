@@ -0,0 +1,268 @@
+"""
+Offline face index of the recordings.
+
+Each recording is decoded once; every face found on a sampled frame is stored as
+one row of (video, timestamp, bounding box, embedding). `/search_by_photo` then
+answers a query with a single vectorized distance pass over the memory-mapped
+index instead of re-decoding every video.
+
+Usage:
+    python Backend/Flask_Backend/video_index.py [videos_dir] [index_dir]
+"""
+import os
+import sys
+import json
+import numpy as np
+
+# Add project root to the Python path
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..', '..')))
+
+from Backend.metrics import metrics
+from Backend.face_recognition.embedding_store import EMBEDDING_DIM, append_committed, write_durable, write_json_atomic
+from Backend.Flask_Backend.video_search import (format_gate_stats, iter_sampled_faces, list_videos, new_gate_stats,
+                                                stack_targets)
+
+EMBEDDINGS_FILE = "faces{}.f32"
+META_FILE = "faces_meta{}.bin"
+CATALOG_FILE = "videos.json"
+
+META_DTYPE = np.dtype([
+    ("video_id", "<i4"),
+    ("timestamp", "<f4"),
+    ("top", "<i4"),
+    ("right", "<i4"),
+    ("bottom", "<i4"),
+    ("left", "<i4"),
+])
+
+# Rewrite the index once more than this fraction of its rows belongs to replaced videos
+COMPACT_DEAD_FRACTION = 0.5
+
+
+class VideoFaceIndex:
+    """
+    Append-only, memory-mappable index of the faces in a directory of recordings.
+
+    Files in the index directory:
+    - `faces.f32`: one float32 embedding per detected face.
+    - `faces_meta.bin`: a parallel META_DTYPE record (video id, timestamp, bbox).
+    - `videos.json`: catalog of indexed videos (id, mtime, size), the committed row
+      count and the generation of the data files.
+
+    A video whose mtime or size changed is re-indexed under a new id; the rows of
+    the old id are ignored at query time and dropped when the index is compacted.
+    Compaction writes a new generation of data files (`faces.<n>.f32`,
+    `faces_meta.<n>.bin`) and switches to it by replacing the catalog, so the
+    catalog always describes files that exist and are fully written.
+    """
+
+    def __init__(self, index_directory, videos_directory):
+        self.index_directory = index_directory
+        self.videos_directory = videos_directory
+        self.catalog_file = os.path.join(index_directory, CATALOG_FILE)
+
+    def data_files(self, generation=0):
+        """Returns the (embeddings, meta) file paths of a generation; generation 0 has the unnumbered names."""
+        suffix = f".{generation}" if generation else ""
+        return (os.path.join(self.index_directory, EMBEDDINGS_FILE.format(suffix)),
+                os.path.join(self.index_directory, META_FILE.format(suffix)))
+
+    def read_catalog(self):
+        if not os.path.exists(self.catalog_file):
+            return {"count": 0, "next_video_id": 0, "generation": 0, "videos": {}}
+        with open(self.catalog_file, 'r', encoding='utf-8') as f:
+            return json.load(f)
+
+    def version(self):
+        """Version stamp of the index: the catalog file is replaced on every commit."""
+        try:
+            stat = os.stat(self.catalog_file)
+        except FileNotFoundError:
+            return None
+        return stat.st_ino, stat.st_mtime_ns, stat.st_size
+
+    def load(self):
+        """
+        Memory-maps the committed rows.
+
+        Returns:
+            tuple: (embeddings (N, 128) float32, meta (N,) META_DTYPE, catalog dict).
+        """
+        catalog = self.read_catalog()
+        count = catalog["count"]
+        if count == 0:
+            return np.empty((0, EMBEDDING_DIM), dtype=np.float32), np.empty(0, dtype=META_DTYPE), catalog
+        embeddings_file, meta_file = self.data_files(catalog.get("generation", 0))
+        embeddings = np.memmap(embeddings_file, dtype=np.float32, mode='r', shape=(count, EMBEDDING_DIM))
+        meta = np.memmap(meta_file, dtype=META_DTYPE, mode='r', shape=(count,))
+        return embeddings, meta, catalog
+
+    def stale_videos(self):
+        """Returns (new or changed filenames, removed filenames) compared to the catalog."""
+        catalog = self.read_catalog()
+        current = {}
+        if os.path.exists(self.videos_directory):
+            for filename in list_videos(self.videos_directory):
+                stat = os.stat(os.path.join(self.videos_directory, filename))
+                current[filename] = (stat.st_mtime, stat.st_size)
+
+        changed = [f for f, (mtime, size) in current.items()
+                   if f not in catalog["videos"]
+                   or catalog["videos"][f]["mtime"] != mtime or catalog["videos"][f]["size"] != size]
+        removed = [f for f in catalog["videos"] if f not in current]
+        return changed, removed
+
+    def refresh(self):
+        """
+        Indexes new or changed recordings and forgets deleted ones.
+
+        Returns:
+            int: Number of videos (re)indexed.
+        """
+        os.makedirs(self.index_directory, exist_ok=True)
+        changed, removed = self.stale_videos()
+        catalog = self.read_catalog()
+        embeddings_file, meta_file = self.data_files(catalog.get("generation", 0))
+        for filename in removed:
+            del catalog["videos"][filename]
+
+        for filename in changed:
+            video_path = os.path.join(self.videos_directory, filename)
+            stat = os.stat(video_path)
+            video_id = catalog["next_video_id"]
+            rows, meta = [], []
+            stats = new_gate_stats()
+            for timestamp, locations, encodings in iter_sampled_faces(video_path, stats=stats):
+                for (top, right, bottom, left), encoding in zip(locations, encodings):
+                    rows.append(encoding)
+                    meta.append((video_id, timestamp, top, right, bottom, left))
+
+            count = catalog["count"]
+            append_committed(embeddings_file,
+                             np.asarray(rows, dtype=np.float32).reshape(-1, EMBEDDING_DIM).tobytes(),
+                             count * EMBEDDING_DIM * 4)
+            append_committed(meta_file, np.array(meta, dtype=META_DTYPE).tobytes(), count * META_DTYPE.itemsize)
+            catalog["count"] = count + len(rows)
+            catalog["next_video_id"] = video_id + 1
+            catalog["videos"][filename] = {"id": video_id, "mtime": stat.st_mtime, "size": stat.st_size}
+            # Commit after each video so an interrupted refresh keeps its progress
+            write_json_atomic(self.catalog_file, catalog)
+            print(f"[*] Indexed {len(rows)} faces in {filename}: {format_gate_stats(stats)}.")
+
+        if removed and not changed:
+            write_json_atomic(self.catalog_file, catalog)
+        self._maybe_compact()
+        return len(changed)
+
+    def _maybe_compact(self):
+        embeddings, meta, catalog = self.load()
+        if len(meta) == 0:
+            return
+        live = np.isin(meta["video_id"], [v["id"] for v in catalog["videos"].values()])
+        if np.mean(~live) <= COMPACT_DEAD_FRACTION:
+            return
+
+        live_embeddings, live_meta = np.array(embeddings[live]), np.array(meta[live])
+        del embeddings, meta
+        old_generation = catalog.get("generation", 0)
+        generation = old_generation + 1
+        for path, array in zip(self.data_files(generation), (live_embeddings, live_meta)):
+            write_durable(path, array.tobytes())
+        catalog["count"] = len(live_meta)
+        catalog["generation"] = generation
+        # Replacing the catalog is the single commit point: readers and a crash before it see
+        # the old generation, everything after it sees the new one
+        write_json_atomic(self.catalog_file, catalog)
+        self._remove_generation(old_generation)
+        print(f"[*] Compacted video index to {len(live_meta)} faces.")
+
+    def _remove_generation(self, generation):
+        for path in self.data_files(generation):
+            try:
+                os.remove(path)
+            except FileNotFoundError:
+                pass
+            except OSError as e:
+                # Still mapped by a reader on Windows; it is no longer referenced, only wasted space
+                print(f"[!] Could not remove old index file {path}: {e}")
+
+    def query_many(self, targets, tolerance=0.6, recognizer=None, block_rows=65536):
+        """
+        Finds the indexed faces within `tolerance` of each target, in one pass over the index.
+
+        Args:
+            targets (list): One entry per target: a 128-d embedding, or a (k, 128) array
+                of embeddings of the same person.
+            tolerance (float): Maximum euclidean distance that counts as a match.
+            recognizer (FaceRecognizer): If given, matched faces are also named against the gallery.
+            block_rows (int): Index rows compared per matrix operation, bounding memory use.
+
+        Returns:
+            list[list[dict]]: One list of matches per target, ordered by video and timestamp.
+        """
+        embeddings, meta, catalog = self.load()
+        if len(meta) == 0:
+            return [[] for _ in targets]
+        filenames = {v["id"]: f for f, v in catalog["videos"].items()}
+
+        target_matrix, target_groups = stack_targets(targets)
+        target_matrix = target_matrix.astype(np.float32)
+        target_sq = np.einsum('ij,ij->i', target_matrix, target_matrix)
+        live = np.isin(meta["video_id"], list(filenames))
+        hit_rows, hit_targets, hit_distances = [], [], []
+        with metrics.timer("match"):
+            for start in range(0, len(meta), block_rows):
+                block = np.asarray(embeddings[start:start + block_rows])
+                sq = (np.einsum('ij,ij->i', block, block)[:, None] + target_sq[None, :]
+                      - 2.0 * block @ target_matrix.T)
+                # Per target, the distance to its closest row
+                best = np.full((len(targets), len(block)), np.inf, dtype=np.float32)
+                np.minimum.at(best, target_groups, np.sqrt(np.maximum(sq, 0.0)).T)
+                targets_hit, rows = np.nonzero((best <= tolerance) & live[start:start + len(block)])
+                hit_rows.append(rows + start)
+                hit_targets.append(targets_hit)
+                hit_distances.append(best[targets_hit, rows])
+        hit_rows, hit_targets = np.concatenate(hit_rows), np.concatenate(hit_targets)
+        hit_distances = np.concatenate(hit_distances)
+
+        unique_rows = np.unique(hit_rows)
+        names = recognizer.recognize_many(embeddings[unique_rows]) if recognizer is not None and len(unique_rows) else []
+        name_of = {int(row): names[i][0] for i, row in enumerate(unique_rows)} if recognizer is not None else {}
+
+        results = []
+        for target in range(len(targets)):
+            selected = np.flatnonzero(hit_targets == target)
+            rows = hit_rows[selected]
+            order = np.lexsort((meta["timestamp"][rows], meta["video_id"][rows]))
+            matches = []
+            for i in order:
+                row = int(rows[i])
+                record = meta[row]
+                match_data = {
+                    "video_file": filenames[int(record["video_id"])],
+                    "timestamp_seconds": round(float(record["timestamp"]), 2),
+                    "distance": round(float(hit_distances[selected[i]]), 4),
+                    "bbox": [int(record["top"]), int(record["right"]), int(record["bottom"]), int(record["left"])],
+                    "target": target,
+                }
+                if recognizer is not None:
+                    match_data["recognized_as"] = name_of[row]
+                matches.append(match_data)
+            results.append(matches)
+        return results
+
+    def query(self, target_embedding, tolerance=0.6, recognizer=None):
+        """
+        Finds every indexed face within `tolerance` of the target in one distance pass.
+
+        Returns:
+            list[dict]: Matches ordered by video and timestamp.
+        """
+        return self.query_many([target_embedding], tolerance, recognizer)[0]
+
+if __name__ == "__main__":
+    base_dir = os.path.abspath(os.path.join(os.path.dirname(__file__), '..', '..'))
+    videos_dir = sys.argv[1] if len(sys.argv) > 1 else os.path.join(base_dir, 'Data', 'recordings')
+    index_dir = sys.argv[2] if len(sys.argv) > 2 else os.path.join(base_dir, 'Data', 'video_index')
+    indexed = VideoFaceIndex(index_dir, videos_dir).refresh()
+    print(f"[*] Video index up to date ({indexed} videos indexed).")
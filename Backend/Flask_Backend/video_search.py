@@ -1,71 +1,598 @@
 import os
 import cv2
-import face_recognition
+import threading
+import numpy as np
+from concurrent.futures import ProcessPoolExecutor
 
 # Add project root to the Python path to allow importing the recognizer
 import sys
 sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..', '..')))
-from Backend.face_recognition.recognizer import FaceRecognizer
+from Backend import config
+from Backend.metrics import metrics
+from Backend.face_recognition.gallery_snapshot import get_gallery
+from Backend.face_recognition.detection import AdaptiveDetector
+from Backend.Flask_Backend.motion_gate import MotionGate
 
-def search_for_face_in_videos(target_embedding, videos_directory):
+VIDEO_EXTENSIONS = ('.mp4', '.avi', '.mov', '.mkv')
+
+_pool = None
+_pool_workers = 0
+# Flask serves requests on several threads; only one of them may create or replace the pool
+_pool_lock = threading.Lock()
+
+
+def list_videos(videos_directory):
+    """Returns the sorted video filenames in a directory."""
+    return sorted(f for f in os.listdir(videos_directory) if f.lower().endswith(VIDEO_EXTENSIONS))
+
+
+def recordings_version(videos_directory):
+    """Version stamp of a recordings directory: (name, mtime, size) of every video, changing when any does."""
+    if not os.path.exists(videos_directory):
+        return ()
+    stamp = []
+    for video_filename in list_videos(videos_directory):
+        stat = os.stat(os.path.join(videos_directory, video_filename))
+        stamp.append((video_filename, stat.st_mtime_ns, stat.st_size))
+    return tuple(stamp)
+
+
+def sample_interval(fps):
+    """Number of frames between samples: one frame per second (approx)."""
+    return int(fps) if fps > 0 else 1
+
+
+class SampleSchedule:
     """
-    Searches for a face matching the target_embedding in all videos within a directory.
+    Frame indices to sample: one per `interval` frames, plus every `dense_interval`
+    frames for a while after `densify` is called (around motion or faces).
+
+    The regular samples fall on the same indices as a plain sequential read
+    wherever a chunk starts. Dense samples depend on what was seen before, so a
+    chunk only reproduces them if it warms up on the frames before its start
+    (see iter_sampled_faces).
     """
-    matches = []
-    recognizer = FaceRecognizer() # We need this to compare against all known faces, though not strictly for this search
 
-    # Ensure the videos directory exists
-    if not os.path.exists(videos_directory):
-        print(f"Error: Directory not found at {videos_directory}")
-        return []
+    def __init__(self, interval, dense_interval=None, dense_frames=0):
+        self.interval = interval
+        self.dense_interval = max(1, dense_interval or interval)
+        self.dense_frames = dense_frames
+        self.dense_until = -1
 
-    for video_filename in os.listdir(videos_directory):
-        # Check for valid video file extensions
-        if not video_filename.lower().endswith(('.mp4', '.avi', '.mov', '.mkv')):
-            continue
+    def first(self, start_frame):
+        # Regular samples fall on the frames whose 1-based number is a multiple of the interval
+        return start_frame + (-(start_frame + 1)) % self.interval
 
-        video_path = os.path.join(videos_directory, video_filename)
-        cap = cv2.VideoCapture(video_path)
-        
-        if not cap.isOpened():
-            print(f"Warning: Could not open video file {video_path}")
-            continue
+    def next(self, frame_index):
+        regular = self.first(frame_index + 1)
+        if frame_index < self.dense_until:
+            return min(frame_index + self.dense_interval, regular)
+        return regular
 
-        frame_count = 0
-        fps = cap.get(cv2.CAP_PROP_FPS)
-        # Process one frame per second (approx)
-        frame_interval = int(fps) if fps > 0 else 1
+    def is_dense(self, frame_index):
+        return frame_index <= self.dense_until
+
+    def is_regular(self, frame_index):
+        return (frame_index + 1) % self.interval == 0
+
+    def densify(self, frame_index):
+        """Samples densely for the next `dense_frames` frames."""
+        self.dense_until = max(self.dense_until, frame_index + self.dense_frames)
+
+
+def iter_sampled_frames(cap, start_frame=0, end_frame=None, seek_min_gap=None, schedule=None):
+    """
+    Yields (frame_index, frame) for roughly one frame per second of an opened capture.
+
+    Frames between samples are skipped with `grab()`, which avoids converting them
+    to BGR images; gaps of at least `seek_min_gap` frames are jumped over with a
+    seek instead. Sampled indices are the same as a plain sequential read, so
+    chunks of one video can be scanned independently and merged.
 
-        while cap.isOpened():
+    Args:
+        cap (cv2.VideoCapture): Opened capture.
+        start_frame (int): First frame index (0-based) of the range to scan.
+        end_frame (int): End of the range (exclusive), None for the end of the video.
+        seek_min_gap (int): Defaults to config.VIDEO_SEEK_MIN_GAP.
+        schedule (SampleSchedule): Sampling plan the caller can densify while
+            iterating; defaults to one sample per second.
+    """
+    seek_min_gap = config.VIDEO_SEEK_MIN_GAP if seek_min_gap is None else seek_min_gap
+    if schedule is None:
+        schedule = SampleSchedule(sample_interval(cap.get(cv2.CAP_PROP_FPS)))
+    position = 0
+    if start_frame > 0:
+        cap.set(cv2.CAP_PROP_POS_FRAMES, start_frame)
+        position = start_frame
+
+    target = schedule.first(start_frame)
+    while end_frame is None or target < end_frame:
+        # Skipping (grab or seek) and reading the sample are both decode time
+        with metrics.timer("decode"):
+            gap = target - position
+            if gap >= seek_min_gap > 0:
+                cap.set(cv2.CAP_PROP_POS_FRAMES, target)
+            else:
+                for _ in range(gap):
+                    if not cap.grab():
+                        return
             ret, frame = cap.read()
-            if not ret:
-                break
+        if not ret:
+            return
+        yield target, frame
+        position = target + 1
+        target = schedule.next(target)
+
+
+def video_detector(resize_factor=0.25, escalate_empty=None):
+    """
+    The AdaptiveDetector used on recording frames, with the video scale limits from config.
+
+    Args:
+        escalate_empty (bool): Re-scan frames with no face at higher scales, defaults to
+            config.VIDEO_DETECT_ESCALATE.
+    """
+    escalate_empty = config.VIDEO_DETECT_ESCALATE if escalate_empty is None else escalate_empty
+    return AdaptiveDetector(scale=resize_factor, min_scale=resize_factor,
+                            max_scale=max(config.VIDEO_DETECT_MAX_SCALE, resize_factor),
+                            escalate_empty=escalate_empty)
+
+
+def new_gate_stats():
+    """Counters filled in by iter_sampled_faces."""
+    return {"sampled_frames": 0, "skipped_frames": 0, "dense_frames": 0}
 
-            frame_count += 1
-            if frame_count % frame_interval != 0:
+
+def iter_sampled_faces(video_path, resize_factor=0.25, start_frame=0, end_frame=None, motion_gate=None,
+                       stats=None):
+    """
+    Samples roughly one frame per second of a video and finds the faces in it.
+
+    Frames are searched at `resize_factor`; small faces are re-detected on an
+    upscaled crop up to config.VIDEO_DETECT_MAX_SCALE. A frame where the coarse
+    pass finds nothing is searched again at higher scales if the motion gate saw
+    it change (something entered, too small for the coarse pass), or always with
+    config.VIDEO_DETECT_ESCALATE.
+
+    With the motion gate on, static frames are not sent to the detector at all,
+    and sampling becomes denser (config.VIDEO_DENSE_FPS) for config.VIDEO_DENSE_SECONDS
+    after motion starts or a face is found, so short appearances are not missed.
+    A chunk starting past the beginning of the video first runs the gate and the
+    detector over a warm-up of that many seconds (plus one sample) before
+    `start_frame`, without yielding anything, so the gate background and any
+    dense sampling carry over the boundary as in a scan of the whole video.
+
+    Args:
+        motion_gate (bool): Defaults to config.VIDEO_MOTION_GATE.
+        stats (dict): Optional counters (see new_gate_stats) updated in place.
+
+    Yields:
+        tuple: (timestamp_seconds, face_locations, face_encodings) for every sampled
+        frame that reached the detector. Locations are (top, right, bottom, left)
+        in full-resolution pixels.
+    """
+    cap = cv2.VideoCapture(video_path)
+    if not cap.isOpened():
+        print(f"Warning: Could not open video file {video_path}")
+        return
+
+    motion_gate = config.VIDEO_MOTION_GATE if motion_gate is None else motion_gate
+    stats = new_gate_stats() if stats is None else stats
+    detector = video_detector(resize_factor)
+    escalating_detector = video_detector(resize_factor, escalate_empty=True)
+    fps = cap.get(cv2.CAP_PROP_FPS)
+    if motion_gate and fps > 0:
+        gate = MotionGate()
+        schedule = SampleSchedule(sample_interval(fps), int(fps / max(config.VIDEO_DENSE_FPS, 1)),
+                                  int(config.VIDEO_DENSE_SECONDS * fps))
+    else:
+        gate = None
+        schedule = SampleSchedule(sample_interval(fps))
+    scan_from = start_frame
+    if gate is not None and start_frame > 0:
+        scan_from = max(0, start_frame - schedule.dense_frames - schedule.interval)
+    try:
+        for frame_index, frame in iter_sampled_frames(cap, scan_from, end_frame, schedule=schedule):
+            warming_up = frame_index < start_frame
+            if not warming_up:
+                stats["sampled_frames"] += 1
+                if not schedule.is_regular(frame_index):
+                    stats["dense_frames"] += 1
+            if gate is not None:
+                # The gate still sees dense samples to keep its background current, but never skips them
+                with metrics.timer("motion_gate"):
+                    run_detector, motion_started = gate.check(frame, frame_index / fps)
+                if motion_started:
+                    schedule.densify(frame_index)
+                if not run_detector and not schedule.is_dense(frame_index):
+                    if not warming_up:
+                        stats["skipped_frames"] += 1
+                    continue
+
+            # Find all faces in the current frame; changed frames may hold faces too small for the coarse pass
+            frame_detector = escalating_detector if gate is not None and gate.changed else detector
+            face_locations, face_encodings = frame_detector.detect(frame)
+            if gate is not None and face_locations:
+                schedule.densify(frame_index)
+            if warming_up:
+                # Only primes the gate and the schedule; the previous chunk reports these frames
                 continue
 
-            # Resize frame for faster processing
-            small_frame = cv2.resize(frame, (0, 0), fx=0.25, fy=0.25)
-            rgb_small_frame = small_frame[:, :, ::-1]
-
-            # Find all faces in the current frame
-            face_locations = face_recognition.face_locations(rgb_small_frame)
-            face_encodings = face_recognition.face_encodings(rgb_small_frame, face_locations)
-
-            for face_encoding in face_encodings:
-                # See if the face is a match for the target face
-                results = face_recognition.compare_faces([target_embedding], face_encoding)
-                if results[0]:
-                    timestamp = frame_count / fps if fps > 0 else 0
-                    match_data = {
-                        "video_file": video_filename,
-                        "timestamp_seconds": round(timestamp, 2),
-                        "recognized_as": recognizer.recognize_face(face_encoding) # Get name if known
-                    }
-                    matches.append(match_data)
-                    print(f"Match found in {video_filename} at {timestamp:.2f} seconds.")
-        
+            timestamp = (frame_index + 1) / fps if fps > 0 else 0
+            yield timestamp, face_locations, face_encodings
+    finally:
         cap.release()
+        metrics.count("video_frames_sampled", stats["sampled_frames"])
+        metrics.count("video_frames_skipped", stats["skipped_frames"])
+
+
+def merge_gate_stats(total, stats):
+    for key, value in stats.items():
+        total[key] = total.get(key, 0) + value
+    return total
+
+
+def format_gate_stats(stats):
+    sampled = stats.get("sampled_frames", 0)
+    skipped = stats.get("skipped_frames", 0)
+    rate = 100.0 * skipped / sampled if sampled else 0.0
+    return (f"sampled {sampled} frames ({stats.get('dense_frames', 0)} extra around motion/faces), "
+            f"skipped {skipped} static ({rate:.1f}%), detected on {sampled - skipped}")
+
+
+def resolve_workers(workers=None):
+    """Worker count from an argument or config.VIDEO_SEARCH_WORKERS; 0 means one per CPU."""
+    workers = config.VIDEO_SEARCH_WORKERS if workers is None else workers
+    return workers or os.cpu_count() or 1
+
+
+def plan_chunks(videos_directory, chunk_seconds):
+    """
+    Splits every video into (filename, start_frame, end_frame) ranges of about `chunk_seconds`.
+
+    Videos whose length is unknown are scanned as one chunk.
+    """
+    chunks = []
+    for video_filename in list_videos(videos_directory):
+        cap = cv2.VideoCapture(os.path.join(videos_directory, video_filename))
+        if not cap.isOpened():
+            print(f"Warning: Could not open video file {video_filename}")
+            continue
+        fps = cap.get(cv2.CAP_PROP_FPS)
+        frame_total = int(cap.get(cv2.CAP_PROP_FRAME_COUNT))
+        cap.release()
+
+        chunk_frames = int(chunk_seconds * fps) if fps > 0 else 0
+        if frame_total <= 0 or chunk_frames <= 0 or frame_total <= chunk_frames:
+            chunks.append((video_filename, 0, None))
+            continue
+        for start in range(0, frame_total, chunk_frames):
+            # The last chunk is left open-ended in case the frame count is an underestimate
+            end = start + chunk_frames if start + chunk_frames < frame_total else None
+            chunks.append((video_filename, start, end))
+    return chunks
+
+
+def stack_targets(targets):
+    """
+    Stacks search targets into one matrix.
+
+    Args:
+        targets (list): One entry per target: a 128-d embedding, or a (k, 128) array
+            of embeddings of the same person (e.g. all their enrolled samples).
+
+    Returns:
+        tuple: ((T, 128) float64 matrix, target index of each row).
+    """
+    rows = [np.atleast_2d(np.asarray(target, dtype=np.float64)) for target in targets]
+    groups = np.concatenate([np.full(len(r), i, dtype=np.int64) for i, r in enumerate(rows)])
+    return np.concatenate(rows), groups
+
+
+def match_targets(encodings, target_matrix, target_groups, target_count, tolerance=0.6):
+    """
+    Matches the faces of one frame against every target in one matrix operation.
 
-    return matches
\ No newline at end of file
+    A face matches a target when it is within `tolerance` of any of the target's rows.
+
+    Returns:
+        list: (face_index, target_index, distance) for every matching pair.
+    """
+    if len(encodings) == 0:
+        return []
+    with metrics.timer("match"):
+        faces = np.asarray(encodings, dtype=np.float64)
+        sq = (np.einsum('ij,ij->i', faces, faces)[:, None]
+              + np.einsum('ij,ij->i', target_matrix, target_matrix)[None, :] - 2.0 * faces @ target_matrix.T)
+        distances = np.sqrt(np.maximum(sq, 0.0))
+        best = np.full((target_count, len(faces)), np.inf)
+        np.minimum.at(best, target_groups, distances.T)
+    return [(int(face), int(target), float(best[target, face]))
+            for target, face in np.argwhere(best <= tolerance)]
+
+
+def scan_chunk(videos_directory, video_filename, start_frame, end_frame, targets, tolerance=0.6):
+    """
+    Scans one frame range of a video for any of the targets; runs in the worker processes.
+
+    Args:
+        targets (list): Targets as accepted by stack_targets.
+
+    Returns:
+        tuple: (found, stats) where `found` lists (video_filename, timestamp, encoding,
+        distance, location, target_index) for every face matching a target and
+        `stats` holds the sampling counters.
+    """
+    target_matrix, target_groups = stack_targets(targets)
+    found = []
+    stats = new_gate_stats()
+    video_path = os.path.join(videos_directory, video_filename)
+    for timestamp, face_locations, face_encodings in iter_sampled_faces(video_path, start_frame=start_frame,
+                                                                        end_frame=end_frame, stats=stats):
+        # See which faces match which targets
+        for face, target, distance in match_targets(face_encodings, target_matrix, target_groups, len(targets),
+                                                    tolerance):
+            found.append((video_filename, timestamp, face_encodings[face], distance, face_locations[face], target))
+    return found, stats
+
+
+def scan_chunk_in_worker(videos_directory, video_filename, start_frame, end_frame, targets, tolerance=0.6):
+    """
+    scan_chunk for the process pool: also returns the worker's stage metrics for
+    the chunk, which the caller merges into its own registry.
+
+    Returns:
+        tuple: (found, stats, metrics snapshot).
+    """
+    # A pool worker runs one chunk at a time, so its registry holds exactly this chunk
+    metrics.reset()
+    found, stats = scan_chunk(videos_directory, video_filename, start_frame, end_frame, targets, tolerance)
+    return found, stats, metrics.snapshot()
+
+
+def format_matches(found, recognizer):
+    """Turns scan_chunk results into match dicts, naming all faces with one recognize_many call."""
+    if not found:
+        return []
+    names = recognizer.recognize_many([item[2] for item in found])  # Get name if known
+    matches = []
+    for (video_filename, timestamp, _, distance, location, target), (name, _) in zip(found, names):
+        matches.append({
+            "video_file": video_filename,
+            "timestamp_seconds": round(timestamp, 2),
+            "distance": round(distance, 4),
+            "bbox": [int(v) for v in location],
+            "recognized_as": name,
+            "target": target,
+        })
+        print(f"Match found in {video_filename} at {timestamp:.2f} seconds.")
+    return matches
+
+
+def merge_appearances(matches, max_gap=None):
+    """
+    Merges per-frame matches into appearance intervals, per video.
+
+    Matches of one video at most `max_gap` seconds apart belong to the same
+    appearance. Each appearance keeps its best (smallest) distance and the
+    timestamp and box of that frame as its representative frame.
+
+    Args:
+        matches (list[dict]): Output of format_matches or VideoFaceIndex.query.
+        max_gap (float): Defaults to config.APPEARANCE_MAX_GAP.
+
+    Returns:
+        list[dict]: Appearances ordered by video and start time.
+    """
+    max_gap = config.APPEARANCE_MAX_GAP if max_gap is None else max_gap
+    appearances = []
+    current = None
+    for match in sorted(matches, key=lambda m: (m["video_file"], m["timestamp_seconds"])):
+        timestamp = match["timestamp_seconds"]
+        if current is None or current["video_file"] != match["video_file"] \
+                or timestamp - current["end_seconds"] > max_gap:
+            current = {"video_file": match["video_file"], "start_seconds": timestamp, "end_seconds": timestamp,
+                       "best_distance": None, "sightings": 0}
+            appearances.append(current)
+        current["end_seconds"] = timestamp
+        current["sightings"] += 1
+        distance = match.get("distance")
+        if current["sightings"] == 1 or (distance is not None and
+                                         (current["best_distance"] is None or distance < current["best_distance"])):
+            current["best_distance"] = distance
+            current["representative_timestamp"] = timestamp
+            current["bbox"] = match.get("bbox")
+            if "recognized_as" in match:
+                current["recognized_as"] = match["recognized_as"]
+    return appearances
+
+
+def refine_appearances(appearances, videos_directory, target_embedding, tolerance=0.6, window=None,
+                       resize_factor=0.25):
+    """
+    Sharpens appearance boundaries to the exact frame by seeking around each edge.
+
+    The sampled start (end) of an appearance is only known to within the sampling
+    interval, so the frames within `window` seconds before the start (after the
+    end) are binary-searched for the first (last) frame where the target is still
+    visible; each edge costs about log2(window * fps) decodes instead of a dense scan.
+
+    Args:
+        appearances (list[dict]): Output of merge_appearances, updated in place.
+        window (float): Seconds searched beyond each edge, defaults to config.APPEARANCE_REFINE_WINDOW.
+
+    Returns:
+        int: Number of frames decoded.
+    """
+    window = config.APPEARANCE_REFINE_WINDOW if window is None else window
+    target = np.atleast_2d(np.asarray(target_embedding, dtype=np.float64))
+    # The target was seen next to these frames, so a miss at the coarse scale is worth a closer look
+    detector = video_detector(resize_factor, escalate_empty=True)
+    decodes = 0
+    by_video = {}
+    for appearance in appearances:
+        by_video.setdefault(appearance["video_file"], []).append(appearance)
+
+    for video_filename, video_appearances in by_video.items():
+        cap = cv2.VideoCapture(os.path.join(videos_directory, video_filename))
+        if not cap.isOpened():
+            print(f"Warning: Could not open video file {video_filename}")
+            continue
+        fps = cap.get(cv2.CAP_PROP_FPS)
+        frame_total = int(cap.get(cv2.CAP_PROP_FRAME_COUNT))
+        if fps <= 0:
+            cap.release()
+            continue
+        window_frames = max(1, int(round(window * fps)))
+        checked = {}
+
+        def present(frame_index):
+            nonlocal decodes
+            if frame_index not in checked:
+                cap.set(cv2.CAP_PROP_POS_FRAMES, frame_index)
+                ret, frame = cap.read()
+                decodes += 1
+                checked[frame_index] = ret and any(np.linalg.norm(target - encoding, axis=1).min() <= tolerance
+                                                   for encoding in detector.detect(frame)[1])
+            return checked[frame_index]
+
+        try:
+            for appearance in video_appearances:
+                # Sample timestamps are (frame_index + 1) / fps
+                first = int(round(appearance["start_seconds"] * fps)) - 1
+                absent, visible = max(first - window_frames - 1, -1), first
+                while visible - absent > 1:
+                    middle = (absent + visible) // 2
+                    if present(middle):
+                        visible = middle
+                    else:
+                        absent = middle
+                appearance["start_seconds"] = round((visible + 1) / fps, 2)
+
+                last = int(round(appearance["end_seconds"] * fps)) - 1
+                visible, absent = last, last + window_frames + 1
+                if frame_total > 0:
+                    absent = min(absent, frame_total)
+                while absent - visible > 1:
+                    middle = (absent + visible) // 2
+                    if present(middle):
+                        visible = middle
+                    else:
+                        absent = middle
+                appearance["end_seconds"] = round((visible + 1) / fps, 2)
+                appearance["refined"] = True
+        finally:
+            cap.release()
+    return decodes
+
+
+def find_appearances(matches, videos_directory, target_embedding, tolerance=0.6, refine=None):
+    """
+    Merges per-frame matches into appearances and, unless disabled, refines their boundaries.
+
+    `target_embedding` may also be a (k, 128) array of one person's embeddings.
+    """
+    appearances = merge_appearances(matches)
+    refine = config.APPEARANCE_REFINE if refine is None else refine
+    if refine and appearances:
+        decodes = refine_appearances(appearances, videos_directory, target_embedding, tolerance)
+        print(f"[*] Refined {len(appearances)} appearances with {decodes} frame decodes.")
+    return appearances
+
+
+def split_by_target(matches, target_count):
+    """Groups match dicts by their "target" index, one list per target."""
+    per_target = [[] for _ in range(target_count)]
+    for match in matches:
+        per_target[match.get("target", 0)].append(match)
+    return per_target
+
+
+def get_pool(workers):
+    """Returns a process pool reused across searches, so workers load dlib's models only once."""
+    global _pool, _pool_workers
+    with _pool_lock:
+        if _pool is None or _pool_workers != workers:
+            if _pool is not None:
+                _pool.shutdown(wait=False)
+            _pool = ProcessPoolExecutor(max_workers=workers)
+            _pool_workers = workers
+        return _pool
+
+
+def _merge_worker_metrics(found, stats, worker_metrics):
+    metrics.merge(worker_metrics)
+    return found, stats
+
+
+def search_for_faces_in_videos(targets, videos_directory, recognizer=None, workers=None, chunk_seconds=None,
+                               tolerance=0.6, aggregate=True):
+    """
+    Searches all videos within a directory for several targets in a single pass.
+
+    Videos are split into frame-range chunks that are scanned in parallel on a
+    process pool; every sampled frame is decoded and encoded once and matched
+    against all targets at once. The matches are merged back in video and
+    timestamp order and, by default, into appearance intervals with refined
+    boundaries (see find_appearances).
+
+    Args:
+        targets (list): One entry per target: a 128-d embedding, or a (k, 128) array
+            of embeddings of the same person.
+        videos_directory (str): Directory with the recordings.
+        recognizer (FaceRecognizer): Names the matched faces; defaults to the shared gallery snapshot.
+        workers (int): Worker processes, defaults to config.VIDEO_SEARCH_WORKERS
+            (0 = one per CPU, 1 = scan in this process).
+        chunk_seconds (float): Chunk length, defaults to config.VIDEO_CHUNK_SECONDS.
+        tolerance (float): Maximum distance that counts as a match.
+        aggregate (bool): Return appearances instead of one match per sampled frame.
+
+    Returns:
+        list[list[dict]]: One result list per target, in target order.
+    """
+    # Ensure the videos directory exists
+    if not os.path.exists(videos_directory):
+        print(f"Error: Directory not found at {videos_directory}")
+        return [[] for _ in targets]
+
+    workers = resolve_workers(workers)
+    chunks = plan_chunks(videos_directory, chunk_seconds or config.VIDEO_CHUNK_SECONDS)
+
+    found = []
+    stats = new_gate_stats()
+    if workers <= 1 or len(chunks) <= 1:
+        results = (scan_chunk(videos_directory, video_filename, start, end, targets, tolerance)
+                   for video_filename, start, end in chunks)
+    else:
+        pool = get_pool(workers)
+        futures = [pool.submit(scan_chunk_in_worker, videos_directory, video_filename, start, end, targets,
+                               tolerance)
+                   for video_filename, start, end in chunks]
+        results = (_merge_worker_metrics(*future.result()) for future in futures)
+    for chunk_found, chunk_stats in results:
+        found.extend(chunk_found)
+        merge_gate_stats(stats, chunk_stats)
+    print(f"[*] Video search for {len(targets)} target(s) {format_gate_stats(stats)}.")
+
+    found.sort(key=lambda item: (item[0], item[1]))
+    if not found:
+        return [[] for _ in targets]
+    if recognizer is None:
+        recognizer = get_gallery().current() # We need this to compare against all known faces, though not strictly for this search
+    per_target = split_by_target(format_matches(found, recognizer), len(targets))
+    if not aggregate:
+        return per_target
+    return [find_appearances(matches, videos_directory, target, tolerance)
+            for matches, target in zip(per_target, targets)]
+
+
+def search_for_face_in_videos(target_embedding, videos_directory, recognizer=None, workers=None,
+                              chunk_seconds=None, tolerance=0.6, aggregate=True):
+    """
+    Searches for a face matching the target_embedding in all videos within a directory.
+
+    Single-target form of search_for_faces_in_videos; returns the appearances
+    (or, with aggregate=False, the per-frame matches) of that face.
+    """
+    return search_for_faces_in_videos([target_embedding], videos_directory, recognizer, workers, chunk_seconds,
+                                      tolerance, aggregate)[0]
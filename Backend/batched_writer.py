@@ -0,0 +1,120 @@
+import time
+import threading
+
+
+class BatchedWriter:
+    """
+    Base class for write-behind persistence: callers queue items in memory and a
+    background thread writes them in batches.
+
+    A batch is written once `batch_size` items are pending or `flush_interval`
+    seconds have passed. A batch whose write raises one of `retry_errors` is put
+    back in front of the queue and retried after `flush_interval`. Subclasses
+    implement `_write_batch` and queue items with `_enqueue` while holding `_lock`,
+    so they can update their own state (journals, dedupe maps) atomically with it.
+    """
+
+    # Exceptions after which a failed batch is retried instead of killing the writer
+    retry_errors = (OSError,)
+
+    def __init__(self, batch_size, flush_interval, thread_name):
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self._lock = threading.Lock()
+        self._wakeup = threading.Condition(self._lock)
+        self._flushed = threading.Condition(self._lock)
+        self._pending = []
+        self._submitted = 0
+        self._written = 0
+        self._stopping = False
+        self._thread = threading.Thread(target=self._run, name=thread_name, daemon=True)
+
+    def _start(self):
+        """Starts the writer thread; called by subclasses once their own state is set up."""
+        self._thread.start()
+
+    def _ensure_open(self):
+        if self._stopping:
+            raise RuntimeError(f"{type(self).__name__} is closed")
+
+    def _enqueue(self, item):
+        """Queues one item; the caller must hold `_lock`."""
+        self._pending.append(item)
+        self._submitted += 1
+        if len(self._pending) >= self.batch_size:
+            self._wakeup.notify()
+
+    def flush(self, wait=True, timeout=None):
+        """
+        Requests an immediate write of pending items.
+
+        Args:
+            wait (bool): Block until everything queued so far is written.
+            timeout (float): Maximum seconds to wait when `wait` is True.
+
+        Returns:
+            bool: True if everything queued so far is written.
+        """
+        with self._lock:
+            target = self._submitted
+            self._wakeup.notify()
+            if wait:
+                self._flushed.wait_for(lambda: self._written >= target, timeout)
+            return self._written >= target
+
+    def close(self):
+        """Writes everything pending and stops the writer thread."""
+        with self._lock:
+            if self._stopping:
+                return
+            self._stopping = True
+            self._wakeup.notify()
+        self._thread.join()
+        self._on_close()
+
+    def _write_batch(self, batch):
+        raise NotImplementedError
+
+    def _on_written(self):
+        """Called with `_lock` held after a batch was written."""
+
+    def _on_close(self):
+        """Called after the writer thread has stopped."""
+
+    def _writer_started(self):
+        """Called on the writer thread before its first batch."""
+
+    def _writer_stopped(self):
+        """Called on the writer thread when it exits."""
+
+    def _run(self):
+        self._writer_started()
+        try:
+            while True:
+                with self._lock:
+                    if len(self._pending) < self.batch_size and not self._stopping:
+                        self._wakeup.wait(self.flush_interval)
+                    batch = self._pending
+                    self._pending = []
+                    stopping = self._stopping
+
+                if batch:
+                    try:
+                        self._write_batch(batch)
+                    except self.retry_errors as e:
+                        print(f"[!] {type(self).__name__} failed to write {len(batch)} items, will retry: {e}")
+                        with self._lock:
+                            self._pending = batch + self._pending
+                        if stopping:
+                            return
+                        time.sleep(self.flush_interval)
+                        continue
+
+                with self._lock:
+                    self._written += len(batch)
+                    self._on_written()
+                    self._flushed.notify_all()
+                    if stopping and not self._pending:
+                        return
+        finally:
+            self._writer_stopped()
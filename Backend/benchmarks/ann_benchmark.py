@@ -0,0 +1,88 @@
+"""
+Recall/latency benchmark of the approximate recognition indexes against the exact path.
+
+Builds a synthetic gallery shaped like face_recognition output (identities spread
+~0.9 apart, enrolled samples ~0.35 from each other), then matches fresh samples
+of random identities with every index type.
+
+Usage:
+    python Backend/benchmarks/ann_benchmark.py --identities 10000 --per-identity 30
+"""
+import os
+import sys
+import time
+import argparse
+import tempfile
+import numpy as np
+
+# Add project root to sys.path
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..', '..')))
+
+from Backend import config
+from Backend.face_recognition.embedding_store import EMBEDDING_DIM, EmbeddingStore
+from Backend.face_recognition.recognizer import FaceRecognizer
+
+IDENTITY_SPREAD = 0.9 / np.sqrt(2 * EMBEDDING_DIM)
+SAMPLE_SPREAD = 0.35 / np.sqrt(2 * EMBEDDING_DIM)
+
+
+def synthetic_gallery(identities, per_identity, seed=0):
+    """Returns (centers, embeddings, names) for a clustered synthetic gallery."""
+    rng = np.random.default_rng(seed)
+    centers = rng.normal(0.0, IDENTITY_SPREAD, (identities, EMBEDDING_DIM)).astype(np.float32)
+    embeddings = np.repeat(centers, per_identity, axis=0)
+    embeddings += rng.normal(0.0, SAMPLE_SPREAD, embeddings.shape).astype(np.float32)
+    names = [f"person_{i}" for i in range(identities) for _ in range(per_identity)]
+    return centers, embeddings, names
+
+
+def time_matching(recognizer, queries, batch_size):
+    results = []
+    start = time.perf_counter()
+    for i in range(0, len(queries), batch_size):
+        results.extend(recognizer.recognize_many(queries[i:i + batch_size]))
+    elapsed = time.perf_counter() - start
+    return results, elapsed * 1000.0 / len(queries)
+
+
+def run(identities, per_identity, num_queries, batch_size, nprobe, seed=0):
+    centers, embeddings, names = synthetic_gallery(identities, per_identity, seed)
+    rng = np.random.default_rng(seed + 1)
+    query_ids = rng.integers(0, identities, num_queries)
+    queries = centers[query_ids] + rng.normal(0.0, SAMPLE_SPREAD, (num_queries, EMBEDDING_DIM)).astype(np.float32)
+
+    config.ANN_MIN_GALLERY = 0
+    config.IVF_NPROBE = nprobe
+    rows = []
+    with tempfile.TemporaryDirectory() as directory:
+        EmbeddingStore(directory).append(names, embeddings)
+        exact = None
+        for index_type in ("exact", "ivf", "ivfpq"):
+            recognizer = FaceRecognizer(directory, index_type=index_type)
+            build_start = time.perf_counter()
+            recognizer.recognize_many(queries[:1])  # builds the index on first use
+            build_seconds = time.perf_counter() - build_start
+            results, ms_per_query = time_matching(recognizer, queries, batch_size)
+            if exact is None:
+                exact = results
+            recall = np.mean([a[0] == b[0] for a, b in zip(results, exact)])
+            accuracy = np.mean([name == f"person_{i}" for (name, _), i in zip(results, query_ids)])
+            rows.append((index_type, build_seconds, ms_per_query, recall, accuracy))
+
+    print(f"\nGallery: {identities} identities x {per_identity} = {len(embeddings)} embeddings, "
+          f"{num_queries} queries in batches of {batch_size}, nprobe={nprobe}")
+    print(f"{'index':<8}{'build s':>10}{'ms/query':>12}{'recall@1':>12}{'accuracy':>12}")
+    for index_type, build_seconds, ms_per_query, recall, accuracy in rows:
+        print(f"{index_type:<8}{build_seconds:>10.2f}{ms_per_query:>12.3f}{recall:>12.3f}{accuracy:>12.3f}")
+    return rows
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--identities", type=int, default=2000)
+    parser.add_argument("--per-identity", type=int, default=30)
+    parser.add_argument("--queries", type=int, default=500)
+    parser.add_argument("--batch-size", type=int, default=4, help="faces matched per call, e.g. faces per frame")
+    parser.add_argument("--nprobe", type=int, default=config.IVF_NPROBE)
+    args = parser.parse_args()
+    run(args.identities, args.per_identity, args.queries, args.batch_size, args.nprobe)
@@ -0,0 +1,281 @@
+"""
+Offline benchmark of the recognition pipeline, for comparing versions.
+
+Measures, on synthetic data only:
+- match latency: `recognize_many` on synthetic galleries of each requested size;
+- video search: frames/second of `search_for_faces_in_videos` over generated test videos;
+- requests: end-to-end latency of `/recognize` and `/search_by_photo` through the Flask
+  test client, with cold and warm result caches.
+
+Every section also records the per-stage breakdown from Backend/metrics.py. Results
+are written as JSON (default Data/benchmarks/pipeline_<time>.json); pass --compare
+with an earlier file to print the change of every number (add --against to compare two
+saved files without running).
+
+The generated videos contain moving shapes, not faces. Pass --face-image (any photo
+with one face) to paste a face into them and to use it as the request upload;
+without it, /search_by_photo is skipped since the upload has no face to search for.
+
+Usage:
+    python Backend/benchmarks/pipeline_benchmark.py --gallery-sizes 1000,10000 --videos 2 --face-image me.jpg
+    python Backend/benchmarks/pipeline_benchmark.py --compare Data/benchmarks/pipeline_old.json
+    python Backend/benchmarks/pipeline_benchmark.py --compare old.json --against new.json
+"""
+import io
+import os
+import sys
+import json
+import time
+import argparse
+import platform
+import tempfile
+import subprocess
+import cv2
+import numpy as np
+
+# Add project root to sys.path
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..', '..')))
+
+from Backend import config
+from Backend.metrics import metrics
+from Backend.benchmarks.ann_benchmark import SAMPLE_SPREAD, synthetic_gallery
+from Backend.face_recognition.embedding_store import EMBEDDING_DIM, EmbeddingStore
+from Backend.face_recognition.recognizer import FaceRecognizer
+
+BASE_DIR = os.path.abspath(os.path.join(os.path.dirname(__file__), '..', '..'))
+RESULTS_DIR = os.path.join(BASE_DIR, 'Data', 'benchmarks')
+
+
+def latency_summary(samples):
+    """Mean, p50, p95 and max of latencies in seconds, reported in ms."""
+    ms = np.asarray(samples, dtype=np.float64) * 1000.0
+    return {"mean_ms": round(float(ms.mean()), 3), "p50_ms": round(float(np.percentile(ms, 50)), 3),
+            "p95_ms": round(float(np.percentile(ms, 95)), 3), "max_ms": round(float(ms.max()), 3)}
+
+
+def stage_breakdown(snapshot):
+    """Mean ms and call count per stage from a metrics snapshot."""
+    return {name: {"calls": timer["count"], "mean_ms": round(1000.0 * timer["sum"] / timer["count"], 3)}
+            for (family, name), timer in snapshot["timers"].items() if family == "stage" and timer["count"]}
+
+
+def build_gallery(directory, identities, per_identity, seed=0):
+    centers, embeddings, names = synthetic_gallery(identities, per_identity, seed)
+    EmbeddingStore(directory).append(names, embeddings)
+    return centers
+
+
+def bench_matching(gallery_sizes, per_identity, frames, faces_per_frame, seed=0):
+    """recognize_many latency per frame of `faces_per_frame` faces, for each gallery size."""
+    results = []
+    rng = np.random.default_rng(seed + 1)
+    for identities in gallery_sizes:
+        with tempfile.TemporaryDirectory() as directory:
+            centers = build_gallery(directory, identities, per_identity, seed)
+            recognizer = FaceRecognizer(directory, write_behind=False)
+            query_ids = rng.integers(0, identities, (frames, faces_per_frame))
+            queries = centers[query_ids] + rng.normal(0.0, SAMPLE_SPREAD, query_ids.shape + (EMBEDDING_DIM,))
+            queries = queries.astype(np.float32)
+            recognizer.recognize_many(queries[0])  # builds lazy structures outside the timing
+            metrics.reset()
+            samples = []
+            for frame in queries:
+                start = time.perf_counter()
+                recognizer.recognize_many(frame)
+                samples.append(time.perf_counter() - start)
+            results.append({"identities": identities, "embeddings": identities * per_identity,
+                            "faces_per_frame": faces_per_frame, **latency_summary(samples)})
+            print(f"[*] Match, {identities * per_identity} embeddings: {results[-1]['mean_ms']:.3f} ms/frame "
+                  f"(p95 {results[-1]['p95_ms']:.3f})")
+    return results
+
+
+def generate_video(path, seconds, fps=25, size=(1280, 720), face=None, seed=0):
+    """
+    Writes a test recording: a static noisy background with a moving patch (the face,
+    if given) in the first and last third, and a static middle third for the motion gate.
+    """
+    rng = np.random.default_rng(seed)
+    width, height = size
+    background = rng.integers(20, 60, (height, width, 3), dtype=np.uint8)
+    patch = face if face is not None else np.full((height // 4, width // 8, 3), 200, dtype=np.uint8)
+    fit = min(1.0, height / 2.0 / patch.shape[0], width / 2.0 / patch.shape[1])
+    if fit < 1.0:
+        patch = cv2.resize(patch, (0, 0), fx=fit, fy=fit, interpolation=cv2.INTER_AREA)
+    ph, pw = patch.shape[:2]
+    writer = cv2.VideoWriter(path, cv2.VideoWriter_fourcc(*'mp4v'), fps, (width, height))
+    total = int(seconds * fps)
+    for i in range(total):
+        frame = background.copy()
+        if i < total // 3 or i >= 2 * total // 3:
+            x = int((width - pw) * (0.5 + 0.5 * np.sin(i / fps)))
+            y = (height - ph) // 2
+            frame[y:y + ph, x:x + pw] = patch
+        writer.write(frame)
+    writer.release()
+
+
+def bench_video_search(videos_directory, gallery_directory, workers, seconds_total, target):
+    from Backend.Flask_Backend.video_search import search_for_faces_in_videos
+
+    metrics.reset()
+    recognizer = FaceRecognizer(gallery_directory, write_behind=False)
+    start = time.perf_counter()
+    search_for_faces_in_videos([target], videos_directory, recognizer, workers=workers)
+    elapsed = time.perf_counter() - start
+    snapshot = metrics.snapshot()
+    sampled = snapshot["counters"].get("video_frames_sampled", 0)
+    result = {
+        "workers": workers,
+        "seconds": round(elapsed, 3),
+        "video_seconds": seconds_total,
+        "realtime_factor": round(seconds_total / elapsed, 2),
+        "sampled_frames": sampled,
+        "skipped_frames": snapshot["counters"].get("video_frames_skipped", 0),
+        "sampled_fps": round(sampled / elapsed, 2),
+        "stages": stage_breakdown(snapshot),
+    }
+    print(f"[*] Video search, {workers} worker(s): {result['sampled_fps']} sampled frames/s, "
+          f"{result['realtime_factor']}x real time")
+    return result
+
+
+def bench_requests(work_directory, videos_directory, upload, repeats, search):
+    """End-to-end latency of the Flask endpoints, each with cold (cleared) and warm result caches."""
+    from Backend.face_recognition import gallery_snapshot
+    from Backend.face_recognition.gallery_snapshot import GallerySnapshot
+    from Backend.Flask_Backend.video_index import VideoFaceIndex
+
+    # The server must use the synthetic gallery and recordings, not Data/
+    gallery_snapshot._default_gallery = GallerySnapshot(os.path.join(work_directory, 'gallery'), poll_interval=0)
+    from Backend.Flask_Backend import main
+    main.VIDEOS_DIR = videos_directory
+    main.video_index = VideoFaceIndex(os.path.join(work_directory, 'video_index'), videos_directory)
+    main.video_index.refresh()
+    client = main.app.test_client()
+
+    endpoints = ["/recognize"] + (["/search_by_photo"] if search else [])
+    results = {}
+    for endpoint in endpoints:
+        for warm in (False, True):
+            metrics.reset()
+            samples, statuses = [], set()
+            for _ in range(repeats):
+                if not warm:
+                    main.upload_cache.clear()
+                    main.search_cache.clear()
+                start = time.perf_counter()
+                response = client.post(endpoint, data={"file": (io.BytesIO(upload), "upload.jpg")})
+                samples.append(time.perf_counter() - start)
+                statuses.add(response.status_code)
+            key = f"{endpoint.strip('/')}_{'warm' if warm else 'cold'}"
+            results[key] = {**latency_summary(samples), "status": sorted(statuses),
+                            "stages": stage_breakdown(metrics.snapshot())}
+            print(f"[*] {endpoint} ({'warm' if warm else 'cold'} cache): {results[key]['mean_ms']:.1f} ms "
+                  f"(p95 {results[key]['p95_ms']:.1f})")
+    return results
+
+
+def git_revision():
+    try:
+        return subprocess.check_output(["git", "rev-parse", "--short", "HEAD"], cwd=BASE_DIR,
+                                       stderr=subprocess.DEVNULL).decode().strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def flatten(results, prefix=""):
+    """Numeric leaves of a results dict as {"a.b.c": value}."""
+    flat = {}
+    if isinstance(results, dict):
+        for key, value in results.items():
+            flat.update(flatten(value, f"{prefix}{key}."))
+    elif isinstance(results, list):
+        for i, value in enumerate(results):
+            flat.update(flatten(value, f"{prefix}{i}."))
+    elif isinstance(results, (int, float)) and not isinstance(results, bool):
+        flat[prefix[:-1]] = results
+    return flat
+
+
+def compare(old_results, new_results):
+    old, new = flatten(old_results), flatten(new_results)
+    print(f"\n{'metric':<60}{'old':>12}{'new':>12}{'change':>10}")
+    for key in sorted(set(old) & set(new)):
+        if key.startswith("meta."):
+            continue
+        change = f"{100.0 * (new[key] - old[key]) / old[key]:+.1f}%" if old[key] else ""
+        print(f"{key:<60}{old[key]:>12.3f}{new[key]:>12.3f}{change:>10}")
+
+
+def run(args):
+    face = cv2.imread(args.face_image) if args.face_image else None
+    if args.face_image and face is None:
+        raise SystemExit(f"Could not read {args.face_image}")
+    results = {"meta": {
+        "time": time.strftime("%Y-%m-%d %H:%M:%S"),
+        "git_revision": git_revision(),
+        "python": platform.python_version(),
+        "numpy": np.__version__,
+        "opencv": cv2.__version__,
+        "cpus": os.cpu_count(),
+        "args": vars(args),
+    }}
+
+    gallery_sizes = [int(v) for v in args.gallery_sizes.split(',') if v]
+    results["match"] = bench_matching(gallery_sizes, args.per_identity, args.frames, args.faces_per_frame)
+
+    with tempfile.TemporaryDirectory() as work_directory:
+        videos_directory = os.path.join(work_directory, 'recordings')
+        os.makedirs(videos_directory)
+        for i in range(args.videos):
+            generate_video(os.path.join(videos_directory, f"bench_{i}.mp4"), args.video_seconds, face=face, seed=i)
+        gallery_directory = os.path.join(work_directory, 'gallery')
+        build_gallery(gallery_directory, gallery_sizes[0], args.per_identity)
+
+        # Search for the pasted face if there is one, otherwise for an arbitrary embedding
+        upload_frame = face if face is not None else np.full((480, 640, 3), 128, dtype=np.uint8)
+        upload = cv2.imencode('.jpg', upload_frame)[1].tobytes()
+        from Backend.face_recognition.detection import AdaptiveDetector
+        _, encodings = AdaptiveDetector().detect_bytes(upload)
+        target = encodings[0] if encodings else np.zeros(EMBEDDING_DIM)
+
+        results["video_search"] = [bench_video_search(videos_directory, gallery_directory, workers,
+                                                      args.videos * args.video_seconds, target)
+                                   for workers in sorted({1, args.workers or os.cpu_count() or 1})]
+        results["requests"] = bench_requests(work_directory, videos_directory, upload, args.requests,
+                                             search=bool(encodings))
+
+    output = args.output or os.path.join(RESULTS_DIR, f"pipeline_{time.strftime('%Y%m%d-%H%M%S')}.json")
+    os.makedirs(os.path.dirname(os.path.abspath(output)), exist_ok=True)
+    with open(output, 'w', encoding='utf-8') as f:
+        json.dump(results, f, indent=2)
+    print(f"[*] Results saved to {output}")
+    return results
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--gallery-sizes", default="100,1000,10000", help="identities per synthetic gallery")
+    parser.add_argument("--per-identity", type=int, default=10)
+    parser.add_argument("--frames", type=int, default=500, help="frames matched per gallery size")
+    parser.add_argument("--faces-per-frame", type=int, default=4)
+    parser.add_argument("--videos", type=int, default=2)
+    parser.add_argument("--video-seconds", type=int, default=30)
+    parser.add_argument("--workers", type=int, default=config.VIDEO_SEARCH_WORKERS,
+                        help="video search workers besides the single-process run (0 = one per CPU)")
+    parser.add_argument("--requests", type=int, default=20, help="requests per endpoint and cache state")
+    parser.add_argument("--face-image", default=None, help="photo with one face to paste into the videos")
+    parser.add_argument("--output", default=None, help="results JSON (default Data/benchmarks/pipeline_<time>.json)")
+    parser.add_argument("--compare", default=None, help="earlier results JSON to compare against")
+    parser.add_argument("--against", default=None, help="with --compare: compare this saved JSON instead of running")
+    args = parser.parse_args()
+
+    if args.against:
+        with open(args.against, 'r', encoding='utf-8') as f:
+            new_results = json.load(f)
+    else:
+        new_results = run(args)
+    if args.compare:
+        with open(args.compare, 'r', encoding='utf-8') as f:
+            compare(json.load(f), new_results)
@@ -0,0 +1,137 @@
+"""
+Runtime configuration for the backend.
+
+Every setting can be overridden with an environment variable of the same name.
+"""
+import os
+
+
+def _env(name, default, cast=str):
+    value = os.environ.get(name)
+    return default if value is None or value == "" else cast(value)
+
+
+# --- Recognition index ---
+# "exact" compares against every gallery row, "ivf" probes an inverted-file
+# index and "ivfpq" additionally stores product-quantized codes.
+RECOGNIZER_INDEX = _env("RECOGNIZER_INDEX", "exact")
+# Number of coarse clusters; 0 picks roughly sqrt(gallery size)
+IVF_NLIST = _env("IVF_NLIST", 0, int)
+# Number of clusters scanned per query
+IVF_NPROBE = _env("IVF_NPROBE", 8, int)
+# Product-quantizer sub-vectors (must divide 128) for "ivfpq"
+PQ_SUBVECTORS = _env("PQ_SUBVECTORS", 16, int)
+# Candidates re-ranked with exact distances after an approximate search
+ANN_RERANK = _env("ANN_RERANK", 32, int)
+# Below this many rows the exact path is used even when an index is configured
+ANN_MIN_GALLERY = _env("ANN_MIN_GALLERY", 5000, int)
+# Seconds between checks of the embedding store for new enrollments (server hot reload); 0 disables
+GALLERY_RELOAD_INTERVAL = _env("GALLERY_RELOAD_INTERVAL", 2.0, float)
+# Minimum seconds between two hot reloads, so a burst of enrollment batches triggers one rebuild
+GALLERY_RELOAD_MIN_INTERVAL = _env("GALLERY_RELOAD_MIN_INTERVAL", 10.0, float)
+
+# --- Prototype compression ---
+# Match against a few centroids per identity instead of every enrolled sample
+USE_PROTOTYPES = _env("USE_PROTOTYPES", "0") == "1"
+MAX_PROTOTYPES = _env("MAX_PROTOTYPES", 3, int)
+# Re-compact an identity as soon as its enrollment finishes
+COMPACT_AFTER_ENROLLMENT = _env("COMPACT_AFTER_ENROLLMENT", "0") == "1"
+
+# --- Face detection ---
+# Uploads are first searched at this width (clamped to the scale limits below)
+DETECT_COARSE_WIDTH = _env("DETECT_COARSE_WIDTH", 640, int)
+# Scale limits, relative to the full-resolution image, for the coarse and finer passes
+DETECT_MIN_SCALE = _env("DETECT_MIN_SCALE", 0.125, float)
+DETECT_MAX_SCALE = _env("DETECT_MAX_SCALE", 1.0, float)
+# Faces smaller than this (in pixels at the scale they were found) are re-detected at a higher scale
+DETECT_MIN_FACE_PX = _env("DETECT_MIN_FACE_PX", 40, int)
+# Highest scale video frames and webcam frames are refined at
+VIDEO_DETECT_MAX_SCALE = _env("VIDEO_DETECT_MAX_SCALE", 0.5, float)
+WEBCAM_DETECT_MAX_SCALE = _env("WEBCAM_DETECT_MAX_SCALE", 0.5, float)
+# Re-scan every video frame with no face at higher scales (costly: most CCTV frames are empty).
+# When off, only frames the motion gate saw change are re-scanned
+VIDEO_DETECT_ESCALATE = _env("VIDEO_DETECT_ESCALATE", "0") == "1"
+
+# --- Video search ---
+# Worker processes for scanning recordings; 0 uses one per CPU, 1 scans in-process
+VIDEO_SEARCH_WORKERS = _env("VIDEO_SEARCH_WORKERS", 0, int)
+# Long recordings are split into chunks of this many seconds, scanned independently
+VIDEO_CHUNK_SECONDS = _env("VIDEO_CHUNK_SECONDS", 300, float)
+# Gaps of at least this many frames between samples are seeked over instead of grabbed
+VIDEO_SEEK_MIN_GAP = _env("VIDEO_SEEK_MIN_GAP", 150, int)
+# Skip static frames with a cheap thumbnail check before running the detector
+VIDEO_MOTION_GATE = _env("VIDEO_MOTION_GATE", "1") == "1"
+# Thumbnail width, gray-level change per pixel and fraction of changed pixels that count as motion
+VIDEO_GATE_WIDTH = _env("VIDEO_GATE_WIDTH", 64, int)
+VIDEO_GATE_PIXEL_DELTA = _env("VIDEO_GATE_PIXEL_DELTA", 20, int)
+VIDEO_GATE_MIN_CHANGED = _env("VIDEO_GATE_MIN_CHANGED", 0.005, float)
+# Run the detector at least every N samples even when nothing moves (someone standing still)
+VIDEO_GATE_MAX_SKIP = _env("VIDEO_GATE_MAX_SKIP", 10, int)
+# After motion starts or a face is found, sample this many frames per second for this many seconds
+VIDEO_DENSE_FPS = _env("VIDEO_DENSE_FPS", 4, int)
+VIDEO_DENSE_SECONDS = _env("VIDEO_DENSE_SECONDS", 2, float)
+# Matches of one video at most this many seconds apart are merged into one appearance
+APPEARANCE_MAX_GAP = _env("APPEARANCE_MAX_GAP", 3.0, float)
+# Binary-search the exact entry/exit frame within this many seconds of each appearance edge
+APPEARANCE_REFINE = _env("APPEARANCE_REFINE", "1") == "1"
+APPEARANCE_REFINE_WINDOW = _env("APPEARANCE_REFINE_WINDOW", 1.0, float)
+
+# --- Search jobs ---
+# Background searches that may run at the same time (they share the video-search pool)
+SEARCH_JOB_CONCURRENCY = _env("SEARCH_JOB_CONCURRENCY", 2, int)
+# Seconds a finished job and its results stay available
+SEARCH_JOB_TTL = _env("SEARCH_JOB_TTL", 3600, float)
+
+# --- Webcam loop ---
+# Follow faces between detector runs instead of detecting on every frame
+WEBCAM_TRACKING = _env("WEBCAM_TRACKING", "0") == "1"
+# Run full detection at least every N frames while tracking
+DETECT_EVERY_N_FRAMES = _env("DETECT_EVERY_N_FRAMES", 5, int)
+# Re-encode and re-recognize a tracked face at least every N frames
+REVERIFY_EVERY_N_FRAMES = _env("REVERIFY_EVERY_N_FRAMES", 30, int)
+# Run capture, inference and display on separate threads
+WEBCAM_PIPELINED = _env("WEBCAM_PIPELINED", "0") == "1"
+# Compute and draw facial landmarks
+DRAW_LANDMARKS = _env("DRAW_LANDMARKS", "1") == "1"
+
+# --- Multi-camera service ---
+# Inference processes shared by all cameras; 0 uses one per CPU
+CAMERA_WORKERS = _env("CAMERA_WORKERS", 0, int)
+# Frames buffered per camera before its drop policy applies
+CAMERA_QUEUE_SIZE = _env("CAMERA_QUEUE_SIZE", 4, int)
+# "oldest" drops the oldest queued frame (stay live), "newest" drops incoming frames
+CAMERA_DROP_POLICY = _env("CAMERA_DROP_POLICY", "oldest")
+
+# --- Batch recognition ---
+# Maximum images accepted by one /recognize_batch request (after unpacking archives)
+BATCH_MAX_IMAGES = _env("BATCH_MAX_IMAGES", 64, int)
+# Maximum total size in bytes of those images, counted before archive members are extracted
+BATCH_MAX_BYTES = _env("BATCH_MAX_BYTES", 256 * 1024 * 1024, int)
+# Threads decoding and encoding the images of a batch
+BATCH_DECODE_WORKERS = _env("BATCH_DECODE_WORKERS", 4, int)
+
+# --- Result caches ---
+# Uploads (by content hash) whose faces, encodings and /recognize results are kept
+UPLOAD_CACHE_SIZE = _env("UPLOAD_CACHE_SIZE", 256, int)
+UPLOAD_CACHE_TTL = _env("UPLOAD_CACHE_TTL", 600, float)
+# /search_by_photo responses, keyed by quantized targets plus the recordings/index/gallery versions
+SEARCH_CACHE_SIZE = _env("SEARCH_CACHE_SIZE", 64, int)
+SEARCH_CACHE_TTL = _env("SEARCH_CACHE_TTL", 600, float)
+# Grid step target embeddings are rounded to when building search cache keys
+SEARCH_CACHE_QUANTUM = _env("SEARCH_CACHE_QUANTUM", 0.01, float)
+
+# --- Event log ---
+# Record every recognized face in the local SQLite event log (Cameras/Logs tables)
+EVENT_LOG = _env("EVENT_LOG", "1") == "1"
+# SQLite file; empty uses Data/events.db
+EVENT_LOG_PATH = _env("EVENT_LOG_PATH", "")
+# Pending events that trigger an early batched write
+EVENT_LOG_BATCH_SIZE = _env("EVENT_LOG_BATCH_SIZE", 256, int)
+# Repeated sightings of the same track (or person, without tracking) on a camera are logged once per window
+EVENT_DEDUPE_SECONDS = _env("EVENT_DEDUPE_SECONDS", 30, float)
+
+# --- Metrics ---
+# Per-stage timers and counters (see Backend/metrics.py and GET /metrics)
+METRICS = _env("METRICS", "1") == "1"
+# Seconds between the webcam's [METRICS] log summaries; 0 disables them
+METRICS_LOG_INTERVAL = _env("METRICS_LOG_INTERVAL", 10.0, float)
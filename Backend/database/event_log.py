@@ -0,0 +1,249 @@
+"""
+Local event log: the `Cameras` and `Logs` tables of the SRS, stored in SQLite.
+
+Recognition loops call `log_event` for every face they see. Events are queued in
+memory and a background thread writes them in batched transactions, so the
+camera loops never wait on disk. Repeated sightings of the same face on the same
+camera (the same track, the same known person when there is no tracker, or an
+untracked unknown face staying in the same place) are logged once per
+`dedupe_seconds`.
+
+Usage:
+    python Backend/database/event_log.py [--person NAME] [--camera ID] [--status Known|Unknown] [--limit N]
+"""
+import os
+import sys
+import math
+import time
+import sqlite3
+import argparse
+import threading
+
+# Add project root to sys.path
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..', '..')))
+
+from Backend import config
+from Backend.batched_writer import BatchedWriter
+
+BASE_DIR = os.path.abspath(os.path.join(os.path.dirname(__file__), '..', '..'))
+DEFAULT_DB_PATH = os.path.join(BASE_DIR, 'Data', 'events.db')
+
+STATUS_KNOWN = "Known"
+STATUS_UNKNOWN = "Unknown"
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS Cameras (
+    CameraID INTEGER PRIMARY KEY AUTOINCREMENT,
+    Location TEXT NOT NULL UNIQUE
+);
+CREATE TABLE IF NOT EXISTS Logs (
+    LogID INTEGER PRIMARY KEY AUTOINCREMENT,
+    PersonID TEXT,
+    Timestamp REAL NOT NULL,
+    CameraID INTEGER REFERENCES Cameras(CameraID),
+    Status TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS idx_logs_timestamp ON Logs (Timestamp);
+CREATE INDEX IF NOT EXISTS idx_logs_person_timestamp ON Logs (PersonID, Timestamp);
+CREATE INDEX IF NOT EXISTS idx_logs_camera_timestamp ON Logs (CameraID, Timestamp);
+"""
+
+_default_log = None
+_default_log_lock = threading.Lock()
+
+
+class EventLog(BatchedWriter):
+    """
+    Batched, write-behind event log over one SQLite database.
+
+    `log_event` only appends to an in-memory list; the writer thread inserts
+    pending events with one `executemany` per transaction. Reads open their own
+    connection, and WAL mode lets them run while the writer commits.
+    """
+
+    retry_errors = (sqlite3.Error,)
+
+    def __init__(self, db_path=None, batch_size=None, flush_interval=0.5, dedupe_seconds=None):
+        """
+        Args:
+            db_path (str): SQLite file, defaults to config.EVENT_LOG_PATH or Data/events.db.
+            batch_size (int): Pending events that trigger an early flush, defaults to config.EVENT_LOG_BATCH_SIZE.
+            flush_interval (float): Maximum seconds an event waits before being written.
+            dedupe_seconds (float): Window in which repeated sightings are dropped,
+                defaults to config.EVENT_DEDUPE_SECONDS.
+        """
+        super().__init__(batch_size or config.EVENT_LOG_BATCH_SIZE, flush_interval, "EventLogWriter")
+        self.db_path = db_path or config.EVENT_LOG_PATH or DEFAULT_DB_PATH
+        self.dedupe_seconds = config.EVENT_DEDUPE_SECONDS if dedupe_seconds is None else dedupe_seconds
+        self.dropped_duplicates = 0
+
+        directory = os.path.dirname(self.db_path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        with self._connect() as conn:
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.executescript(_SCHEMA)
+
+        self._last_seen = {}
+        self._conn = None
+        self._start()
+
+    def _connect(self):
+        conn = sqlite3.connect(self.db_path, timeout=30.0)
+        conn.execute("PRAGMA synchronous=NORMAL")
+        return conn
+
+    @staticmethod
+    def _place_key(location):
+        """
+        Quantizes a (top, right, bottom, left) box to a grid cell sized like the face,
+        rounded to a power of two so small size changes between frames keep the same
+        cell. A face standing still keeps its key; two faces side by side get different ones.
+        """
+        top, right, bottom, left = location
+        cell = 2 ** int(round(math.log2(max(bottom - top, right - left, 1))))
+        return cell, int((top + bottom) / 2) // cell, int((left + right) / 2) // cell
+
+    def log_event(self, person_id, camera_id, status=None, timestamp=None, track_id=None, location=None):
+        """
+        Queues one sighting.
+
+        Args:
+            person_id (str): Recognized name, or None / "Unknown" for an unknown face.
+            camera_id (int): CameraID of the source, None if it is not a registered camera.
+            status (str): "Known" or "Unknown", derived from `person_id` when omitted.
+            timestamp (float): Unix time of the sighting, defaults to now.
+            track_id: Tracker id of the face, if any; a track is logged again only when
+                its identity changes or `dedupe_seconds` have passed. Without a track,
+                known people are deduplicated by name and unknown faces by `location`.
+            location (tuple): (top, right, bottom, left) box of the face in any fixed
+                pixel space of the camera; unknown faces without a track or a location
+                are not deduplicated.
+
+        Returns:
+            bool: False if the event was dropped as a repeated sighting.
+        """
+        if person_id == STATUS_UNKNOWN:
+            person_id = None
+        status = status or (STATUS_KNOWN if person_id else STATUS_UNKNOWN)
+        timestamp = time.time() if timestamp is None else timestamp
+        # Tracks and known names are keyed separately so a track id never collides with a name
+        if track_id is not None:
+            key = (camera_id, "track", track_id)
+        elif person_id is not None:
+            key = (camera_id, "person", person_id)
+        elif location is not None:
+            key = (camera_id, "unknown") + self._place_key(location)
+        else:
+            key = None
+        with self._lock:
+            self._ensure_open()
+            if key is not None:
+                last = self._last_seen.get(key)
+                if last is not None and last[0] == person_id and timestamp - last[1] < self.dedupe_seconds:
+                    self.dropped_duplicates += 1
+                    return False
+                self._last_seen[key] = (person_id, timestamp)
+                if len(self._last_seen) > 10000:
+                    self._forget_old(timestamp)
+            self._enqueue((person_id, timestamp, camera_id, status))
+        return True
+
+    def _forget_old(self, now):
+        self._last_seen = {key: value for key, value in self._last_seen.items()
+                           if now - value[1] < self.dedupe_seconds}
+
+    def _writer_started(self):
+        self._conn = self._connect()
+
+    def _writer_stopped(self):
+        self._conn.close()
+
+    def _write_batch(self, batch):
+        with self._conn:
+            self._conn.executemany("INSERT INTO Logs (PersonID, Timestamp, CameraID, Status) VALUES (?, ?, ?, ?)",
+                                   batch)
+
+    def add_camera(self, location):
+        """Registers a camera and returns its CameraID (the existing one if the location is known)."""
+        with self._connect() as conn:
+            row = conn.execute("SELECT CameraID FROM Cameras WHERE Location = ?", (location,)).fetchone()
+            if row is not None:
+                return row[0]
+            return conn.execute("INSERT INTO Cameras (Location) VALUES (?)", (location,)).lastrowid
+
+    def get_camera(self, camera_id):
+        """Returns {"camera_id", "location"} or None."""
+        with self._connect() as conn:
+            row = conn.execute("SELECT CameraID, Location FROM Cameras WHERE CameraID = ?", (camera_id,)).fetchone()
+        return {"camera_id": row[0], "location": row[1]} if row else None
+
+    def fetch_logs(self, person_id=None, camera_id=None, status=None, start=None, end=None, limit=100, offset=0):
+        """
+        Returns logged events, newest first, filtered by any combination of person,
+        camera, status and time range [start, end) in Unix seconds. Person, camera
+        and time filters use the (column, Timestamp) indexes; status has no index of
+        its own and is applied to the rows those select.
+        """
+        clauses, params = [], []
+        for column, value in (("l.PersonID", person_id), ("l.CameraID", camera_id), ("l.Status", status)):
+            if value is not None:
+                clauses.append(f"{column} = ?")
+                params.append(value)
+        if start is not None:
+            clauses.append("l.Timestamp >= ?")
+            params.append(start)
+        if end is not None:
+            clauses.append("l.Timestamp < ?")
+            params.append(end)
+        where = f"WHERE {' AND '.join(clauses)}" if clauses else ""
+        query = (f"SELECT l.LogID, l.PersonID, l.Timestamp, l.CameraID, c.Location, l.Status "
+                 f"FROM Logs l LEFT JOIN Cameras c ON c.CameraID = l.CameraID {where} "
+                 f"ORDER BY l.Timestamp DESC LIMIT ? OFFSET ?")
+        with self._connect() as conn:
+            rows = conn.execute(query, params + [limit, offset]).fetchall()
+        return [{"log_id": r[0], "person_id": r[1], "timestamp": r[2], "camera_id": r[3], "location": r[4],
+                 "status": r[5]} for r in rows]
+
+
+def get_event_log():
+    """The process-wide EventLog, created on first use."""
+    global _default_log
+    with _default_log_lock:
+        if _default_log is None:
+            _default_log = EventLog()
+        return _default_log
+
+
+def log_event(person_id, camera_id, status=None, timestamp=None, track_id=None, location=None):
+    return get_event_log().log_event(person_id, camera_id, status, timestamp, track_id, location)
+
+
+def fetch_logs(**filters):
+    return get_event_log().fetch_logs(**filters)
+
+
+def add_camera(location):
+    return get_event_log().add_camera(location)
+
+
+def get_camera(camera_id):
+    return get_event_log().get_camera(camera_id)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--db", default=None, help="SQLite file (default Data/events.db)")
+    parser.add_argument("--person", default=None)
+    parser.add_argument("--camera", type=int, default=None)
+    parser.add_argument("--status", choices=[STATUS_KNOWN, STATUS_UNKNOWN], default=None)
+    parser.add_argument("--limit", type=int, default=20)
+    args = parser.parse_args()
+
+    event_log = EventLog(args.db)
+    for event in event_log.fetch_logs(person_id=args.person, camera_id=args.camera, status=args.status,
+                                      limit=args.limit):
+        when = time.strftime("%Y-%m-%d %H:%M:%S", time.localtime(event["timestamp"]))
+        print(f"{when}  {event['status']:<7}  {event['person_id'] or '-':<20}  "
+              f"camera {event['camera_id']} ({event['location'] or '-'})")
+    event_log.close()
@@ -9,8 +9,13 @@ from tkinter import simpledialog
 # Add project root to sys.path
 sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..', '..')))
 
+from Backend import config
+from Backend.metrics import metrics
 from Backend.face_capture.web_cam import Webcam
+from Backend.face_capture.tracking import FaceTracker
 from Backend.face_recognition.recognizer import FaceRecognizer
+from Backend.face_recognition.detection import AdaptiveDetector
+from Backend.database.event_log import get_event_log
 
 class FaceRecognitionWebcam(Webcam):
     """
@@ -18,9 +23,26 @@ class FaceRecognitionWebcam(Webcam):
     - Detects faces
     - Extracts 128-d embeddings
     - Captures cropped faces for dataset building
+    - Optionally tracks faces between detector runs, caching their identities
     """
 
-    def __init__(self, camera_index=0, window_name="Face Recognition", resize_factor=0.25, data_path='../../Data/raw'):
+    def __init__(self, camera_index=0, window_name="Face Recognition", resize_factor=0.25, data_path='../../Data/raw',
+                 tracking=None, detect_every=None, reverify_every=None, draw_landmarks=None, pipelined=None,
+                 event_log=None):
+        """
+        Args:
+            tracking (bool): Detect only every `detect_every` frames (or when a track is
+                lost) and follow faces with a template tracker in between.
+            detect_every (int): Frames between full detections while tracking.
+            reverify_every (int): Frames after which a tracked face is re-encoded and re-recognized.
+            draw_landmarks (bool): Compute and draw facial landmarks.
+            pipelined (bool): Run capture, inference and display on separate threads
+                (see Webcam.show_pipelined) instead of one serial loop.
+            event_log (EventLog): Where sightings are logged; defaults to the shared
+                Data/events.db log when config.EVENT_LOG is on.
+
+        The tracking and pipeline options default to the values in Backend/config.py.
+        """
         super().__init__(camera_index, window_name)
         self.resize_factor = resize_factor
         self.data_path = data_path
@@ -30,6 +52,14 @@ class FaceRecognitionWebcam(Webcam):
 
         # Initialize FaceRecognizer
         self.recognizer = FaceRecognizer()
+        # The webcam is the process that enrolls: recover a crashed session's journal now
+        self.recognizer.start_writer()
+        self.event_log = event_log if event_log is not None else (get_event_log() if config.EVENT_LOG else None)
+        self.camera_id = self.event_log.add_camera(f"webcam:{camera_index}") if self.event_log else None
+        # Detection runs at resize_factor; only faces too small to encode reliably are refined
+        self.detector = AdaptiveDetector(scale=resize_factor, min_scale=resize_factor,
+                                         max_scale=max(config.WEBCAM_DETECT_MAX_SCALE, resize_factor),
+                                         escalate_empty=False)
 
         # State variables
         self.face_locations = []
@@ -39,6 +69,21 @@ class FaceRecognitionWebcam(Webcam):
         self.capture_count = 0
         self.capture_limit = 30
         self.capture_single_frame = False
+        self.capture_interval = 0.2
+        self.last_capture_time = 0.0
+        self.pipelined = config.WEBCAM_PIPELINED if pipelined is None else pipelined
+
+        # Tracking state
+        self.tracking = config.WEBCAM_TRACKING if tracking is None else tracking
+        self.detect_every = detect_every or config.DETECT_EVERY_N_FRAMES
+        self.reverify_every = reverify_every or config.REVERIFY_EVERY_N_FRAMES
+        self.draw_landmarks = config.DRAW_LANDMARKS if draw_landmarks is None else draw_landmarks
+        self.tracker = FaceTracker()
+        self.frame_index = 0
+        self.last_detection = None
+        self.face_names = []
+        self.metrics_mark = metrics.snapshot()
+        self.last_metrics_report = time.perf_counter()
 
         # Button parameters
         self.capture_button_pos = (10, 70)
@@ -88,40 +133,218 @@ class FaceRecognitionWebcam(Webcam):
             if pbx <= x <= pbx + pbw and pby <= y <= pby + pbh:
                 self.capture_single_frame = True
 
-    def process_frame(self, frame):
-        """Detects faces, extracts embeddings, draws bounding boxes and landmarks."""
-        # Resize frame for faster processing
-        small_frame = cv2.resize(frame, (0, 0), fx=self.resize_factor, fy=self.resize_factor)
-        rgb_small_frame = small_frame[:, :, ::-1]
-
-        self.face_locations = face_recognition.face_locations(rgb_small_frame)
-        self.face_encodings = face_recognition.face_encodings(rgb_small_frame, self.face_locations)
-        face_landmarks_list = face_recognition.face_landmarks(rgb_small_frame, self.face_locations)
-
-        for i in range(len(self.face_locations)):
-            top, right, bottom, left = self.face_locations[i]
-            face_encoding = self.face_encodings[i]
-            face_landmarks = face_landmarks_list[i]
-            recognized_name = self.recognizer.recognize_face(face_encoding)
-
-            top, right, bottom, left = int(top / self.resize_factor), int(right / self.resize_factor), int(bottom / self.resize_factor), int(left / self.resize_factor)
-
+    def _locate(self, frame, small_frame):
+        """Runs the detector on the frame; returns its detections and their boxes in small-frame pixels."""
+        detections = self.detector.locate(frame, small_frame, self.resize_factor)
+        locations = [tuple(int(v * self.resize_factor) for v in d.location) for d in detections]
+        return detections, locations
+
+    def _detect_all(self, frame, small_frame):
+        """Full detection, encoding and recognition of every face in the frame."""
+        detections, self.face_locations = self._locate(frame, small_frame)
+        self.face_encodings = self.detector.encode(detections)
+        return self.recognizer.recognize_many(self.face_encodings)
+
+    def _detect_with_tracks(self, frame, small_frame, gray):
+        """
+        Detects faces, but only encodes and recognizes the ones that are new or due
+        for re-verification; the rest keep their track's cached identity.
+        """
+        detections, locations = self._locate(frame, small_frame)
+        matched = self.tracker.associate(locations)
+        to_encode = [i for i, track in enumerate(matched)
+                     if self.capture_mode or track is None
+                     or track.needs_verification(self.frame_index, self.reverify_every)]
+        encodings = self.detector.encode([detections[i] for i in to_encode])
+        identities = [None] * len(locations)
+        self.face_encodings = [None] * len(locations)
+        for i, encoding, identity in zip(to_encode, encodings, self.recognizer.recognize_many(encodings)):
+            identities[i] = identity
+            self.face_encodings[i] = encoding
+
+        self.tracker.update_from_detections(gray, self.frame_index, locations, matched, identities)
+        self.face_locations = locations
+        self.last_detection = self.frame_index
+        return [(track.name, track.distance) for track in self.tracker.tracks]
+
+    def analyze_frame(self, frame):
+        """
+        Detects (or tracks) faces and recognizes them without drawing anything.
+
+        Returns:
+            dict: "locations" (full-resolution boxes), "names" and "landmarks" (full-resolution
+            points per face, empty when landmarks are disabled).
+        """
+        # Resize frame for faster processing; the detector's coarse pass reuses it
+        with metrics.timer("resize"):
+            small_frame = cv2.resize(frame, (0, 0), fx=self.resize_factor, fy=self.resize_factor)
+            rgb_small_frame = small_frame[:, :, ::-1]
+
+        if not self.tracking:
+            matches = self._detect_all(frame, small_frame)
+        else:
+            gray = cv2.cvtColor(small_frame, cv2.COLOR_BGR2GRAY)
+            detection_due = (self.capture_mode or self.last_detection is None
+                             or self.frame_index - self.last_detection >= self.detect_every)
+            if detection_due or not self.tracker.track(gray, self.frame_index):
+                matches = self._detect_with_tracks(frame, small_frame, gray)
+            else:
+                # Tracked frame: boxes moved, identities come from the track cache
+                self.face_locations = [track.bbox for track in self.tracker.tracks]
+                self.face_encodings = [None] * len(self.face_locations)
+                matches = [(track.name, track.distance) for track in self.tracker.tracks]
+        self.frame_index += 1
+        self.face_names = [name for name, _ in matches]
+        if self.event_log is not None:
+            track_ids = [track.id for track in self.tracker.tracks] if self.tracking else [None] * len(matches)
+            for name, track_id, location in zip(self.face_names, track_ids, self.face_locations):
+                self.event_log.log_event(name, self.camera_id, track_id=track_id, location=location)
+
+        face_landmarks_list = []
+        if self.draw_landmarks:
+            with metrics.timer("landmarks"):
+                face_landmarks_list = face_recognition.face_landmarks(rgb_small_frame, self.face_locations)
+        metrics.count("webcam_frames")
+        self._report_metrics()
+
+        return {
+            "locations": [tuple(int(v / self.resize_factor) for v in location) for location in self.face_locations],
+            "names": list(self.face_names),
+            "landmarks": [[(int(x / self.resize_factor), int(y / self.resize_factor))
+                           for points in face_landmarks.values() for x, y in points]
+                          for face_landmarks in face_landmarks_list],
+        }
+
+    def _report_metrics(self):
+        """Prints the per-stage timings of the last `METRICS_LOG_INTERVAL` seconds."""
+        interval = config.METRICS_LOG_INTERVAL
+        if not interval or time.perf_counter() - self.last_metrics_report < interval:
+            return
+        print(f"[METRICS] {metrics.summary(since=self.metrics_mark)}")
+        self.metrics_mark = metrics.snapshot()
+        self.last_metrics_report = time.perf_counter()
+
+    def draw_faces(self, frame, annotations):
+        """Draws the boxes, names and landmarks returned by `analyze_frame`."""
+        for (top, right, bottom, left), recognized_name in zip(annotations["locations"], annotations["names"]):
             cv2.rectangle(frame, (left, top), (right, bottom), (0, 0, 255), 2)
             cv2.rectangle(frame, (left, bottom - 35), (right, bottom), (0, 0, 255), cv2.FILLED)
             cv2.putText(frame, recognized_name, (left + 6, bottom - 6), cv2.FONT_HERSHEY_DUPLEX, 1.0, (255, 255, 255), 1)
 
-            for facial_feature in face_landmarks.keys():
-                for point in face_landmarks[facial_feature]:
-                    x, y = int(point[0] / self.resize_factor), int(point[1] / self.resize_factor)
-                    cv2.circle(frame, (x, y), 1, (0, 255, 0), -1)
+        for points in annotations["landmarks"]:
+            for x, y in points:
+                cv2.circle(frame, (x, y), 1, (0, 255, 0), -1)
+        return frame
 
+    def process_frame(self, frame):
+        """Detects (or tracks) faces, extracts embeddings, draws bounding boxes and landmarks."""
+        return self.draw_faces(frame, self.analyze_frame(frame))
+
+    def _save_snapshot(self, frame):
+        timestamp = time.strftime("%Y%m%d-%H%M%S")
+        filename = os.path.join(self.snapshots_path, f"snapshot_{timestamp}.jpg")
+        cv2.imwrite(filename, frame)
+        print(f"[*] Snapshot saved to {filename}")
+        self.capture_single_frame = False
+
+    def _handle_capture(self, frame):
+        """
+        Saves the first detected face of `frame` and enrolls its embedding while capture mode is on.
+
+        Captures are spaced `capture_interval` seconds apart by timestamp rather than by
+        sleeping, so the loop calling this never stalls.
+
+        Returns:
+            bool: False if capture mode is on but no face was detected.
+        """
+        if not (self.capture_mode and self.capture_name):
+            return True
+        if not self.face_locations:
+            return False
+        if self.capture_count < self.capture_limit and time.time() - self.last_capture_time >= self.capture_interval:
+            top, right, bottom, left = self.face_locations[0]
+            top_orig, right_orig, bottom_orig, left_orig = (
+                int(top / self.resize_factor),
+                int(right / self.resize_factor),
+                int(bottom / self.resize_factor),
+                int(left / self.resize_factor)
+            )
+            cropped_face = frame[top_orig:bottom_orig, left_orig:right_orig]
+
+            if cropped_face.size != 0:
+                img_name = f"{self.capture_name}_{self.capture_count + 1}.jpg"
+                img_path = os.path.join(self.data_path, self.capture_name, img_name)
+                cv2.imwrite(img_path, cropped_face)
+                if self.face_encodings and self.face_encodings[0] is not None:
+                    self.recognizer.add_face(self.capture_name, self.face_encodings[0])
+                print(f"Captured {self.capture_count + 1}/{self.capture_limit}")
+                self.capture_count += 1
+                self.last_capture_time = time.time()
+
+        if self.capture_count >= self.capture_limit:
+            print(f"[*] Capture complete for '{self.capture_name}'.")
+            # The gallery is already updated in place; just push the journal to disk
+            self.recognizer.flush(wait=False)
+            if config.COMPACT_AFTER_ENROLLMENT:
+                self.recognizer.compact(self.capture_name)
+            self.capture_mode, self.capture_name = False, None
+        return True
+
+    def _draw_controls(self, frame, face_found=True):
+        """Draws the buttons, capture warning and exit hint."""
+        cbx, cby = self.capture_button_pos
+        cbw, cbh = self.capture_button_size
+        capture_text = "Abort Capture" if self.capture_mode else "Start Capture"
+        capture_color = (0, 0, 255) if self.capture_mode else (0, 255, 0)
+        cv2.rectangle(frame, (cbx, cby), (cbx + cbw, cby + cbh), capture_color, cv2.FILLED)
+        cv2.putText(frame, capture_text, (cbx + 10, cby + 28),
+                    cv2.FONT_HERSHEY_SIMPLEX, 0.7, (255, 255, 255), 2)
+
+        pbx, pby = self.photo_button_pos
+        pbw, pbh = self.photo_button_size
+        cv2.rectangle(frame, (pbx, pby), (pbx + pbw, pby + pbh), (0, 200, 200), cv2.FILLED)
+        cv2.putText(frame, "Take Photo", (pbx + 30, pby + 28),
+                    cv2.FONT_HERSHEY_SIMPLEX, 0.7, (0, 0, 0), 2)
+
+        if self.capture_mode and not face_found:
+            cv2.putText(frame, "No face detected!", (10, 180),
+                        cv2.FONT_HERSHEY_SIMPLEX, 0.7, (0, 0, 255), 2)
+
+        cv2.putText(frame, "Press 'q' to exit", (10, 30),
+                    cv2.FONT_HERSHEY_SIMPLEX, 0.7, (255, 255, 255), 2)
         return frame
 
+    # --- Pipelined mode hooks (see Webcam.show_pipelined) ---
+
+    def infer(self, frame):
+        annotations = self.analyze_frame(frame)
+        annotations["face_found"] = self._handle_capture(frame)
+        return annotations
+
+    def render(self, frame, result):
+        if self.capture_single_frame:
+            self._save_snapshot(frame)
+        if result is not None:
+            self.draw_faces(frame, result)
+        return self._draw_controls(frame, result is None or result["face_found"])
+
+    def handle_key(self, key, frame):
+        return key == ord('q')
+
     def show(self):
         """Main webcam loop with face detection + capture logic."""
         print("[INFO] Starting webcam...")
         time.sleep(1.0)  # camera warm-up
 
+        if self.pipelined:
+            try:
+                self.show_pipelined()
+            finally:
+                self.recognizer.close()
+                if self.event_log is not None:
+                    self.event_log.flush(timeout=2.0)
+            return
+
         while True:
             ret, frame = self.cap.read()
             if not ret or frame is None:
@@ -133,67 +356,22 @@ class FaceRecognitionWebcam(Webcam):
 
             # --- HANDLE SNAPSHOT BUTTON ---
             if self.capture_single_frame:
-                timestamp = time.strftime("%Y%m%d-%H%M%S")
-                filename = os.path.join(self.snapshots_path, f"snapshot_{timestamp}.jpg")
-                cv2.imwrite(filename, frame)
-                print(f"[*] Snapshot saved to {filename}")
-                self.capture_single_frame = False
-
-            # --- DRAW BUTTONS ---
-            cbx, cby = self.capture_button_pos
-            cbw, cbh = self.capture_button_size
-            capture_text = "Abort Capture" if self.capture_mode else "Start Capture"
-            capture_color = (0, 0, 255) if self.capture_mode else (0, 255, 0)
-            cv2.rectangle(processed_frame, (cbx, cby), (cbx + cbw, cby + cbh), capture_color, cv2.FILLED)
-            cv2.putText(processed_frame, capture_text, (cbx + 10, cby + 28),
-                        cv2.FONT_HERSHEY_SIMPLEX, 0.7, (255, 255, 255), 2)
-
-            pbx, pby = self.photo_button_pos
-            pbw, pbh = self.photo_button_size
-            cv2.rectangle(processed_frame, (pbx, pby), (pbx + pbw, pby + pbh), (0, 200, 200), cv2.FILLED)
-            cv2.putText(processed_frame, "Take Photo", (pbx + 30, pby + 28),
-                        cv2.FONT_HERSHEY_SIMPLEX, 0.7, (0, 0, 0), 2)
+                self._save_snapshot(frame)
 
             # --- CAPTURE LOGIC ---
-            if self.capture_mode and self.capture_name:
-                if self.face_locations and self.capture_count < self.capture_limit:
-                    top, right, bottom, left = self.face_locations[0]
-                    top_orig, right_orig, bottom_orig, left_orig = (
-                        int(top / self.resize_factor),
-                        int(right / self.resize_factor),
-                        int(bottom / self.resize_factor),
-                        int(left / self.resize_factor)
-                    )
-                    cropped_face = frame[top_orig:bottom_orig, left_orig:right_orig]
-
-                    if cropped_face.size != 0:
-                        img_name = f"{self.capture_name}_{self.capture_count + 1}.jpg"
-                        img_path = os.path.join(self.data_path, self.capture_name, img_name)
-                        cv2.imwrite(img_path, cropped_face)
-                        if self.face_encodings:
-                            self.recognizer.add_face(self.capture_name, self.face_encodings[0])
-                        print(f"Captured {self.capture_count + 1}/{self.capture_limit}")
-                        self.capture_count += 1
-                        time.sleep(0.2)
-
-                    if self.capture_count >= self.capture_limit:
-                        print(f"[*] Capture complete for '{self.capture_name}'.")
-                        self.recognizer.load_known_faces()
-                        self.capture_mode, self.capture_name = False, None
-
-                elif not self.face_locations:
-                    cv2.putText(processed_frame, "No face detected!", (10, 180),
-                                cv2.FONT_HERSHEY_SIMPLEX, 0.7, (0, 0, 255), 2)
-
-            # --- DISPLAY & EXIT ---
-            cv2.putText(processed_frame, "Press 'q' to exit", (10, 30),
-                        cv2.FONT_HERSHEY_SIMPLEX, 0.7, (255, 255, 255), 2)
+            face_found = self._handle_capture(frame)
+
+            # --- DRAW BUTTONS, DISPLAY & EXIT ---
+            self._draw_controls(processed_frame, face_found)
             cv2.imshow(self.window_name, processed_frame)
 
             key = cv2.waitKey(1) & 0xFF
             if key == ord('q'):
                 break
 
+        self.recognizer.close()
+        if self.event_log is not None:
+            self.event_log.flush(timeout=2.0)
         self.release()
 
 
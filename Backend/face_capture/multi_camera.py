@@ -0,0 +1,342 @@
+"""
+Headless multi-camera recognition service.
+
+Every source (device index, video file or RTSP/HTTP URL) is read by its own
+thread into a small bounded queue. A dispatcher takes frames from the queues in
+round-robin order and hands them to a shared pool of inference processes; each
+worker memory-maps the same embedding store, so the gallery is loaded once into
+the page cache no matter how many workers run. A camera that produces frames
+faster than its share of the pool drops them according to its drop policy
+instead of slowing down the other cameras.
+
+Usage:
+    python Backend/face_capture/multi_camera.py 0 rtsp://cam2/stream Data/recordings/door.mp4 --workers 4
+"""
+import os
+import sys
+import time
+import argparse
+import threading
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+
+import cv2
+
+# Add project root to sys.path
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..', '..')))
+
+from Backend import config
+from Backend.face_capture.pipeline import StageStats
+from Backend.face_capture.web_cam import open_capture
+from Backend.database.event_log import get_event_log
+
+DROP_OLDEST = "oldest"
+DROP_NEWEST = "newest"
+
+_worker_recognizer = None
+_worker_detector = None
+
+
+class CameraStream(threading.Thread):
+    """Reads one source into a bounded frame queue and keeps per-camera counters."""
+
+    def __init__(self, camera_id, source, queue_size=4, drop_policy=DROP_OLDEST, realtime=True, loop=False):
+        """
+        Args:
+            camera_id (str): Name used in results and stats.
+            source: Device index, file path or stream URL.
+            queue_size (int): Frames buffered before the drop policy applies.
+            drop_policy (str): "oldest" keeps the freshest frames, "newest" keeps the queued ones.
+            realtime (bool): Pace file sources at their native FPS, like a live camera.
+            loop (bool): Restart file sources when they end.
+        """
+        super().__init__(name=f"Camera-{camera_id}", daemon=True)
+        if drop_policy not in (DROP_OLDEST, DROP_NEWEST):
+            raise ValueError(f"Unknown drop policy '{drop_policy}'")
+        self.camera_id = camera_id
+        self.source = source
+        self.queue_size = queue_size
+        self.drop_policy = drop_policy
+        self.realtime = realtime
+        self.loop = loop
+        self.frames = deque()
+        self.lock = threading.Lock()
+        self.stopped = threading.Event()
+        self.finished = False
+        self.seq = 0
+        self.frames_read = 0
+        self.frames_dropped = 0
+        self.frames_processed = 0
+        self.faces_seen = 0
+        self.inference_stats = StageStats("inference")
+        self.latency_stats = StageStats("end-to-end")
+        self.on_frame = None
+
+    @property
+    def is_file(self):
+        return isinstance(self.source, str) and os.path.exists(self.source)
+
+    def run(self):
+        cap = open_capture(self.source)
+        if cap is None or not cap.isOpened():
+            print(f"[!] Could not open source {self.source} for camera {self.camera_id}.")
+            self.finished = True
+            return
+        fps = cap.get(cv2.CAP_PROP_FPS)
+        frame_period = 1.0 / fps if self.is_file and self.realtime and fps > 0 else 0.0
+        next_frame_at = time.perf_counter()
+        try:
+            while not self.stopped.is_set():
+                ret, frame = cap.read()
+                if not ret:
+                    if self.is_file and self.loop:
+                        cap.set(cv2.CAP_PROP_POS_FRAMES, 0)
+                        continue
+                    if self.is_file:
+                        break
+                    time.sleep(0.05)  # live source hiccup, retry
+                    continue
+                self._push(frame)
+                if frame_period:
+                    next_frame_at += frame_period
+                    delay = next_frame_at - time.perf_counter()
+                    if delay > 0:
+                        time.sleep(delay)
+        finally:
+            cap.release()
+            self.finished = True
+            if self.on_frame:
+                self.on_frame()
+
+    def _push(self, frame):
+        with self.lock:
+            self.seq += 1
+            self.frames_read += 1
+            if len(self.frames) >= self.queue_size:
+                self.frames_dropped += 1
+                if self.drop_policy == DROP_NEWEST:
+                    return
+                self.frames.popleft()
+            self.frames.append((self.seq, time.perf_counter(), frame))
+        if self.on_frame:
+            self.on_frame()
+
+    def pop(self):
+        with self.lock:
+            return self.frames.popleft() if self.frames else None
+
+    def stats(self):
+        inference_fps, inference_ms = self.inference_stats.snapshot()
+        _, latency_ms = self.latency_stats.snapshot()
+        return {
+            "camera_id": self.camera_id,
+            "frames_read": self.frames_read,
+            "frames_dropped": self.frames_dropped,
+            "frames_processed": self.frames_processed,
+            "faces_seen": self.faces_seen,
+            "queued": len(self.frames),
+            "processed_fps": round(inference_fps, 2),
+            "inference_ms": round(inference_ms, 1),
+            "latency_ms": round(latency_ms, 1),
+        }
+
+
+def _init_worker(embeddings_path):
+    """Loads the shared, memory-mapped gallery once per worker process."""
+    global _worker_recognizer
+    from Backend.face_recognition.recognizer import FaceRecognizer
+    _worker_recognizer = FaceRecognizer(embeddings_path, write_behind=False)
+
+
+def _get_detector(resize_factor):
+    global _worker_detector
+    if _worker_detector is None or _worker_detector.scale != resize_factor:
+        from Backend.face_recognition.detection import AdaptiveDetector
+        _worker_detector = AdaptiveDetector(scale=resize_factor, min_scale=resize_factor,
+                                            max_scale=max(config.WEBCAM_DETECT_MAX_SCALE, resize_factor),
+                                            escalate_empty=False)
+    return _worker_detector
+
+
+def _infer_frame(frame, resize_factor):
+    """Worker: detects, encodes and recognizes every face of a frame."""
+    start = time.perf_counter()
+    face_locations, face_encodings = _get_detector(resize_factor).detect(frame)
+    matches = _worker_recognizer.recognize_many(face_encodings)
+    faces = [{"bbox": [int(v) for v in location], "name": name, "distance": round(distance, 4)}
+             for location, (name, distance) in zip(face_locations, matches)]
+    return faces, time.perf_counter() - start
+
+
+class MultiCameraService:
+    """Schedules frames from many CameraStreams fairly onto one inference process pool."""
+
+    def __init__(self, sources, workers=None, queue_size=None, drop_policy=None, resize_factor=0.25,
+                 embeddings_path=None, on_result=None, realtime=True, loop=False, event_log=None):
+        """
+        Args:
+            sources (list): Device indices, file paths or stream URLs, one per camera.
+            workers (int): Inference processes, defaults to config.CAMERA_WORKERS (0 = one per CPU).
+            queue_size (int): Per-camera frame buffer, defaults to config.CAMERA_QUEUE_SIZE.
+            drop_policy (str): "oldest" or "newest", defaults to config.CAMERA_DROP_POLICY.
+            resize_factor (float): Downscale applied before detection.
+            embeddings_path (str): Gallery store shared by the workers (default Data/embeddings).
+            on_result (callable): Called as on_result(camera_id, seq, faces) for every processed frame.
+            realtime (bool): Pace file sources at their native FPS.
+            loop (bool): Restart file sources when they end.
+            event_log (EventLog): Where sightings are logged; defaults to the shared
+                Data/events.db log when config.EVENT_LOG is on.
+        """
+        workers = config.CAMERA_WORKERS if workers is None else workers
+        self.workers = workers or os.cpu_count() or 1
+        self.resize_factor = resize_factor
+        self.embeddings_path = embeddings_path
+        self.on_result = on_result
+        self.streams = []
+        for i, source in enumerate(sources):
+            stream = CameraStream(f"cam{i}", source, queue_size or config.CAMERA_QUEUE_SIZE,
+                                  drop_policy or config.CAMERA_DROP_POLICY, realtime, loop)
+            stream.on_frame = self._notify
+            self.streams.append(stream)
+        self.event_log = event_log if event_log is not None else (get_event_log() if config.EVENT_LOG else None)
+        # CameraID of each stream in the event log, keyed by the camera's name
+        self.camera_ids = {stream.camera_id: self.event_log.add_camera(str(stream.source))
+                           for stream in self.streams} if self.event_log else {}
+        # Enough in flight to keep every worker busy, little enough that queues (and drops) stay per camera
+        self.max_in_flight = 2 * self.workers
+        self._in_flight = 0
+        self._next_stream = 0
+        self._wakeup = threading.Condition()
+        self._stopped = threading.Event()
+        self._pool = None
+        self._dispatcher = None
+
+    def _notify(self):
+        with self._wakeup:
+            self._wakeup.notify_all()
+
+    def _next_frame(self):
+        """Round-robin over cameras: the first camera after the last served one with a queued frame."""
+        count = len(self.streams)
+        for offset in range(count):
+            stream = self.streams[(self._next_stream + offset) % count]
+            item = stream.pop()
+            if item is not None:
+                self._next_stream = (self._next_stream + offset + 1) % count
+                return stream, item
+        return None, None
+
+    def start(self):
+        self._pool = ProcessPoolExecutor(max_workers=self.workers, initializer=_init_worker,
+                                         initargs=(self.embeddings_path,))
+        for stream in self.streams:
+            stream.start()
+        self._dispatcher = threading.Thread(target=self._dispatch, name="FrameDispatcher", daemon=True)
+        self._dispatcher.start()
+
+    def _dispatch(self):
+        while not self._stopped.is_set():
+            with self._wakeup:
+                stream = item = None
+                while not self._stopped.is_set():
+                    if self._in_flight < self.max_in_flight:
+                        stream, item = self._next_frame()
+                        if item is not None:
+                            self._in_flight += 1
+                            break
+                    self._wakeup.wait(0.1)
+            if item is None:
+                continue
+            seq, captured_at, frame = item
+            future = self._pool.submit(_infer_frame, frame, self.resize_factor)
+            future.add_done_callback(lambda f, s=stream, q=seq, t=captured_at: self._on_done(s, q, t, f))
+
+    def _on_done(self, stream, seq, captured_at, future):
+        with self._wakeup:
+            self._in_flight -= 1
+            self._wakeup.notify_all()
+        if future.cancelled():
+            return
+        try:
+            faces, inference_seconds = future.result()
+        except Exception as e:
+            print(f"[!] Inference failed for {stream.camera_id}: {e}")
+            return
+        stream.frames_processed += 1
+        stream.faces_seen += len(faces)
+        stream.inference_stats.record(inference_seconds)
+        stream.latency_stats.record(time.perf_counter() - captured_at)
+        if self.event_log is not None:
+            for face in faces:
+                # Workers keep no tracks; the box lets repeated unknown faces be deduplicated
+                self.event_log.log_event(face["name"], self.camera_ids[stream.camera_id], location=face["bbox"])
+        if self.on_result:
+            self.on_result(stream.camera_id, seq, faces)
+
+    def idle(self):
+        """True once every source has ended and all of its frames are processed."""
+        with self._wakeup:
+            in_flight = self._in_flight
+        return all(s.finished and not s.frames for s in self.streams) and in_flight == 0
+
+    def stats(self):
+        return [stream.stats() for stream in self.streams]
+
+    def print_stats(self):
+        for s in self.stats():
+            print(f"[STATS] {s['camera_id']}: read {s['frames_read']} processed {s['frames_processed']} "
+                  f"dropped {s['frames_dropped']} queued {s['queued']} | {s['processed_fps']} fps "
+                  f"{s['inference_ms']} ms inference {s['latency_ms']} ms end-to-end | faces {s['faces_seen']}")
+
+    def run(self, duration=None, stats_interval=5.0):
+        """Runs until all sources end, `duration` seconds pass or Ctrl+C."""
+        self.start()
+        started = last_report = time.perf_counter()
+        try:
+            while not self.idle():
+                time.sleep(0.1)
+                now = time.perf_counter()
+                if duration is not None and now - started >= duration:
+                    break
+                if now - last_report >= stats_interval:
+                    last_report = now
+                    self.print_stats()
+        except KeyboardInterrupt:
+            pass
+        finally:
+            self.stop()
+            self.print_stats()
+
+    def stop(self):
+        self._stopped.set()
+        for stream in self.streams:
+            stream.stopped.set()
+        self._notify()
+        for stream in self.streams:
+            stream.join(timeout=2.0)
+        if self._dispatcher:
+            self._dispatcher.join(timeout=2.0)
+        if self._pool:
+            self._pool.shutdown(wait=True, cancel_futures=True)
+        if self.event_log is not None:
+            self.event_log.flush(timeout=2.0)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("sources", nargs="+", help="device indices, video files or stream URLs")
+    parser.add_argument("--workers", type=int, default=None)
+    parser.add_argument("--queue-size", type=int, default=None)
+    parser.add_argument("--drop-policy", choices=[DROP_OLDEST, DROP_NEWEST], default=None)
+    parser.add_argument("--duration", type=float, default=None, help="stop after this many seconds")
+    parser.add_argument("--loop", action="store_true", help="restart file sources when they end")
+    parser.add_argument("--no-realtime", action="store_true", help="read files as fast as possible")
+    args = parser.parse_args()
+
+    def print_result(camera_id, seq, faces):
+        if faces:
+            print(f"[{camera_id} #{seq}] " + ", ".join(f"{f['name']} ({f['distance']:.2f})" for f in faces))
+
+    service = MultiCameraService(args.sources, args.workers, args.queue_size, args.drop_policy,
+                                 on_result=print_result, realtime=not args.no_realtime, loop=args.loop)
+    service.run(args.duration)
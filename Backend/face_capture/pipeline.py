@@ -0,0 +1,138 @@
+import time
+import threading
+from collections import deque
+
+
+class StageStats:
+    """Thread-safe FPS and latency counters for one pipeline stage over a sliding window."""
+
+    def __init__(self, name, window=2.0):
+        """
+        Args:
+            name (str): Stage name used in summaries.
+            window (float): Seconds of history the FPS and mean latency are computed over.
+        """
+        self.name = name
+        self.window = window
+        self.total = 0
+        self._events = deque()
+        self._lock = threading.Lock()
+
+    def record(self, latency=0.0):
+        """Records one processed item and how long it took (seconds)."""
+        now = time.perf_counter()
+        with self._lock:
+            self.total += 1
+            self._events.append((now, latency))
+            while self._events and now - self._events[0][0] > self.window:
+                self._events.popleft()
+
+    def snapshot(self):
+        """Returns (fps, mean latency in ms) over the window."""
+        with self._lock:
+            events = list(self._events)
+        if not events:
+            return 0.0, 0.0
+        span = time.perf_counter() - events[0][0]
+        fps = len(events) / span if span > 0 else 0.0
+        latency_ms = 1000.0 * sum(latency for _, latency in events) / len(events)
+        return fps, latency_ms
+
+    def summary(self):
+        fps, latency_ms = self.snapshot()
+        return f"{self.name}: {fps:5.1f} fps {latency_ms:6.1f} ms"
+
+
+class FrameGrabber(threading.Thread):
+    """
+    Reads the camera as fast as it delivers frames and keeps only the newest one,
+    so the driver buffer never fills up with stale frames.
+    """
+
+    def __init__(self, cap):
+        super().__init__(name="FrameGrabber", daemon=True)
+        self.cap = cap
+        self.stats = StageStats("capture")
+        self.stopped = threading.Event()
+        self._frame = None
+        self._seq = 0
+        self._timestamp = 0.0
+        self._new_frame = threading.Condition()
+
+    def run(self):
+        while not self.stopped.is_set():
+            start = time.perf_counter()
+            ret, frame = self.cap.read()
+            if not ret or frame is None:
+                time.sleep(0.01)
+                continue
+            with self._new_frame:
+                self._frame, self._seq, self._timestamp = frame, self._seq + 1, time.perf_counter()
+                self._new_frame.notify_all()
+            self.stats.record(time.perf_counter() - start)
+
+    def latest(self, after_seq=0, timeout=0.5):
+        """
+        Waits for a frame newer than `after_seq`.
+
+        Returns:
+            tuple: (frame, seq, capture time) or (None, after_seq, 0.0) on timeout.
+        """
+        with self._new_frame:
+            if not self._new_frame.wait_for(lambda: self._seq > after_seq or self.stopped.is_set(), timeout):
+                return None, after_seq, 0.0
+            return self._frame, self._seq, self._timestamp
+
+    def stop(self):
+        self.stopped.set()
+        with self._new_frame:
+            self._new_frame.notify_all()
+
+
+class InferenceWorker(threading.Thread):
+    """
+    Runs `infer(frame)` on the newest grabbed frame, skipping any frames that
+    arrived while the previous inference was running.
+    """
+
+    def __init__(self, grabber, infer):
+        super().__init__(name="InferenceWorker", daemon=True)
+        self.grabber = grabber
+        self.infer = infer
+        self.stats = StageStats("inference")
+        self.dropped = 0
+        self.stopped = threading.Event()
+        self._result = None
+        self._result_seq = 0
+        self._result_age = 0.0
+        self._lock = threading.Lock()
+
+    def run(self):
+        seq = 0
+        while not self.stopped.is_set():
+            frame, new_seq, captured_at = self.grabber.latest(seq)
+            if frame is None:
+                continue
+            if seq:
+                self.dropped += new_seq - seq - 1
+            seq = new_seq
+            start = time.perf_counter()
+            try:
+                result = self.infer(frame)
+            except Exception as e:
+                print(f"[!] Inference failed: {e}")
+                continue
+            finished = time.perf_counter()
+            self.stats.record(finished - start)
+            with self._lock:
+                self._result, self._result_seq = result, seq
+                # Capture-to-result latency, including time spent waiting for the worker
+                self._result_age = finished - captured_at
+
+    def latest_result(self):
+        """Returns (result, seq of the frame it was computed on, capture-to-result seconds)."""
+        with self._lock:
+            return self._result, self._result_seq, self._result_age
+
+    def stop(self):
+        self.stopped.set()
@@ -0,0 +1,131 @@
+import itertools
+import cv2
+import numpy as np
+
+
+def iou(a, b):
+    """Intersection over union of two (top, right, bottom, left) boxes."""
+    top, bottom = max(a[0], b[0]), min(a[2], b[2])
+    left, right = max(a[3], b[3]), min(a[1], b[1])
+    inter = max(0, bottom - top) * max(0, right - left)
+    area_a = (a[2] - a[0]) * (a[1] - a[3])
+    area_b = (b[2] - b[0]) * (b[1] - b[3])
+    union = area_a + area_b - inter
+    return inter / union if union > 0 else 0.0
+
+
+class Track:
+    """One followed face: its box, appearance template and cached identity."""
+
+    _ids = itertools.count(1)
+
+    def __init__(self, bbox, template, frame_index):
+        self.id = next(Track._ids)
+        self.bbox = bbox
+        self.template = template
+        self.name = "Unknown"
+        self.distance = float("inf")
+        self.verified_at = None
+        self.updated_at = frame_index
+
+    def needs_verification(self, frame_index, reverify_every):
+        return self.verified_at is None or frame_index - self.verified_at >= reverify_every
+
+    def set_identity(self, name, distance, frame_index):
+        self.name, self.distance, self.verified_at = name, distance, frame_index
+
+
+class FaceTracker:
+    """
+    Follows faces between detector runs with normalized template matching.
+
+    Boxes are in the coordinates of the (already downscaled) frame the webcam
+    loop processes. Each track keeps the identity it was last recognized as, so
+    the expensive encoding step only runs for new faces and for tracks whose
+    identity is due for re-verification.
+    """
+
+    def __init__(self, min_score=0.5, search_margin=0.5):
+        """
+        Args:
+            min_score (float): Minimum TM_CCOEFF_NORMED score for a track to count as found.
+            search_margin (float): Search window padding around the last box, as a fraction of its size.
+        """
+        self.min_score = min_score
+        self.search_margin = search_margin
+        self.tracks = []
+
+    @staticmethod
+    def _crop(gray, bbox):
+        top, right, bottom, left = bbox
+        return gray[max(top, 0):max(bottom, 0), max(left, 0):max(right, 0)].copy()
+
+    def associate(self, locations, min_iou=0.3):
+        """Greedily pairs detections with existing tracks; returns a track or None per location."""
+        pairs = sorted(((iou(location, track.bbox), i, track) for i, location in enumerate(locations)
+                        for track in self.tracks), key=lambda p: p[0], reverse=True)
+        matched, used = [None] * len(locations), set()
+        for overlap, i, track in pairs:
+            if overlap < min_iou:
+                break
+            if matched[i] is None and track.id not in used:
+                matched[i] = track
+                used.add(track.id)
+        return matched
+
+    def update_from_detections(self, gray, frame_index, locations, matched, identities):
+        """
+        Replaces the track set with the current detections.
+
+        Args:
+            gray (np.ndarray): Grayscale frame the detections come from.
+            frame_index (int): Index of that frame.
+            locations (list): Detected (top, right, bottom, left) boxes.
+            matched (list): Output of `associate` for these locations.
+            identities (list): (name, distance) per location, or None to keep the
+                matched track's cached identity.
+        """
+        tracks = []
+        for location, track, identity in zip(locations, matched, identities):
+            if track is None:
+                track = Track(location, None, frame_index)
+            track.bbox = location
+            track.template = self._crop(gray, location)
+            track.updated_at = frame_index
+            if identity is not None:
+                track.set_identity(identity[0], identity[1], frame_index)
+            tracks.append(track)
+        self.tracks = tracks
+
+    def track(self, gray, frame_index):
+        """
+        Moves every track to its best template match in the new frame.
+
+        Returns:
+            bool: False if any track was lost, meaning the caller should run full
+            detection now. With no tracks nothing can be lost, so an empty scene
+            waits for the regular detection interval like any other.
+        """
+        if not self.tracks:
+            return True
+        height, width = gray.shape[:2]
+        for track in self.tracks:
+            top, right, bottom, left = track.bbox
+            box_h, box_w = bottom - top, right - left
+            if track.template is None or track.template.size == 0 or box_h <= 0 or box_w <= 0:
+                return False
+            pad_y, pad_x = int(box_h * self.search_margin), int(box_w * self.search_margin)
+            y0, x0 = max(top - pad_y, 0), max(left - pad_x, 0)
+            y1, x1 = min(bottom + pad_y, height), min(right + pad_x, width)
+            window = gray[y0:y1, x0:x1]
+            if window.shape[0] < track.template.shape[0] or window.shape[1] < track.template.shape[1]:
+                return False
+
+            scores = cv2.matchTemplate(window, track.template, cv2.TM_CCOEFF_NORMED)
+            _, score, _, (dx, dy) = cv2.minMaxLoc(scores)
+            if not np.isfinite(score) or score < self.min_score:
+                return False
+            new_top, new_left = y0 + dy, x0 + dx
+            track.bbox = (new_top, new_left + track.template.shape[1], new_top + track.template.shape[0], new_left)
+            track.updated_at = frame_index
+        return True
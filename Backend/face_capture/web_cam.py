@@ -1,5 +1,28 @@
+import os
+import sys
+import time
 import cv2
 
+# Add project root to sys.path
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..', '..')))
+
+from Backend.face_capture.pipeline import FrameGrabber, InferenceWorker, StageStats
+
+
+def open_capture(source):
+    """
+    Opens a device index, video file or stream URL.
+
+    Device indices (ints or digit strings) use DirectShow on Windows for better
+    compatibility; everything else goes through OpenCV's default backend.
+    """
+    if isinstance(source, str) and source.isdigit():
+        source = int(source)
+    if isinstance(source, int):
+        backend = cv2.CAP_DSHOW if os.name == 'nt' else cv2.CAP_ANY
+        return cv2.VideoCapture(source, backend)
+    return cv2.VideoCapture(source)
+
 class Webcam:
     """
     A class to provide a clean interface for webcam operations using OpenCV.
@@ -17,15 +40,14 @@ class Webcam:
         """
         self.camera_index = camera_index
         self.window_name = window_name
-        # Use cv2.CAP_DSHOW for better compatibility on Windows
-        self.cap = cv2.VideoCapture(self.camera_index, cv2.CAP_DSHOW)
+        self.cap = open_capture(self.camera_index)
 
         # If the default camera is not opened, try to find one
         if not self.cap.isOpened():
             print(f"---[INFO] Camera index {self.camera_index} failed. Trying other indices...")
             for i in range(5): # Try indices 0 through 4
                 if i == self.camera_index: continue
-                cap_test = cv2.VideoCapture(i, cv2.CAP_DSHOW)
+                cap_test = open_capture(i)
                 if cap_test.isOpened():
                     print(f"---[INFO] Successfully opened camera at index {i}.")
                     self.camera_index = i
@@ -53,6 +75,79 @@ class Webcam:
 
         self.release()
 
+    def infer(self, frame):
+        """
+        Inference stage of `show_pipelined`, run on a worker thread.
+
+        Args:
+            frame: The newest camera frame (must not be modified).
+
+        Returns:
+            Annotations passed to `render`; None by default.
+        """
+        return None
+
+    def render(self, frame, result):
+        """
+        Display stage of `show_pipelined`: draws the most recent `infer` result onto a frame.
+
+        Returns:
+            The frame to display.
+        """
+        return frame
+
+    def handle_key(self, key, frame):
+        """Handles a key press in `show_pipelined`; returns True to exit (ESC by default)."""
+        return key == 27
+
+    def show_pipelined(self, stats_interval=5.0):
+        """
+        Displays the feed with capture, inference and display running concurrently.
+
+        A grabber thread always holds the newest frame, an inference worker runs
+        `infer` on whatever is newest when it becomes free (stale frames are
+        dropped), and this thread renders every new frame at camera rate with the
+        latest available result. Per-stage FPS and latency are drawn on the frame
+        and printed every `stats_interval` seconds.
+        """
+        grabber = FrameGrabber(self.cap)
+        worker = InferenceWorker(grabber, self.infer)
+        display_stats = StageStats("display")
+        grabber.start()
+        worker.start()
+
+        seq, last_report = 0, time.perf_counter()
+        try:
+            while True:
+                frame, seq, _ = grabber.latest(seq)
+                if frame is None:
+                    continue
+                start = time.perf_counter()
+                result, _, result_age = worker.latest_result()
+                output = self.render(frame.copy(), result)
+
+                stages = (grabber.stats, worker.stats, display_stats)
+                for i, stats in enumerate(stages):
+                    cv2.putText(output, stats.summary(), (output.shape[1] - 330, 25 + 22 * i),
+                                cv2.FONT_HERSHEY_SIMPLEX, 0.55, (0, 255, 255), 1)
+                cv2.imshow(self.window_name, output)
+                key = cv2.waitKey(1) & 0xFF
+                display_stats.record(time.perf_counter() - start)
+
+                if time.perf_counter() - last_report >= stats_interval:
+                    last_report = time.perf_counter()
+                    print(f"[STATS] {' | '.join(s.summary() for s in stages)} | "
+                          f"result age {result_age * 1000:.0f} ms | dropped {worker.dropped}")
+
+                if key != 255 and self.handle_key(key, frame):
+                    break
+        finally:
+            worker.stop()
+            grabber.stop()
+            worker.join(timeout=2.0)
+            grabber.join(timeout=2.0)
+            self.release()
+
     def capture_frame(self, filename="capture.jpg"):
         """
         Capture a single frame and save it as an image file.
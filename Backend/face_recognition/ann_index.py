@@ -0,0 +1,183 @@
+import numpy as np
+
+
+def kmeans(data, k, iterations=20, seed=0):
+    """
+    Plain Lloyd's k-means in NumPy.
+
+    Args:
+        data (np.ndarray): (N, D) float32 training vectors.
+        k (int): Number of centroids; clipped to N.
+        iterations (int): Number of assignment/update rounds.
+        seed (int): Seed for the random initialisation.
+
+    Returns:
+        np.ndarray: (k, D) float32 centroids.
+    """
+    data = np.asarray(data, dtype=np.float32)
+    k = min(k, len(data))
+    rng = np.random.default_rng(seed)
+    centroids = data[rng.choice(len(data), k, replace=False)].copy()
+    data_sq = np.einsum('ij,ij->i', data, data)
+
+    for _ in range(iterations):
+        assignment = nearest_centroids(data, centroids, data_sq)
+        counts = np.bincount(assignment, minlength=k)
+        filled = counts > 0
+        order = np.argsort(assignment, kind='stable')
+        starts = np.concatenate([[0], np.cumsum(counts)[:-1]])[filled]
+        centroids[filled] = np.add.reduceat(data[order], starts, axis=0) / counts[filled, None]
+        # Re-seed empty clusters on random points so every list stays useful
+        empty = np.flatnonzero(~filled)
+        if len(empty):
+            centroids[empty] = data[rng.choice(len(data), len(empty), replace=False)]
+    return centroids
+
+
+def squared_distances(vectors, centroids, vectors_sq=None):
+    """(N, K) squared euclidean distances between two sets of row vectors."""
+    if vectors_sq is None:
+        vectors_sq = np.einsum('ij,ij->i', vectors, vectors)
+    centroids_sq = np.einsum('ij,ij->i', centroids, centroids)
+    return vectors_sq[:, None] + centroids_sq[None, :] - 2.0 * (vectors @ centroids.T)
+
+
+def nearest_centroids(vectors, centroids, vectors_sq=None):
+    return np.argmin(squared_distances(vectors, centroids, vectors_sq), axis=1)
+
+
+class IVFIndex:
+    """
+    Inverted-file approximate nearest-neighbour index, optionally product-quantized.
+
+    A coarse k-means quantizer splits the gallery into `nlist` cells; a query only
+    scans the `nprobe` cells whose centroids are closest to it. With
+    `pq_subvectors` > 0 each row is stored as one uint8 code per sub-vector of its
+    residual to the cell centroid (16 bytes instead of 512 for the default
+    settings) and distances are estimated from per-query lookup tables.
+
+    Distances returned by `search` are approximate for the PQ variant; callers
+    that need exact distances re-rank the returned candidates.
+    """
+
+    def __init__(self, nlist, nprobe=8, pq_subvectors=0, pq_centroids=256, seed=0):
+        """
+        Args:
+            nlist (int): Number of coarse clusters.
+            nprobe (int): Number of clusters scanned per query.
+            pq_subvectors (int): Sub-vectors per row for product quantization, 0 to store raw rows.
+            pq_centroids (int): Codebook size per sub-vector (at most 256).
+            seed (int): Seed for k-means initialisation.
+        """
+        self.nlist = nlist
+        self.nprobe = nprobe
+        self.pq_subvectors = pq_subvectors
+        self.pq_centroids = pq_centroids
+        self.seed = seed
+        self.centroids = None
+        self.codebooks = None
+        self.size = 0
+        self._list_ids = []
+        self._list_data = []
+
+    @property
+    def is_trained(self):
+        return self.centroids is not None
+
+    def train(self, vectors, max_train=20000):
+        """Learns the coarse quantizer (and PQ codebooks) from a sample of `vectors`."""
+        vectors = np.asarray(vectors, dtype=np.float32)
+        if len(vectors) > max_train:
+            sample = np.random.default_rng(self.seed).choice(len(vectors), max_train, replace=False)
+            vectors = vectors[np.sort(sample)]
+
+        self.centroids = kmeans(vectors, self.nlist, seed=self.seed)
+        self.nlist = len(self.centroids)
+        dim = vectors.shape[1]
+        self._list_ids = [np.empty(0, dtype=np.int64) for _ in range(self.nlist)]
+        if self.pq_subvectors:
+            if dim % self.pq_subvectors:
+                raise ValueError(f"pq_subvectors must divide the embedding size ({dim})")
+            residuals = vectors - self.centroids[nearest_centroids(vectors, self.centroids)]
+            sub_dim = dim // self.pq_subvectors
+            self.codebooks = np.stack([
+                kmeans(residuals[:, m * sub_dim:(m + 1) * sub_dim], self.pq_centroids, iterations=15, seed=self.seed + m)
+                for m in range(self.pq_subvectors)
+            ])
+            self._list_data = [np.empty((0, self.pq_subvectors), dtype=np.uint8) for _ in range(self.nlist)]
+        else:
+            self._list_data = [np.empty((0, dim), dtype=np.float32) for _ in range(self.nlist)]
+
+    def _encode(self, residuals):
+        sub_dim = residuals.shape[1] // self.pq_subvectors
+        codes = np.empty((len(residuals), self.pq_subvectors), dtype=np.uint8)
+        for m in range(self.pq_subvectors):
+            codes[:, m] = nearest_centroids(residuals[:, m * sub_dim:(m + 1) * sub_dim], self.codebooks[m])
+        return codes
+
+    def add(self, vectors, ids):
+        """
+        Inserts rows into their cells; can be called at any time after `train`.
+
+        Args:
+            vectors: (M, D) rows to insert.
+            ids: (M,) integer ids returned by `search` for these rows.
+        """
+        vectors = np.asarray(vectors, dtype=np.float32).reshape(-1, self.centroids.shape[1])
+        ids = np.asarray(ids, dtype=np.int64).reshape(-1)
+        assignment = nearest_centroids(vectors, self.centroids)
+        if self.pq_subvectors:
+            data = self._encode(vectors - self.centroids[assignment])
+        else:
+            data = vectors
+
+        for cell in np.unique(assignment):
+            members = assignment == cell
+            self._list_ids[cell] = np.concatenate([self._list_ids[cell], ids[members]])
+            self._list_data[cell] = np.concatenate([self._list_data[cell], data[members]])
+        self.size += len(ids)
+
+    def search(self, queries, k=1):
+        """
+        Finds approximate nearest neighbours.
+
+        Args:
+            queries: (M, D) query vectors.
+            k (int): Number of neighbours per query.
+
+        Returns:
+            tuple: (distances, ids), both (M, k). Missing neighbours have id -1
+            and distance inf. Distances are euclidean, not squared.
+        """
+        queries = np.asarray(queries, dtype=np.float32).reshape(-1, self.centroids.shape[1])
+        distances = np.full((len(queries), k), np.inf, dtype=np.float32)
+        ids = np.full((len(queries), k), -1, dtype=np.int64)
+        nprobe = min(self.nprobe, self.nlist)
+        coarse = squared_distances(queries, self.centroids)
+        probes = np.argpartition(coarse, nprobe - 1, axis=1)[:, :nprobe]
+
+        for qi, query in enumerate(queries):
+            cells = [cell for cell in probes[qi] if len(self._list_ids[cell])]
+            if not cells:
+                continue
+            candidate_ids = np.concatenate([self._list_ids[cell] for cell in cells])
+            if self.pq_subvectors:
+                sq = np.concatenate([self._adc(query - self.centroids[cell], self._list_data[cell]) for cell in cells])
+            else:
+                rows = np.concatenate([self._list_data[cell] for cell in cells])
+                diff = rows - query
+                sq = np.einsum('ij,ij->i', diff, diff)
+
+            top = min(k, len(sq))
+            best = np.argpartition(sq, top - 1)[:top]
+            best = best[np.argsort(sq[best])]
+            distances[qi, :top] = np.sqrt(np.maximum(sq[best], 0.0))
+            ids[qi, :top] = candidate_ids[best]
+        return distances, ids
+
+    def _adc(self, residual, codes):
+        """Asymmetric distance: exact query residual against quantized rows via lookup tables."""
+        sub_dim = len(residual) // self.pq_subvectors
+        sub_queries = residual.reshape(self.pq_subvectors, 1, sub_dim)
+        tables = np.sum((self.codebooks - sub_queries) ** 2, axis=2)
+        return tables[np.arange(self.pq_subvectors), codes].sum(axis=1)
@@ -0,0 +1,226 @@
+import cv2
+import numpy as np
+import face_recognition
+
+from Backend import config
+from Backend.metrics import metrics
+
+# OpenCV reduced-decode flags by downscale factor (JPEG decodes these via DCT scaling)
+_REDUCED_DECODE_FLAGS = ((8, cv2.IMREAD_REDUCED_COLOR_8), (4, cv2.IMREAD_REDUCED_COLOR_4),
+                         (2, cv2.IMREAD_REDUCED_COLOR_2), (1, cv2.IMREAD_COLOR))
+
+
+class Detection:
+    """One detected face: its full-resolution box plus the scaled image it was found in."""
+
+    __slots__ = ("location", "image", "local_location", "scale")
+
+    def __init__(self, location, image, local_location, scale):
+        self.location = location              # (top, right, bottom, left) in full-resolution pixels
+        self.image = image                    # RGB image the face was detected in
+        self.local_location = local_location  # the same box in `image` coordinates
+        self.scale = scale                    # `image` size / full-resolution size
+
+    @property
+    def size(self):
+        top, right, bottom, left = self.local_location
+        return min(bottom - top, right - left)
+
+
+class _ImageSource:
+    """
+    Serves an image at any scale of its full resolution, starting from a reduced
+    copy and only decoding (`data`) or switching to (`full_image`) the full-size
+    image if a scale above the reduced one is actually requested.
+    """
+
+    def __init__(self, image, reduction=1, data=None, full_image=None):
+        self.image = image
+        self.reduction = reduction
+        self.data = data
+        self.full_image = full_image
+        if full_image is not None:
+            self.full_shape = full_image.shape[:2]
+        else:
+            self.full_shape = (image.shape[0] * reduction, image.shape[1] * reduction)
+
+    def at(self, scale, region=None):
+        """
+        Returns the RGB image (or a full-resolution `region` of it) resized to `scale`.
+
+        Args:
+            scale (float): Target size relative to the full-resolution image.
+            region (tuple): Optional (top, right, bottom, left) crop in full-resolution pixels.
+        """
+        if scale * self.reduction > 1.0 + 1e-3 and self.reduction > 1:
+            full = self.full_image
+            if full is None and self.data is not None:
+                with metrics.timer("decode"):
+                    full = cv2.imdecode(np.frombuffer(self.data, np.uint8), cv2.IMREAD_COLOR)
+            if full is not None:
+                self.image, self.reduction = full, 1
+        factor = scale * self.reduction
+        image = self.image
+        if region is not None:
+            top, right, bottom, left = (int(v / self.reduction) for v in region)
+            image = image[max(top, 0):max(bottom, 0), max(left, 0):max(right, 0)]
+        if image.size == 0:
+            return image[:, :, ::-1]
+        with metrics.timer("resize"):
+            if abs(factor - 1.0) > 1e-3:
+                interpolation = cv2.INTER_AREA if factor < 1.0 else cv2.INTER_LINEAR
+                image = cv2.resize(image, (0, 0), fx=factor, fy=factor, interpolation=interpolation)
+            return np.ascontiguousarray(image[:, :, ::-1])
+
+
+class AdaptiveDetector:
+    """
+    Coarse-to-fine face detection shared by the webcam, Flask and video-search paths.
+
+    The image is first searched at a low scale. If nothing is found the whole
+    image is searched again at twice the scale, up to `max_scale`. Faces found
+    smaller than `min_face_px` at the scale they were detected at (where HOG
+    boxes and encodings get unreliable) are re-detected on a crop around them at
+    a scale that makes them large enough.
+    """
+
+    def __init__(self, scale=None, coarse_width=None, min_scale=None, max_scale=None, min_face_px=None,
+                 escalate_empty=True, refine_small=True):
+        """
+        Args:
+            scale (float): Fixed coarse scale (e.g. 0.25 for video frames); when None the coarse
+                scale shrinks the image to `coarse_width` pixels wide.
+            coarse_width (int): Width of the coarse pass, defaults to config.DETECT_COARSE_WIDTH.
+            min_scale (float): Lower bound for the coarse scale, defaults to config.DETECT_MIN_SCALE.
+            max_scale (float): Upper bound for any pass, defaults to config.DETECT_MAX_SCALE.
+            min_face_px (int): Faces smaller than this are refined, defaults to config.DETECT_MIN_FACE_PX.
+            escalate_empty (bool): Re-run at higher scales when the coarse pass finds nothing.
+            refine_small (bool): Re-detect small faces on an upscaled crop.
+        """
+        self.scale = scale
+        self.coarse_width = coarse_width or config.DETECT_COARSE_WIDTH
+        self.min_scale = config.DETECT_MIN_SCALE if min_scale is None else min_scale
+        self.max_scale = config.DETECT_MAX_SCALE if max_scale is None else max_scale
+        self.min_face_px = config.DETECT_MIN_FACE_PX if min_face_px is None else min_face_px
+        self.escalate_empty = escalate_empty
+        self.refine_small = refine_small
+
+    def _coarse_scale(self, width):
+        scale = self.scale if self.scale is not None else self.coarse_width / float(width)
+        return float(np.clip(scale, self.min_scale, max(self.max_scale, self.min_scale)))
+
+    def _find(self, source, scale, region=None):
+        image = source.at(scale, region)
+        if image.size == 0:
+            return []
+        offset_y, offset_x = (region[0], region[3]) if region is not None else (0, 0)
+        with metrics.timer("detect"):
+            locations = face_recognition.face_locations(image)
+        detections = []
+        for local in locations:
+            top, right, bottom, left = local
+            location = (int(top / scale) + offset_y, int(right / scale) + offset_x,
+                        int(bottom / scale) + offset_y, int(left / scale) + offset_x)
+            detections.append(Detection(location, image, local, scale))
+        return detections
+
+    def _refine(self, source, detection):
+        """Re-detects a small face on a crop at a scale where it is `2 * min_face_px` wide."""
+        scale = min(self.max_scale, detection.scale * 2.0 * self.min_face_px / max(detection.size, 1))
+        if scale <= detection.scale * 1.25:
+            return detection
+        top, right, bottom, left = detection.location
+        pad_y, pad_x = bottom - top, right - left
+        height, width = source.full_shape
+        region = (max(top - pad_y, 0), min(right + pad_x, width), min(bottom + pad_y, height), max(left - pad_x, 0))
+        candidates = self._find(source, scale, region)
+        if not candidates:
+            return detection
+        # The refined box is the candidate closest to the coarse one
+        center = np.array([(top + bottom) / 2.0, (left + right) / 2.0])
+        return min(candidates, key=lambda d: np.linalg.norm(
+            np.array([(d.location[0] + d.location[2]) / 2.0, (d.location[1] + d.location[3]) / 2.0]) - center))
+
+    def _locate(self, source):
+        scale = self._coarse_scale(source.full_shape[1])
+        detections = self._find(source, scale)
+        while not detections and self.escalate_empty and scale < self.max_scale:
+            scale = min(scale * 2.0, self.max_scale)
+            detections = self._find(source, scale)
+        if self.refine_small:
+            detections = [self._refine(source, d) if d.size < self.min_face_px else d for d in detections]
+        return detections
+
+    def locate(self, image_bgr, small_image=None, small_scale=None):
+        """
+        Finds faces in a BGR image; returns a list of Detection.
+
+        Args:
+            image_bgr (np.ndarray): The full-resolution image.
+            small_image (np.ndarray): Optional copy of it the caller already resized to
+                `small_scale`; passes at that scale use it instead of resizing again.
+            small_scale (float): Scale of `small_image` relative to `image_bgr`.
+        """
+        if small_image is not None:
+            source = _ImageSource(small_image, 1.0 / small_scale, full_image=image_bgr)
+        else:
+            source = _ImageSource(image_bgr)
+        detections = self._locate(source)
+        metrics.count("faces_detected", len(detections))
+        return detections
+
+    @staticmethod
+    def encode(detections):
+        """Computes the 128-d encoding of each detection, batching faces found in the same image."""
+        encodings = [None] * len(detections)
+        groups = {}
+        for i, detection in enumerate(detections):
+            groups.setdefault(id(detection.image), []).append(i)
+        for indices in groups.values():
+            image = detections[indices[0]].image
+            with metrics.timer("encode"):
+                image_encodings = face_recognition.face_encodings(image, [detections[i].local_location
+                                                                          for i in indices])
+            for i, encoding in zip(indices, image_encodings):
+                encodings[i] = encoding
+        metrics.count("faces_encoded", len(detections))
+        return encodings
+
+    def detect(self, image_bgr):
+        """
+        Returns:
+            tuple: (face_locations in full-resolution pixels, face_encodings).
+        """
+        detections = self.locate(image_bgr)
+        return [d.location for d in detections], self.encode(detections)
+
+    def detect_bytes(self, data):
+        """
+        Detects faces in an encoded image (e.g. an upload), decoding it at reduced
+        resolution first and only fully when a finer pass needs the pixels.
+
+        Returns:
+            tuple: (face_locations in full-resolution pixels, face_encodings).
+
+        Raises:
+            ValueError: If the bytes cannot be decoded as an image.
+        """
+        buffer = np.frombuffer(data, np.uint8)
+        with metrics.timer("decode"):
+            # The 1/8 decode is cheap and tells us the full width; keep it if the coarse pass is that small
+            reduction, flag = _REDUCED_DECODE_FLAGS[0]
+            image = cv2.imdecode(buffer, flag)
+            if image is None:
+                raise ValueError("Could not decode image")
+            coarse = self._coarse_scale(image.shape[1] * reduction)
+            for candidate, candidate_flag in _REDUCED_DECODE_FLAGS:
+                if candidate * coarse <= 1.0 or candidate == 1:
+                    if candidate != reduction:
+                        decoded = cv2.imdecode(buffer, candidate_flag)
+                        if decoded is not None:
+                            image, reduction = decoded, candidate
+                    break
+        source = _ImageSource(image, reduction, data)
+        detections = self._locate(source)
+        metrics.count("faces_detected", len(detections))
+        return [d.location for d in detections], self.encode(detections)
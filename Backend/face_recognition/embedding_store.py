@@ -0,0 +1,218 @@
+import os
+import sys
+import json
+import pickle
+from contextlib import contextmanager
+import numpy as np
+
+try:
+    import fcntl
+except ImportError:  # Windows
+    fcntl = None
+    import msvcrt
+
+EMBEDDING_DIM = 128
+
+EMBEDDINGS_FILE = "gallery.f32"
+LABELS_FILE = "gallery_labels.i32"
+INDEX_FILE = "gallery_index.json"
+LOCK_FILE = INDEX_FILE + ".lock"
+STORE_VERSION = 1
+
+
+def append_committed(path, data, committed_bytes):
+    """
+    Appends `data` to an append-only file whose first `committed_bytes` are referenced
+    by a committed index, and syncs it. Any uncommitted tail left behind by an
+    interrupted append is dropped first; a file shorter than that is an error, never padded.
+    """
+    with open(path, 'ab') as f:
+        size = f.tell()
+        if size < committed_bytes:
+            raise IOError(f"{path} holds {size} bytes but {committed_bytes} are committed")
+        if size != committed_bytes:
+            f.truncate(committed_bytes)
+            f.seek(committed_bytes)
+        f.write(data)
+        f.flush()
+        os.fsync(f.fileno())
+
+
+def write_durable(path, data):
+    """Writes a whole file and syncs it to disk."""
+    with open(path, 'wb') as f:
+        f.write(data)
+        f.flush()
+        os.fsync(f.fileno())
+
+
+def write_json_atomic(path, obj):
+    """
+    Replaces a JSON file atomically: readers see either the old or the new content.
+    This is the commit point of the append-only stores built on `append_committed`.
+    """
+    tmp_path = path + ".tmp"
+    write_durable(tmp_path, json.dumps(obj).encode('utf-8'))
+    os.replace(tmp_path, path)
+
+
+@contextmanager
+def store_lock(directory):
+    """Holds an exclusive lock on the store in `directory` across processes."""
+    os.makedirs(directory, exist_ok=True)
+    with open(os.path.join(directory, LOCK_FILE), 'a+b') as f:
+        if fcntl is not None:
+            fcntl.flock(f.fileno(), fcntl.LOCK_EX)
+        else:
+            f.seek(0)
+            msvcrt.locking(f.fileno(), msvcrt.LK_LOCK, 1)
+        try:
+            yield
+        finally:
+            if fcntl is not None:
+                fcntl.flock(f.fileno(), fcntl.LOCK_UN)
+            else:
+                f.seek(0)
+                msvcrt.locking(f.fileno(), msvcrt.LK_UNLCK, 1)
+
+
+class EmbeddingStore:
+    """
+    Single-file, memory-mappable storage for the face gallery.
+
+    The gallery lives in three files inside the embeddings directory:
+    - `gallery.f32`: every embedding as raw float32 rows of 128 values, append-only.
+    - `gallery_labels.i32`: one int32 label id per row.
+    - `gallery_index.json`: the committed row count and the label id -> name table.
+
+    Loading only memory-maps the two binary files and reads the small index, so it
+    costs the same for ten people as for ten thousand, and every process that opens
+    the store shares the same pages through the OS page cache. Rows past the
+    committed count (a write interrupted by a crash) are ignored and trimmed on
+    the next append.
+    """
+
+    def __init__(self, directory):
+        """
+        Args:
+            directory (str): The embeddings directory holding the store files.
+        """
+        self.directory = directory
+        self.embeddings_file = os.path.join(directory, EMBEDDINGS_FILE)
+        self.labels_file = os.path.join(directory, LABELS_FILE)
+        self.index_file = os.path.join(directory, INDEX_FILE)
+
+    def exists(self):
+        return os.path.exists(self.index_file)
+
+    def read_index(self):
+        """Returns the committed index, or an empty one if the store has not been created yet."""
+        if not self.exists():
+            return {"version": STORE_VERSION, "dim": EMBEDDING_DIM, "count": 0, "names": []}
+        with open(self.index_file, 'r', encoding='utf-8') as f:
+            return json.load(f)
+
+    def load(self):
+        """
+        Memory-maps the committed part of the store.
+
+        Returns:
+            tuple: (embeddings, label_ids, names) where `embeddings` is a read-only
+            (N, 128) float32 memmap, `label_ids` a read-only (N,) int32 memmap and
+            `names` the list mapping label ids to person names.
+        """
+        index = self.read_index()
+        count = index["count"]
+        if count == 0:
+            return (np.empty((0, EMBEDDING_DIM), dtype=np.float32),
+                    np.empty(0, dtype=np.int32), list(index["names"]))
+
+        embeddings = np.memmap(self.embeddings_file, dtype=np.float32, mode='r', shape=(count, EMBEDDING_DIM))
+        label_ids = np.memmap(self.labels_file, dtype=np.int32, mode='r', shape=(count,))
+        return embeddings, label_ids, list(index["names"])
+
+    def append(self, names, embeddings):
+        """
+        Appends embeddings to the store and commits them.
+
+        Args:
+            names (list[str]): Person name for each embedding.
+            embeddings: (M, 128) array or list of embeddings, parallel to `names`.
+
+        Returns:
+            int: The committed row count after the append.
+        """
+        rows = np.asarray(embeddings, dtype=np.float32).reshape(-1, EMBEDDING_DIM)
+        if len(rows) != len(names):
+            raise ValueError("names and embeddings must have the same length")
+
+        os.makedirs(self.directory, exist_ok=True)
+        index = self.read_index()
+        count = index["count"]
+        name_table = index["names"]
+        name_ids = {name: i for i, name in enumerate(name_table)}
+        label_ids = np.empty(len(names), dtype=np.int32)
+        for i, name in enumerate(names):
+            if name not in name_ids:
+                name_ids[name] = len(name_table)
+                name_table.append(name)
+            label_ids[i] = name_ids[name]
+
+        # Data first, index last: the index only ever points at fully written rows
+        append_committed(self.embeddings_file, rows.tobytes(), count * EMBEDDING_DIM * 4)
+        append_committed(self.labels_file, label_ids.tobytes(), count * 4)
+
+        index["count"] = count + len(rows)
+        index["names"] = name_table
+        write_json_atomic(self.index_file, index)
+        return index["count"]
+
+
+def migrate_pickles(embeddings_path, force=False):
+    """
+    One-shot migration of the legacy per-person `.pkl` files into an EmbeddingStore.
+
+    The pickles are left in place so older checkouts keep working. The migration
+    holds the store lock, so processes opening an unmigrated gallery at the same
+    time (the Flask server, the camera service, pool workers) migrate it only once.
+
+    Args:
+        embeddings_path (str): Directory holding `<person>.pkl` files.
+        force (bool): Rebuild the store even if it already exists.
+
+    Returns:
+        EmbeddingStore: The populated store.
+    """
+    store = EmbeddingStore(embeddings_path)
+    with store_lock(embeddings_path):
+        # Checked under the lock: another process may have committed the migration while we waited
+        if store.exists() and not force:
+            print(f"[*] Embedding store already exists at {embeddings_path}, skipping migration.")
+            return store
+
+        names, rows = [], []
+        for filename in sorted(os.listdir(embeddings_path)):
+            if filename.endswith(".pkl"):
+                person_name = os.path.splitext(filename)[0]
+                with open(os.path.join(embeddings_path, filename), 'rb') as f:
+                    embeddings = pickle.load(f)
+                for embedding in embeddings:
+                    names.append(person_name)
+                    rows.append(np.asarray(embedding, dtype=np.float32))
+
+        for path in (store.embeddings_file, store.labels_file, store.index_file):
+            if os.path.exists(path):
+                os.remove(path)
+        store.append(names, np.array(rows, dtype=np.float32).reshape(-1, EMBEDDING_DIM))
+    print(f"[*] Migrated {len(rows)} embeddings for {len(set(names))} individuals to {embeddings_path}.")
+    return store
+
+
+if __name__ == "__main__":
+    # Usage: python embedding_store.py [embeddings_dir] [--force]
+    args = [arg for arg in sys.argv[1:] if arg != "--force"]
+    if args:
+        target = os.path.abspath(args[0])
+    else:
+        target = os.path.abspath(os.path.join(os.path.dirname(__file__), '..', '..', 'Data', 'embeddings'))
+    migrate_pickles(target, force="--force" in sys.argv)
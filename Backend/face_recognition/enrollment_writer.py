@@ -0,0 +1,122 @@
+import os
+import struct
+import zlib
+import numpy as np
+
+from Backend.batched_writer import BatchedWriter
+from Backend.face_recognition.embedding_store import EMBEDDING_DIM
+
+JOURNAL_FILE = "enrollment.journal"
+
+# Record layout: magic, row number, name length | name bytes | embedding | crc32 of everything before it
+_HEADER = struct.Struct("<2sQH")
+_CRC = struct.Struct("<I")
+_MAGIC = b"EJ"
+_EMBEDDING_BYTES = EMBEDDING_DIM * 4
+
+
+class EnrollmentWriter(BatchedWriter):
+    """
+    Append-only, write-behind persistence for new enrollments.
+
+    `submit` appends a checksummed record to a journal next to the embedding store
+    and returns immediately; a background thread groups pending records into
+    batches and commits them to the EmbeddingStore. Every record carries the store
+    row it will occupy, so replaying the journal after a crash re-applies exactly
+    the rows that never reached the store and skips the ones that did. A torn
+    record at the end of the journal (crash mid-write) fails its checksum and is
+    discarded together with anything after it.
+
+    Only one writer per embeddings directory is supported.
+    """
+
+    def __init__(self, store, batch_size=8, flush_interval=0.5):
+        """
+        Args:
+            store (EmbeddingStore): The store the journal is committed to.
+            batch_size (int): Number of pending records that triggers an early flush.
+            flush_interval (float): Maximum seconds a record waits before being flushed.
+        """
+        super().__init__(batch_size, flush_interval, "EnrollmentWriter")
+        self.store = store
+        self.journal_path = os.path.join(store.directory, JOURNAL_FILE)
+
+        os.makedirs(store.directory, exist_ok=True)
+        self.recovered = self.replay()
+
+        self._next_row = self.store.read_index()["count"]
+        self._journal = open(self.journal_path, 'ab')
+        self._start()
+
+    @staticmethod
+    def _encode(row, person_name, embedding):
+        name_bytes = person_name.encode('utf-8')
+        body = (_HEADER.pack(_MAGIC, row, len(name_bytes)) + name_bytes
+                + np.asarray(embedding, dtype=np.float32).reshape(EMBEDDING_DIM).tobytes())
+        return body + _CRC.pack(zlib.crc32(body))
+
+    def _read_journal(self):
+        """Returns the (row, name, embedding) records up to the first torn or corrupt one."""
+        records, offset = [], 0
+        if not os.path.exists(self.journal_path):
+            return records
+        with open(self.journal_path, 'rb') as f:
+            data = f.read()
+
+        while offset + _HEADER.size <= len(data):
+            magic, row, name_len = _HEADER.unpack_from(data, offset)
+            end = offset + _HEADER.size + name_len + _EMBEDDING_BYTES
+            if magic != _MAGIC or end + _CRC.size > len(data):
+                break
+            (crc,) = _CRC.unpack_from(data, end)
+            if crc != zlib.crc32(data[offset:end]):
+                break
+            name = data[offset + _HEADER.size:offset + _HEADER.size + name_len].decode('utf-8')
+            embedding = np.frombuffer(data, dtype=np.float32, count=EMBEDDING_DIM,
+                                      offset=offset + _HEADER.size + name_len)
+            records.append((row, name, embedding))
+            offset = end + _CRC.size
+        return records
+
+    def replay(self):
+        """
+        Commits journal records that never reached the store and truncates the journal.
+
+        Returns:
+            int: Number of rows recovered.
+        """
+        records = self._read_journal()
+        committed = self.store.read_index()["count"]
+        missing = [(name, embedding) for row, name, embedding in records if row >= committed]
+        if missing:
+            self.store.append([name for name, _ in missing], np.array([e for _, e in missing]))
+            print(f"[*] Recovered {len(missing)} journaled embeddings.")
+        if os.path.exists(self.journal_path):
+            os.truncate(self.journal_path, 0)
+        return len(missing)
+
+    def submit(self, person_name, embedding):
+        """
+        Journals one embedding and schedules it for the next background flush.
+
+        The record is synced to disk before this returns, so an acknowledged
+        enrollment survives a power loss, not just a crash of this process.
+        """
+        with self._lock:
+            self._ensure_open()
+            self._journal.write(self._encode(self._next_row, person_name, embedding))
+            self._journal.flush()
+            os.fsync(self._journal.fileno())
+            self._next_row += 1
+            self._enqueue((person_name, embedding))
+
+    def _write_batch(self, batch):
+        self.store.append([name for name, _ in batch], [embedding for _, embedding in batch])
+
+    def _on_written(self):
+        if self._written == self._submitted:
+            # Everything journaled is now in the store; start the journal afresh
+            self._journal.truncate(0)
+
+    def _on_close(self):
+        self._journal.close()
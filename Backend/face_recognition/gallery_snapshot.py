@@ -0,0 +1,124 @@
+import os
+import time
+import threading
+import numpy as np
+
+from Backend import config
+from Backend.face_recognition.embedding_store import EMBEDDING_DIM
+from Backend.face_recognition.prototypes import PROTOTYPES_FILE
+from Backend.face_recognition.recognizer import FaceRecognizer
+
+_default_gallery = None
+_default_gallery_lock = threading.Lock()
+
+
+def store_version(store):
+    """
+    Cheap version stamp of an embedding store: the identity of its index file (and
+    prototypes file), which every commit replaces atomically.
+    """
+    stamp = []
+    for path in (store.index_file, os.path.join(store.directory, PROTOTYPES_FILE)):
+        try:
+            stat = os.stat(path)
+            stamp.append((stat.st_ino, stat.st_mtime_ns, stat.st_size))
+        except FileNotFoundError:
+            stamp.append(None)
+    return tuple(stamp)
+
+
+class GallerySnapshot:
+    """
+    Serves an immutable, fully warmed-up FaceRecognizer and replaces it when the
+    embedding store changes.
+
+    Readers call `current()` (or `snapshot()`) once per request and use that
+    recognizer for the whole request; no lock is taken on the read path. A
+    watcher thread polls the store's version stamp and, when new enrollments
+    are committed, builds a new recognizer in the background and swaps the
+    reference in one assignment. In-flight requests keep the snapshot they
+    started with. The watcher rebuilds at most once per `min_interval`, so a burst
+    of enrollment batches costs one rebuild. Snapshots must never be enrolled
+    into, and never write to the embeddings directory.
+    """
+
+    def __init__(self, embeddings_path=None, poll_interval=None, min_interval=None):
+        """
+        Args:
+            embeddings_path (str): Directory of the embedding store (default: Data/embeddings).
+            poll_interval (float): Seconds between version checks, defaults to
+                config.GALLERY_RELOAD_INTERVAL; 0 disables the watcher (see `refresh`).
+            min_interval (float): Minimum seconds between two watcher reloads, defaults
+                to config.GALLERY_RELOAD_MIN_INTERVAL.
+        """
+        self.embeddings_path = embeddings_path
+        self.poll_interval = config.GALLERY_RELOAD_INTERVAL if poll_interval is None else poll_interval
+        self.min_interval = config.GALLERY_RELOAD_MIN_INTERVAL if min_interval is None else min_interval
+        self._built_at = 0.0
+        self.generation = 0
+        self._current = self._build()
+        self._refresh_lock = threading.Lock()
+        self._stopped = threading.Event()
+        self._thread = None
+        if self.poll_interval > 0:
+            self._thread = threading.Thread(target=self._watch, name="GalleryWatcher", daemon=True)
+            self._thread.start()
+
+    def _build(self):
+        while True:
+            recognizer = FaceRecognizer(self.embeddings_path, write_behind=False, save_prototypes=False)
+            version = store_version(recognizer.store)
+            # A commit between the load and the stamp would be missed forever; load again if one happened
+            if recognizer.store.read_index()["count"] == len(recognizer.gallery):
+                break
+        # Build every lazy structure now, so no request pays for (or races on) it
+        recognizer.recognize_many(np.zeros((1, EMBEDDING_DIM), dtype=np.float32))
+        self._built_at = time.monotonic()
+        self.generation += 1
+        return recognizer, version, self.generation
+
+    def current(self):
+        """The recognizer of the current snapshot."""
+        return self._current[0]
+
+    def snapshot(self):
+        """Returns (recognizer, generation) of the current snapshot; the generation increases on every swap."""
+        recognizer, _, generation = self._current
+        return recognizer, generation
+
+    def refresh(self):
+        """
+        Reloads the gallery if the store changed since the current snapshot.
+
+        Returns:
+            bool: True if a new snapshot was swapped in.
+        """
+        with self._refresh_lock:
+            recognizer, version, _ = self._current
+            if store_version(recognizer.store) == version:
+                return False
+            self._current = self._build()
+            print(f"[*] Gallery snapshot {self.generation} loaded ({len(self._current[0].gallery)} embeddings).")
+            return True
+
+    def _watch(self):
+        while not self._stopped.wait(self.poll_interval):
+            if time.monotonic() - self._built_at < self.min_interval:
+                continue
+            try:
+                self.refresh()
+            except Exception as e:
+                # Keep serving the previous snapshot; the next poll retries
+                print(f"[!] Gallery reload failed: {e}")
+
+    def stop(self):
+        self._stopped.set()
+
+
+def get_gallery():
+    """The process-wide GallerySnapshot of Data/embeddings, created on first use."""
+    global _default_gallery
+    with _default_gallery_lock:
+        if _default_gallery is None:
+            _default_gallery = GallerySnapshot()
+        return _default_gallery
@@ -0,0 +1,177 @@
+"""
+Per-identity prototype compression of the face gallery.
+
+Enrollment stores ~30 near-duplicate embeddings per person. Compaction replaces
+them with a few k-means centroids ("prototypes") plus the identity's radius, the
+RMS distance of its samples to their prototype. In 128 dimensions the capture
+noise is almost orthogonal to the query offset, so a query at distance d from a
+prototype sits at about sqrt(d^2 + r^2) from the samples it summarises; matching
+on that effective distance keeps the usual 0.6 threshold meaningful.
+
+Usage:
+    python Backend/face_recognition/prototypes.py [embeddings_dir] [--max-prototypes 3] [--evaluate]
+"""
+import os
+import sys
+import time
+import argparse
+import numpy as np
+
+# Add project root to sys.path
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..', '..')))
+
+from Backend.face_recognition.ann_index import kmeans
+from Backend.face_recognition.embedding_store import EMBEDDING_DIM, EmbeddingStore
+
+PROTOTYPES_FILE = "prototypes.npz"
+
+
+def compact_identity(embeddings, max_prototypes=3, seed=0):
+    """
+    Reduces one identity's embeddings to at most `max_prototypes` centroids.
+
+    Returns:
+        tuple: ((k, 128) float32 prototypes, radius as float).
+    """
+    embeddings = np.asarray(embeddings, dtype=np.float32).reshape(-1, EMBEDDING_DIM)
+    k = min(max_prototypes, len(embeddings))
+    prototypes = kmeans(embeddings, k, iterations=10, seed=seed)
+    sq = np.sum((embeddings[:, None, :] - prototypes[None, :, :]) ** 2, axis=2)
+    radius = float(np.sqrt(np.mean(np.min(sq, axis=1))))
+    return prototypes, radius
+
+
+def build_prototypes(gallery, label_ids, max_prototypes=3):
+    """
+    Compacts a whole gallery.
+
+    Returns:
+        tuple: (prototypes (P, 128) float32, prototype label ids (P,) int32,
+        radius of each prototype's identity (P,) float32).
+    """
+    label_ids = np.asarray(label_ids)
+    prototypes, proto_labels, radii = [], [], []
+    for label in np.unique(label_ids):
+        centers, radius = compact_identity(gallery[label_ids == label], max_prototypes, seed=int(label))
+        prototypes.append(centers)
+        proto_labels.append(np.full(len(centers), label, dtype=np.int32))
+        radii.append(np.full(len(centers), radius, dtype=np.float32))
+    if not prototypes:
+        return (np.empty((0, EMBEDDING_DIM), dtype=np.float32), np.empty(0, dtype=np.int32),
+                np.empty(0, dtype=np.float32))
+    return np.concatenate(prototypes), np.concatenate(proto_labels), np.concatenate(radii)
+
+
+def match_prototypes(prototypes, proto_labels, radii, names, encodings, threshold=0.6):
+    """
+    Matches encodings against prototypes using the effective distance sqrt(d^2 + r^2).
+
+    Returns:
+        list[tuple[str, float]]: (name, effective distance) per query.
+    """
+    queries = np.asarray(encodings, dtype=np.float32).reshape(-1, EMBEDDING_DIM)
+    if len(queries) == 0:
+        return []
+    if len(prototypes) == 0:
+        return [("Unknown", float("inf"))] * len(queries)
+
+    sq = (np.einsum('ij,ij->i', queries, queries)[:, None] + np.einsum('ij,ij->i', prototypes, prototypes)[None, :]
+          - 2.0 * (queries @ prototypes.T))
+    effective = np.sqrt(np.maximum(sq, 0.0) + radii[None, :] ** 2)
+    best = np.argmin(effective, axis=1)
+
+    results = []
+    for qi, index in enumerate(best):
+        distance = float(effective[qi, index])
+        name = names[proto_labels[index]] if distance < threshold else "Unknown"
+        results.append((name, distance))
+    return results
+
+
+def save_prototypes(directory, prototypes, proto_labels, radii, count):
+    """Writes prototypes next to the store; `count` is the store row count they were built from."""
+    tmp_path = os.path.join(directory, PROTOTYPES_FILE + ".tmp.npz")
+    np.savez(tmp_path, prototypes=prototypes, labels=proto_labels, radii=radii, count=count)
+    os.replace(tmp_path, os.path.join(directory, PROTOTYPES_FILE))
+
+
+def load_prototypes(directory, count):
+    """Returns (prototypes, labels, radii), or None if missing or built from a different store size."""
+    path = os.path.join(directory, PROTOTYPES_FILE)
+    if not os.path.exists(path):
+        return None
+    with np.load(path) as data:
+        if int(data["count"]) != count:
+            return None
+        return data["prototypes"], data["labels"], data["radii"]
+
+
+def evaluate(gallery, label_ids, names, max_prototypes=3, threshold=0.6, holdout_every=5):
+    """
+    Compares raw-gallery matching with prototype matching on held-out enrollment samples.
+
+    Every `holdout_every`-th sample of each identity is removed from the gallery and
+    used as a query; both galleries are built from the remaining samples.
+
+    Returns:
+        dict: Sizes, accuracies, agreement and per-query latencies of both paths.
+    """
+    from Backend.face_recognition.recognizer import match_embeddings
+
+    gallery = np.asarray(gallery, dtype=np.float32)
+    label_ids = np.asarray(label_ids)
+    position = np.zeros(len(label_ids), dtype=np.int64)
+    for label in np.unique(label_ids):
+        members = np.flatnonzero(label_ids == label)
+        position[members] = np.arange(len(members))
+    is_query = (position % holdout_every) == holdout_every - 1
+    train, train_labels = gallery[~is_query], label_ids[~is_query]
+    queries, truth = gallery[is_query], [names[i] for i in label_ids[is_query]]
+    if len(queries) == 0:
+        raise ValueError("Not enough samples per identity to hold any out")
+
+    start = time.perf_counter()
+    raw = match_embeddings(train, np.einsum('ij,ij->i', train, train), train_labels, names, queries, threshold)
+    raw_ms = (time.perf_counter() - start) * 1000.0 / len(queries)
+
+    prototypes, proto_labels, radii = build_prototypes(train, train_labels, max_prototypes)
+    start = time.perf_counter()
+    compact = match_prototypes(prototypes, proto_labels, radii, names, queries, threshold)
+    compact_ms = (time.perf_counter() - start) * 1000.0 / len(queries)
+
+    return {
+        "queries": len(queries),
+        "raw_gallery_size": len(train),
+        "prototype_gallery_size": len(prototypes),
+        "raw_accuracy": float(np.mean([name == t for (name, _), t in zip(raw, truth)])),
+        "prototype_accuracy": float(np.mean([name == t for (name, _), t in zip(compact, truth)])),
+        "agreement": float(np.mean([a[0] == b[0] for a, b in zip(raw, compact)])),
+        "raw_ms_per_query": raw_ms,
+        "prototype_ms_per_query": compact_ms,
+    }
+
+
+def print_report(report):
+    print(f"[*] Held-out queries: {report['queries']}")
+    print(f"    Gallery size:  raw {report['raw_gallery_size']}  ->  prototypes {report['prototype_gallery_size']}")
+    print(f"    Accuracy:      raw {report['raw_accuracy']:.3f}  ->  prototypes {report['prototype_accuracy']:.3f} "
+          f"({report['prototype_accuracy'] - report['raw_accuracy']:+.3f})")
+    print(f"    Agreement:     {report['agreement']:.3f}")
+    print(f"    ms/query:      raw {report['raw_ms_per_query']:.3f}  ->  prototypes {report['prototype_ms_per_query']:.3f}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("embeddings_dir", nargs="?",
+                        default=os.path.abspath(os.path.join(os.path.dirname(__file__), '..', '..', 'Data', 'embeddings')))
+    parser.add_argument("--max-prototypes", type=int, default=3)
+    parser.add_argument("--evaluate", action="store_true", help="report accuracy change versus the raw gallery")
+    args = parser.parse_args()
+
+    store = EmbeddingStore(args.embeddings_dir)
+    gallery, label_ids, names = store.load()
+    prototypes, proto_labels, radii = build_prototypes(np.asarray(gallery), np.asarray(label_ids), args.max_prototypes)
+    save_prototypes(args.embeddings_dir, prototypes, proto_labels, radii, len(gallery))
+    print(f"[*] Compacted {len(gallery)} embeddings of {len(names)} individuals into {len(prototypes)} prototypes.")
+    if args.evaluate:
+        print_report(evaluate(gallery, label_ids, names, args.max_prototypes))
@@ -1,77 +1,294 @@
 import os
+import sys
 import numpy as np
-import pickle
-import face_recognition
+
+# Add project root to sys.path
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..', '..')))
+
+from Backend import config
+from Backend.metrics import metrics
+from Backend.face_recognition.ann_index import IVFIndex
+from Backend.face_recognition.embedding_store import EMBEDDING_DIM, EmbeddingStore, migrate_pickles
+from Backend.face_recognition.enrollment_writer import EnrollmentWriter
+from Backend.face_recognition import prototypes
+
+
+def match_embeddings(gallery, gallery_sq_norms, label_ids, names, encodings, threshold=0.6):
+    """
+    Matches a batch of encodings against a gallery matrix in one pass.
+
+    Args:
+        gallery (np.ndarray): (N, 128) float32 matrix of known encodings.
+        gallery_sq_norms (np.ndarray): (N,) squared L2 norms of the gallery rows.
+        label_ids (np.ndarray): (N,) label id of each gallery row.
+        names (list[str]): Person name for each label id.
+        encodings: (M, 128) array or list of query encodings.
+        threshold (float): Maximum euclidean distance that counts as a match.
+
+    Returns:
+        list[tuple[str, float]]: (name, distance) per query, "Unknown" when no
+        known encoding is closer than the threshold.
+    """
+    queries = np.asarray(encodings, dtype=np.float32).reshape(-1, EMBEDDING_DIM)
+    if len(queries) == 0:
+        return []
+    if len(gallery) == 0:
+        return [("Unknown", float("inf"))] * len(queries)
+
+    # ||q - g||^2 = ||q||^2 + ||g||^2 - 2 q.g, computed for all pairs at once
+    sq_dists = gallery_sq_norms[None, :] - 2.0 * (queries @ gallery.T)
+    best = np.argmin(sq_dists, axis=1)
+    best_sq = sq_dists[np.arange(len(queries)), best] + np.einsum('ij,ij->i', queries, queries)
+    distances = np.sqrt(np.maximum(best_sq, 0.0))
+
+    results = []
+    for index, distance in zip(best, distances):
+        name = names[label_ids[index]] if distance < threshold else "Unknown"
+        results.append((name, float(distance)))
+    return results
+
+
+def match_candidates(gallery, label_ids, names, encodings, candidates, threshold=0.6):
+    """
+    Like `match_embeddings`, but only computes exact distances to each query's
+    candidate rows (e.g. the shortlist returned by an approximate index).
+
+    Args:
+        candidates (np.ndarray): (M, k) gallery row ids per query, -1 for padding.
+    """
+    queries = np.asarray(encodings, dtype=np.float32).reshape(-1, EMBEDDING_DIM)
+    results = []
+    for query, rows in zip(queries, candidates):
+        rows = rows[rows >= 0]
+        if len(rows) == 0:
+            results.append(("Unknown", float("inf")))
+            continue
+        distances = np.linalg.norm(gallery[rows] - query, axis=1)
+        best = np.argmin(distances)
+        name = names[label_ids[rows[best]]] if distances[best] < threshold else "Unknown"
+        results.append((name, float(distances[best])))
+    return results
+
 
 class FaceRecognizer:
-    def __init__(self, embeddings_path=None):
+    def __init__(self, embeddings_path=None, write_behind=True, index_type=None, use_prototypes=None,
+                 save_prototypes=True):
+        """
+        Args:
+            embeddings_path (str): Directory of the embedding store (default: Data/embeddings).
+            write_behind (bool): Persist `add_face` through a background EnrollmentWriter
+                instead of committing to the store on the calling thread. The writer (and
+                its journal recovery) is started by `start_writer` or the first
+                `add_face`, so processes that only recognize never touch the journal.
+            index_type (str): "exact", "ivf" or "ivfpq"; defaults to config.RECOGNIZER_INDEX.
+            use_prototypes (bool): Match against per-identity prototypes (see `compact`)
+                instead of every sample; defaults to config.USE_PROTOTYPES. Takes
+                precedence over `index_type`.
+            save_prototypes (bool): Save prototypes built on first use next to the store;
+                read-only processes (the server's snapshots) keep them in memory only.
+        """
         if embeddings_path is None:
             # Build the absolute path to the embeddings directory from the project root
             base_dir = os.path.abspath(os.path.join(os.path.dirname(__file__), '..', '..'))
             self.embeddings_path = os.path.join(base_dir, 'Data', 'embeddings')
         else:
             self.embeddings_path = embeddings_path
-        self.embeddings_path = embeddings_path
-        self.known_faces = self.load_known_faces()
-
-    def load_known_faces(self):
-        known_faces = {}
         # Adjust path to be absolute from the project root
         abs_embeddings_path = os.path.abspath(os.path.join(os.path.dirname(__file__), self.embeddings_path))
+        self.store = EmbeddingStore(abs_embeddings_path)
+        self.write_behind = write_behind
+        self.writer = None
+        self.index_type = index_type or config.RECOGNIZER_INDEX
+        if self.index_type not in ("exact", "ivf", "ivfpq"):
+            raise ValueError(f"Unknown index type '{self.index_type}'")
+        self.use_prototypes = config.USE_PROTOTYPES if use_prototypes is None else use_prototypes
+        self.save_prototypes = save_prototypes
+        self.load_known_faces()
+
+    @property
+    def gallery(self):
+        """(N, 128) float32 view of every known encoding."""
+        return self._gallery[:self._size]
+
+    @property
+    def label_ids(self):
+        """(N,) label ids parallel to the rows of `gallery`; see `names`."""
+        return self._label_ids[:self._size]
+
+    @property
+    def known_faces(self):
+        """Person name -> (k, 128) array of that person's encodings, built on first access."""
+        if self._known_faces is None:
+            # One stable sort groups every person's rows; slicing it avoids a full-gallery mask per person
+            label_ids = self.label_ids
+            order = np.argsort(label_ids, kind='stable')
+            offsets = np.concatenate([[0], np.cumsum(np.bincount(label_ids, minlength=len(self.names)))])
+            grouped = self.gallery[order]
+            self._known_faces = {name: grouped[offsets[i]:offsets[i + 1]] for i, name in enumerate(self.names)}
+        return self._known_faces
+
+    def _sq_norms(self):
+        """Squared row norms, computed lazily so loading the store never touches the whole gallery."""
+        if self._norms_size < self._size:
+            rows = self._gallery[self._norms_size:self._size]
+            self._gallery_sq_norms[self._norms_size:self._size] = np.einsum('ij,ij->i', rows, rows)
+            self._norms_size = self._size
+        return self._gallery_sq_norms[:self._size]
 
-        if not os.path.exists(abs_embeddings_path):
-            os.makedirs(abs_embeddings_path)
-            return known_faces
+    def _append_to_gallery(self, person_name, embedding):
+        """Appends one row, growing the backing buffers geometrically so inserts stay amortised O(1)."""
+        if self._size == len(self._gallery):
+            # Also moves a read-only memmapped gallery into an owned, writable buffer
+            capacity = max(16, 2 * len(self._gallery))
+            gallery = np.empty((capacity, EMBEDDING_DIM), dtype=np.float32)
+            gallery[:self._size] = self._gallery[:self._size]
+            sq_norms = np.empty(capacity, dtype=np.float32)
+            sq_norms[:self._norms_size] = self._gallery_sq_norms[:self._norms_size]
+            label_ids = np.empty(capacity, dtype=np.int32)
+            label_ids[:self._size] = self._label_ids[:self._size]
+            self._gallery, self._gallery_sq_norms, self._label_ids = gallery, sq_norms, label_ids
 
-        for filename in os.listdir(abs_embeddings_path):
-            if filename.endswith(".pkl"):
-                person_name = os.path.splitext(filename)[0]
-                file_path = os.path.join(abs_embeddings_path, filename)
-                with open(file_path, 'rb') as f:
-                    embeddings = pickle.load(f)
-                    known_faces[person_name] = embeddings
-        print(f"[*] Loaded {len(known_faces)} known individuals.")
-        return known_faces
+        if person_name not in self._name_ids:
+            self._name_ids[person_name] = len(self.names)
+            self.names.append(person_name)
+        self._gallery[self._size] = np.asarray(embedding, dtype=np.float32).reshape(EMBEDDING_DIM)
+        self._label_ids[self._size] = self._name_ids[person_name]
+        if self.index is not None:
+            self.index.add(self._gallery[self._size][None, :], [self._size])
+        if self._prototypes is not None:
+            # Until the identity is re-compacted the new sample acts as its own prototype
+            matrix, proto_labels, radii = self._prototypes
+            self._prototypes = (np.vstack([matrix, self._gallery[self._size][None, :]]),
+                                np.append(proto_labels, self._label_ids[self._size]).astype(np.int32),
+                                np.append(radii, 0.0).astype(np.float32))
+        self._size += 1
+        self._known_faces = None
+
+    def _ann_index(self):
+        """
+        Returns the approximate index, building it on first use; None while the
+        exact path is configured or the gallery is too small to benefit.
+        """
+        if self.index_type == "exact" or self._size < config.ANN_MIN_GALLERY:
+            return None
+        if self.index is None:
+            nlist = config.IVF_NLIST or int(np.sqrt(self._size))
+            pq_subvectors = config.PQ_SUBVECTORS if self.index_type == "ivfpq" else 0
+            index = IVFIndex(nlist, nprobe=config.IVF_NPROBE, pq_subvectors=pq_subvectors)
+            index.train(self.gallery)
+            index.add(self.gallery, np.arange(self._size))
+            self.index = index
+            print(f"[*] Built {self.index_type} index over {self._size} embeddings ({index.nlist} lists).")
+        return self.index
+
+    def _ensure_store(self):
+        """Creates the embeddings directory and migrates legacy per-person `.pkl` files once."""
+        if not os.path.exists(self.store.directory):
+            os.makedirs(self.store.directory)
+        elif not self.store.exists() and any(f.endswith(".pkl") for f in os.listdir(self.store.directory)):
+            migrate_pickles(self.store.directory)
+
+    def load_known_faces(self):
+        """Memory-maps the gallery from the embedding store."""
+        self._ensure_store()
+        self._gallery, self._label_ids, self.names = self.store.load()
+        self._name_ids = {name: i for i, name in enumerate(self.names)}
+        self._size = len(self._gallery)
+        self._gallery_sq_norms = np.empty(self._size, dtype=np.float32)
+        self._norms_size = 0
+        self._known_faces = None
+        self.index = None
+        self._prototypes = None
+        print(f"[*] Loaded {len(self.names)} known individuals.")
+
+    def start_writer(self):
+        """
+        Starts the background EnrollmentWriter, replaying the journal of a crashed
+        session. Enrolling processes call this at startup so recovered faces are
+        recognized before the first new enrollment. No-op without write-behind.
+        """
+        if self.write_behind and self.writer is None:
+            self.writer = EnrollmentWriter(self.store)
+            if self.writer.recovered:
+                # Pick up rows a crashed session journaled but never committed
+                self.load_known_faces()
 
     def add_face(self, person_name, embedding):
-        if person_name not in self.known_faces:
-            self.known_faces[person_name] = []
-        self.known_faces[person_name].append(embedding)
-        self._save_embeddings(person_name)
+        """Adds an embedding to the in-memory gallery immediately and persists it."""
+        self.start_writer()
+        self._append_to_gallery(person_name, embedding)
+        if self.writer:
+            self.writer.submit(person_name, embedding)
+        else:
+            self.store.append([person_name], [embedding])
         print(f"[*] Added embedding for {person_name}.")
 
-    def _save_embeddings(self, person_name):
-        # Adjust path to be absolute from the project root
-        abs_embeddings_path = os.path.abspath(os.path.join(os.path.dirname(__file__), self.embeddings_path))
-        file_path = os.path.join(abs_embeddings_path, f"{person_name}.pkl")
-        with open(file_path, 'wb') as f:
-            pickle.dump(self.known_faces[person_name], f)
+    def flush(self, wait=True):
+        """Commits pending enrollments to the store; returns True once everything is persisted."""
+        return self.writer.flush(wait) if self.writer else True
 
-    def recognize_face(self, face_embedding, threshold=0.6):
-        if not self.known_faces:
-            return "Unknown"
-
-        # Create arrays of known face encodings and their names
-        known_face_encodings = []
-        known_face_names = []
-        for name, embeddings_list in self.known_faces.items():
-            for embedding in embeddings_list:
-                known_face_encodings.append(embedding)
-                known_face_names.append(name)
-
-        if not known_face_encodings:
-            return "Unknown"
-
-        # See how far apart the test embedding is from the known embeddings
-        face_distances = face_recognition.face_distance(known_face_encodings, face_embedding)
-        
-        best_match_index = np.argmin(face_distances)
-        min_distance = face_distances[best_match_index]
-
-        if min_distance < threshold:
-            return known_face_names[best_match_index]
+    def close(self):
+        """Flushes pending enrollments and stops the background writer."""
+        if self.writer:
+            self.writer.close()
+
+    def _prototype_gallery(self):
+        """Returns (prototypes, label ids, radii), loading them from disk or compacting on first use."""
+        if self._prototypes is None:
+            self._prototypes = prototypes.load_prototypes(self.store.directory, self._size)
+            if self._prototypes is None:
+                self.compact(save=self.save_prototypes)
+        return self._prototypes
+
+    def compact(self, person_name=None, max_prototypes=None, save=True):
+        """
+        Reduces identities to a few prototypes and saves them next to the store.
+
+        Args:
+            person_name (str): Only re-compact this identity, e.g. right after its
+                enrollment; all identities when None.
+            max_prototypes (int): Prototypes per identity; defaults to config.MAX_PROTOTYPES.
+            save (bool): Write the prototypes to disk; False keeps them in memory only.
+        """
+        max_prototypes = max_prototypes or config.MAX_PROTOTYPES
+        if person_name is None or self._prototypes is None:
+            self._prototypes = prototypes.build_prototypes(self.gallery, self.label_ids, max_prototypes)
         else:
-            return "Unknown"
+            label = self._name_ids[person_name]
+            matrix, proto_labels, radii = self._prototypes
+            centers, radius = prototypes.compact_identity(self.gallery[self.label_ids == label], max_prototypes)
+            keep = proto_labels != label
+            self._prototypes = (np.vstack([matrix[keep], centers]),
+                                np.concatenate([proto_labels[keep], np.full(len(centers), label, dtype=np.int32)]),
+                                np.concatenate([radii[keep], np.full(len(centers), radius, dtype=np.float32)]))
+        if save:
+            prototypes.save_prototypes(self.store.directory, *self._prototypes, count=self._size)
+        print(f"[*] Compacted gallery to {len(self._prototypes[0])} prototypes.")
+
+    def recognize_face(self, face_embedding, threshold=0.6):
+        name, _ = self.recognize_many([face_embedding], threshold)[0]
+        return name
+
+    def recognize_many(self, encodings, threshold=0.6):
+        """
+        Matches every face of a frame against the gallery with a single matrix operation.
+
+        Args:
+            encodings: List or (M, 128) array of face encodings.
+            threshold (float): Maximum distance that counts as a match.
+
+        Returns:
+            list[tuple[str, float]]: (name, distance) for each encoding, in order.
+        """
+        with metrics.timer("match"):
+            if self.use_prototypes:
+                return prototypes.match_prototypes(*self._prototype_gallery(), self.names, encodings, threshold)
+            index = self._ann_index()
+            if index is not None:
+                _, candidates = index.search(encodings, config.ANN_RERANK)
+                return match_candidates(self.gallery, self.label_ids, self.names, encodings, candidates, threshold)
+            return match_embeddings(self.gallery, self._sq_norms(), self.label_ids, self.names,
+                                    encodings, threshold)
 
 if __name__ == "__main__":
     # Example usage:
@@ -0,0 +1,166 @@
+"""
+Lightweight per-stage timers and counters.
+
+The recognition paths record how long each stage took (decode → resize → detect →
+encode → landmarks → match) into the process-wide registry `metrics`; Flask
+also records whole-request latency. A timer costs two `perf_counter` calls and
+one lock, so it stays on in production. Read the numbers from `GET /metrics`
+(Prometheus text format), the webcam's periodic `[METRICS]` log line, or the
+benchmarks in Backend/benchmarks.
+"""
+import time
+import threading
+from contextlib import contextmanager
+
+from Backend import config
+
+STAGES = ("decode", "resize", "motion_gate", "detect", "encode", "landmarks", "match")
+
+# Histogram bucket upper bounds in seconds
+LATENCY_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+# Timer family -> Prometheus label naming its members
+_FAMILY_LABELS = {"stage": "stage", "request": "endpoint"}
+
+
+class Metrics:
+    """
+    Thread-safe registry of latency histograms (per timer family and name) and event counters.
+
+    Snapshots are plain dicts, so worker processes can send theirs back to be merged.
+    """
+
+    def __init__(self, enabled=None, buckets=LATENCY_BUCKETS):
+        """
+        Args:
+            enabled (bool): Record anything at all, defaults to config.METRICS.
+            buckets (tuple): Histogram bucket upper bounds in seconds.
+        """
+        self.enabled = config.METRICS if enabled is None else enabled
+        self.buckets = buckets
+        self._timers = {}
+        self._counters = {}
+        self._lock = threading.Lock()
+
+    @contextmanager
+    def timer(self, name, family="stage"):
+        """Times the body of a `with` block as one observation of `name`."""
+        if not self.enabled:
+            yield
+            return
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(name, time.perf_counter() - start, family)
+
+    def observe(self, name, seconds, family="stage"):
+        if not self.enabled:
+            return
+        with self._lock:
+            timer = self._timers.get((family, name))
+            if timer is None:
+                timer = self._timers[(family, name)] = {"count": 0, "sum": 0.0, "max": 0.0,
+                                                        "buckets": [0] * len(self.buckets)}
+            timer["count"] += 1
+            timer["sum"] += seconds
+            timer["max"] = max(timer["max"], seconds)
+            for i, bound in enumerate(self.buckets):
+                if seconds <= bound:
+                    timer["buckets"][i] += 1
+                    break
+
+    def count(self, name, value=1):
+        """Adds `value` to the counter `name` (frames sampled, faces detected, ...)."""
+        if not self.enabled or not value:
+            return
+        with self._lock:
+            self._counters[name] = self._counters.get(name, 0) + value
+
+    def snapshot(self):
+        """
+        Returns:
+            dict: {"timers": {(family, name): {"count", "sum", "max", "buckets"}}, "counters": {name: value}},
+            a copy that is safe to keep, diff against or pickle.
+        """
+        with self._lock:
+            return {"timers": {key: {**timer, "buckets": list(timer["buckets"])}
+                               for key, timer in self._timers.items()},
+                    "counters": dict(self._counters)}
+
+    def merge(self, snapshot):
+        """Adds a snapshot taken elsewhere (e.g. in a worker process) to this registry."""
+        if not snapshot or not self.enabled:
+            return
+        with self._lock:
+            for key, other in snapshot["timers"].items():
+                timer = self._timers.get(key)
+                if timer is None:
+                    self._timers[key] = {**other, "buckets": list(other["buckets"])}
+                    continue
+                timer["count"] += other["count"]
+                timer["sum"] += other["sum"]
+                timer["max"] = max(timer["max"], other["max"])
+                timer["buckets"] = [a + b for a, b in zip(timer["buckets"], other["buckets"])]
+            for name, value in snapshot["counters"].items():
+                self._counters[name] = self._counters.get(name, 0) + value
+
+    def reset(self):
+        with self._lock:
+            self._timers.clear()
+            self._counters.clear()
+
+    def summary(self, since=None, family="stage"):
+        """
+        One-line summary of mean latency and call count per timer, e.g. for periodic logs.
+
+        Args:
+            since (dict): Earlier snapshot; only what happened after it is summarized.
+        """
+        current = self.snapshot()
+        previous = since or {"timers": {}, "counters": {}}
+        order = {name: i for i, name in enumerate(STAGES)}
+        parts = []
+        for (timer_family, name), timer in sorted(current["timers"].items(),
+                                                   key=lambda item: (order.get(item[0][1], len(order)), item[0][1])):
+            if timer_family != family:
+                continue
+            before = previous["timers"].get((timer_family, name), {"count": 0, "sum": 0.0})
+            calls = timer["count"] - before["count"]
+            if calls:
+                parts.append(f"{name} {1000.0 * (timer['sum'] - before['sum']) / calls:.1f} ms x{calls}")
+        for name, value in sorted(current["counters"].items()):
+            delta = value - previous["counters"].get(name, 0)
+            if delta:
+                parts.append(f"{name} {delta}")
+        return " | ".join(parts) if parts else "no activity"
+
+    def prometheus(self, prefix="face"):
+        """Renders every timer as a histogram and every counter in the Prometheus text exposition format."""
+        current = self.snapshot()
+        lines = []
+        families = sorted({family for family, _ in current["timers"]})
+        for family in families:
+            metric = f"{prefix}_{family}_seconds"
+            label = _FAMILY_LABELS.get(family, "name")
+            lines.append(f"# HELP {metric} Time spent per {family}.")
+            lines.append(f"# TYPE {metric} histogram")
+            for (timer_family, name), timer in sorted(current["timers"].items()):
+                if timer_family != family:
+                    continue
+                cumulative = 0
+                for bound, hits in zip(self.buckets, timer["buckets"]):
+                    cumulative += hits
+                    lines.append(f'{metric}_bucket{{{label}="{name}",le="{bound}"}} {cumulative}')
+                lines.append(f'{metric}_bucket{{{label}="{name}",le="+Inf"}} {timer["count"]}')
+                lines.append(f'{metric}_sum{{{label}="{name}"}} {timer["sum"]:.6f}')
+                lines.append(f'{metric}_count{{{label}="{name}"}} {timer["count"]}')
+        for name, value in sorted(current["counters"].items()):
+            metric = f"{prefix}_{name}_total"
+            lines.append(f"# TYPE {metric} counter")
+            lines.append(f"{metric} {value}")
+        return "\n".join(lines) + "\n"
+
+
+# Process-wide registry used by the detector, recognizer, video search, webcam and Flask server
+metrics = Metrics()